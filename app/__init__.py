@@ -1,19 +1,40 @@
 from flask import Flask
 from sqlalchemy_utils.functions import database_exists, create_database
-from .extensions import db, migrate, Base
+from .extensions import db, migrate, Base, celery_init_app
+from .utils.upload_store import UploadRequest
 
 def create_app(config_class='config.Config'):
     """Фабрика приложений Flask"""
     app = Flask(__name__)
+    # Загружаемые файлы пишутся на диск с хэшированием по мере приема
+    app.request_class = UploadRequest
     app.config.from_object(config_class)
 
+    # Параметры пула соединений из DB_POOL_* (если не заданы явно)
+    from app.utils.db_pool import engine_options
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config))
+
     # Инициализация расширений с приложением
     db.init_app(app)
     migrate.init_app(app, db)
+    celery_init_app(app)
+
+    from app.utils.loader import dataset_cache
+    dataset_cache.init_app(app)
+
+    # Подсчет SQL-запросов каждого запроса (заголовок X-Query-Count)
+    from app.utils import query_count
+    query_count.init_app(app)
+
+    # Метрики конвейера обработки и запросов (GET /metrics)
+    from app.utils import metrics
+    metrics.init_app(app)
 
-    with app.app_context():
-        if not database_exists(db.engine.url):
-            create_database(db.engine.url)
+    # Проверка открывает отдельное соединение при запуске каждого воркера
+    if app.config.get("CREATE_DATABASE", True):
+        with app.app_context():
+            if not database_exists(db.engine.url):
+                create_database(db.engine.url)
 
     # Регистрация blueprints
     from app.routes import bp as main_bp
@@ -1,3 +1,5 @@
+from celery import Celery, Task
+from flask import Flask, current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from sqlalchemy.orm import DeclarativeBase
@@ -7,5 +9,49 @@ class Base(DeclarativeBase):
     pass
 
 
-db = SQLAlchemy(model_class=Base)
+# Записи не перечитываются после commit: операция фиксирует одну транзакцию
+# и затем только отдает уже известные ей значения
+db = SQLAlchemy(model_class=Base, session_options={"expire_on_commit": False})
 migrate = Migrate()
+
+
+def celery_init_app(app: Flask) -> Celery:
+    """
+    Create Celery application bound to Flask app.
+
+    Tasks run inside the Flask application context. With the in-memory broker
+    ("memory://") tasks are executed eagerly in the web process, so the service
+    works locally without Redis; results are still stored in the result backend
+    and available through the jobs API. Eager tasks share the application
+    context of the request that runs them.
+    """
+
+    class FlaskTask(Task):
+        def __call__(self, *args, **kwargs):
+            # Задача, выполняемая сразу внутри запроса, работает в его контексте:
+            # с той же сессией и уже загруженными записями (см. get_data_file)
+            if has_app_context() and current_app._get_current_object() is app:
+                return self.run(*args, **kwargs)
+            with app.app_context():
+                return self.run(*args, **kwargs)
+
+    broker_url = app.config.get("CELERY_BROKER_URL", "memory://")
+    celery_app = Celery(app.name, task_cls=FlaskTask)
+    celery_app.conf.update(
+        broker_url=broker_url,
+        result_backend=app.config.get("CELERY_RESULT_BACKEND", "cache+memory://"),
+        task_always_eager=broker_url.startswith("memory://"),
+        task_store_eager_result=True,
+        task_ignore_result=False,
+        task_track_started=True,
+        # Брошенные возобновляемые загрузки удаляет сервис beat
+        beat_schedule={
+            "expire-uploads": {
+                "task": "app.tasks.expire_uploads_task",
+                "schedule": app.config["MULTIPART_SESSION_TTL_SECONDS"] / 4,
+            },
+        },
+    )
+    celery_app.set_default()
+    app.extensions["celery"] = celery_app
+    return celery_app
@@ -1,5 +1,16 @@
 from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, LargeBinary, ForeignKey
+from sqlalchemy import (
+    String,
+    Integer,
+    BigInteger,
+    Boolean,
+    DateTime,
+    Float,
+    LargeBinary,
+    ForeignKey,
+    Index,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import JSONB
 from .extensions import db, Base
@@ -18,8 +29,11 @@ class DataFile(Base):
         String(10), nullable=False
     )  # ['csv', 'xlsx', 'xls']
     upload_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
-    file_size: Mapped[int] = mapped_column(Integer)  # Размер файла в байтах
+    file_size: Mapped[int] = mapped_column(BigInteger)  # Размер файла в байтах
     original_filename: Mapped[str] = mapped_column(String(256))
+    file_schema: Mapped[dict | None] = mapped_column(
+        JSONB
+    )  # Разделитель, кодировка, заголовок, колонки и типы (см. app.utils.schema)
 
     # Связь с анализом данных
     analyses: Mapped[list["DataAnalysis"]] = db.relationship(
@@ -28,6 +42,9 @@ class DataFile(Base):
     plots: Mapped[list["DataPlot"]] = db.relationship(
         back_populates="data_file", lazy=True
     )
+    column_stats: Mapped[list["ColumnStats"]] = db.relationship(
+        back_populates="data_file", lazy=True
+    )
 
     def __repr__(self):
         return f"<DataFile {self.filename}>"
@@ -39,6 +56,9 @@ class DataAnalysis(Base):
     """
 
     __tablename__ = "data_analyses"
+    # Одна запись анализа каждого типа на файл: поиск в кэше идет по индексу,
+    # а одновременные записи одного анализа сходятся в upsert
+    __table_args__ = (UniqueConstraint("data_file_id", "analysis_type"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     data_file_id: Mapped[int] = mapped_column(
@@ -47,7 +67,7 @@ class DataAnalysis(Base):
     analysis_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     analysis_type: Mapped[str | None] = mapped_column(
         String(50)
-    )  # 'basic_stats', 'cleaning', 'correlation' и т.д.
+    )  # 'basic_stats', 'approx_stats', 'cleaning', 'correlation' и т.д.
 
     # Статистические данные в JSON формате
     stats_mean: Mapped[dict | None] = mapped_column(JSONB)
@@ -57,6 +77,11 @@ class DataAnalysis(Base):
     stats_min: Mapped[dict | None] = mapped_column(JSONB)
     stats_max: Mapped[dict | None] = mapped_column(JSONB)
 
+    # Приближенная статистика по выборке (analysis_type 'approx_stats')
+    stats_intervals: Mapped[dict | None] = mapped_column(JSONB)
+    confidence: Mapped[float | None] = mapped_column(Float)
+    sample_rows: Mapped[int | None] = mapped_column(Integer)
+
     # Информация об очистке данных
     duplicates_removed: Mapped[int | None] = mapped_column(Integer)
     missing_values_filled: Mapped[int | None] = mapped_column(Integer)
@@ -79,6 +104,20 @@ class DataAnalysis(Base):
                 "max": self.stats_max,
             }
             return data
+        if self.analysis_type == "approx_stats":
+            data = {
+                "mean": self.stats_mean,
+                "median": self.stats_median,
+                "correlation": self.stats_correlation,
+                "std": self.stats_std,
+                "min": self.stats_min,
+                "max": self.stats_max,
+                "approximate": True,
+                "intervals": self.stats_intervals,
+                "confidence": self.confidence,
+                "sample_rows": self.sample_rows,
+            }
+            return data
         if self.analysis_type == "cleaning":
             data = {
                 "duplicates_removed": self.duplicates_removed,
@@ -95,6 +134,20 @@ class DataPlot(Base):
     """
 
     __tablename__ = "data_plots"
+    __table_args__ = (
+        # Уникальный ключ кэша; x_column у гистограмм NULL, поэтому NULL
+        # считаются равными (NULLS NOT DISTINCT, PostgreSQL 15+)
+        Index(
+            "ix_data_plots_cache_key",
+            "data_file_id",
+            "plot_type",
+            "column_name",
+            "x_column",
+            "params_hash",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     data_file_id: Mapped[int] = mapped_column(
@@ -103,19 +156,131 @@ class DataPlot(Base):
     plot_type: Mapped[str | None] = mapped_column(
         String(50)
     )  # 'histogram', 'scatter', 'boxplot' и т.д.
+    column_name: Mapped[str | None] = mapped_column(
+        String(256)
+    )  # Колонка графика (ось Y для scatter)
+    x_column: Mapped[str | None] = mapped_column(String(256))  # Ось X для scatter
+    params_hash: Mapped[str | None] = mapped_column(
+        String(16)
+    )  # Хэш параметров отрисовки
     plot_data: Mapped[bytes | None] = mapped_column(
         LargeBinary
-    )  # Бинарные данные изображения (для PNG)
+    )  # Бинарные данные изображения (для PNG), только у старых графиков
+    storage_key: Mapped[str | None] = mapped_column(
+        String(64), index=True
+    )  # Адрес PNG в хранилище графиков (см. app.utils.plot_store)
     plot_json: Mapped[dict | None] = mapped_column(
         JSONB
-    )  # Данные для построения графика на клиенте
+    )  # Данные для построения графика на клиенте (прореженные)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
-    columns_used: Mapped[dict | None] = mapped_column(
+    columns_used: Mapped[list | None] = mapped_column(
         JSONB
-    )  # Колонки, использованные для построения графика
+    )  # Имена колонок, использованных для построения графика
 
     # Связи
     data_file: Mapped["DataFile"] = db.relationship(back_populates="plots")
 
     def __repr__(self):
         return f"<DataPlot {self.plot_type} for analysis {self.analysis_id}>"
+
+
+class ColumnStats(Base):
+    """
+    Модель для статистик отдельных колонок файла
+
+    Holds mergeable aggregates of a column, so statistics for any column subset
+    are served without reading columns that were already analyzed.
+    """
+
+    __tablename__ = "column_stats"
+    __table_args__ = (UniqueConstraint("data_file_id", "column_name"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    data_file_id: Mapped[int] = mapped_column(
+        ForeignKey("data_files.id"), nullable=False
+    )
+    column_name: Mapped[str] = mapped_column(String(256), nullable=False)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    is_numeric: Mapped[bool] = mapped_column(Boolean, nullable=False)
+
+    # Агрегаты непропущенных значений
+    count: Mapped[int | None] = mapped_column(BigInteger)
+    sum: Mapped[float | None] = mapped_column(Float)
+    m2: Mapped[float | None] = mapped_column(
+        Float
+    )  # Сумма квадратов отклонений от среднего
+    min: Mapped[float | None] = mapped_column(Float)
+    max: Mapped[float | None] = mapped_column(Float)
+    median: Mapped[float | None] = mapped_column(Float)
+    sketch: Mapped[dict | None] = mapped_column(JSONB)  # KLL-скетч квантилей
+    correlation: Mapped[dict | None] = mapped_column(
+        JSONB
+    )  # Корреляция с другими колонками: {колонка: коэффициент}
+
+    # Связи
+    data_file: Mapped["DataFile"] = db.relationship(back_populates="column_stats")
+
+    def __repr__(self):
+        return f"<ColumnStats {self.column_name} for file {self.data_file_id}>"
+
+
+class UploadSession(Base):
+    """
+    Model for resumable multipart uploads
+
+    The file is preallocated in the upload folder and parts are written into
+    it at their offsets in any order. Received parts are tracked in
+    UploadPart, so an interrupted upload is resumed by sending only the
+    missing ones.
+    """
+
+    __tablename__ = "upload_sessions"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    original_filename: Mapped[str] = mapped_column(String(256), nullable=False)
+    file_type: Mapped[str] = mapped_column(String(10), nullable=False)
+    total_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    part_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    # Связи
+    parts: Mapped[list["UploadPart"]] = db.relationship(
+        back_populates="session", lazy=True, cascade="all, delete-orphan"
+    )
+
+    @property
+    def part_count(self) -> int:
+        return max(1, -(-self.total_size // self.part_size))
+
+    def part_length(self, part_number: int) -> int:
+        """Expected size of a part: all parts but the last are part_size long"""
+        if part_number < self.part_count:
+            return self.part_size
+        return self.total_size - self.part_size * (self.part_count - 1)
+
+    def __repr__(self):
+        return f"<UploadSession {self.id} for {self.original_filename}>"
+
+
+class UploadPart(Base):
+    """
+    Model for received parts of a multipart upload
+    """
+
+    __tablename__ = "upload_parts"
+    __table_args__ = (UniqueConstraint("session_id", "part_number"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    session_id: Mapped[str] = mapped_column(
+        ForeignKey("upload_sessions.id", ondelete="CASCADE"), nullable=False
+    )
+    part_number: Mapped[int] = mapped_column(Integer, nullable=False)  # С единицы
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    checksum: Mapped[str] = mapped_column(String(64), nullable=False)  # SHA-256 части
+    received_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    # Связи
+    session: Mapped["UploadSession"] = db.relationship(back_populates="parts")
+
+    def __repr__(self):
+        return f"<UploadPart {self.part_number} of upload {self.session_id}>"
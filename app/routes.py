@@ -1,22 +1,65 @@
-import os
-from flask import Blueprint, jsonify, request, send_file
+import errno
+import logging
+from io import BytesIO
+from celery.utils import uuid
+from flask import (
+    Blueprint,
+    abort,
+    current_app,
+    jsonify,
+    request,
+    send_file,
+    url_for,
+)
 from .extensions import db
-from .models import DataFile
-from datetime import datetime
+from .models import DataFile, DataPlot, UploadSession
+from app.utils import metrics
+from app.tasks import (
+    analyze_data_task,
+    clean_data_task,
+    generate_plot_task,
+    generate_plots_task,
+)
 from app.utils.data_processor import (
+    HISTOGRAM_BINS,
+    HISTOGRAM_MAX_BINS,
+    PLOT_BATCH_MAX_PLOTS,
+    SCATTER_MODES,
     allowed_file,
+    approximate_file_stats,
+    register_file,
     save_file,
-    analyze_data,
-    clean_data,
-    generate_plot,
+    get_cached_analysis,
+    get_cached_column_stats,
+    get_cached_plot,
+    plot_storage_key,
+    stats_subset,
+)
+from app.utils.data_access import data_file_or_404
+from app.utils.db_pool import pool_status
+from app.utils.loader import dataset_columns
+from app.utils.multipart_upload import (
+    complete_upload,
+    create_upload_session,
+    upload_status,
+    write_part,
 )
+from app.utils.plot_store import find_plot, plot_path
 
 bp = Blueprint("api", __name__, url_prefix="/api/v1")
 
+logger = logging.getLogger(__name__)
+
 
 @bp.route("/upload", methods=["POST"])
 def upload_file():
-    """Loads data file (CSV/Excel)"""
+    """
+    Loads data file (CSV/Excel)
+
+    The file is streamed to disk and hashed while it is received (see
+    UploadRequest). Uploading content that is already stored returns the
+    existing file with 200 instead of 201.
+    """
     if "file" not in request.files:
         return jsonify({"error": "No file part"}), 400
 
@@ -27,99 +70,455 @@ def upload_file():
     if not allowed_file(filename=file.filename):
         return jsonify({"error": "Invalid file type"}), 415
 
+    file_type = file.filename.rsplit(".", 1)[1].lower()
     try:
-        filename, filepath = save_file(file)
-        # Сохраняем метаданные в БД
-        new_file = DataFile(
-            filename=filename,
-            file_type=filename.rsplit(".", 1)[1].lower(),
-            file_size=os.path.getsize(filepath),
-            original_filename=file.filename,
-            upload_date=datetime.now(),
-        )
-        db.session.add(new_file)
-        db.session.commit()
-        return (
-            jsonify(
-                {
-                    "id": new_file.id,
-                    "filename": new_file.filename,
-                    "message": "File uploaded successfully",
-                }
-            ),
-            201,
-        )
+        with metrics.operation("upload", file_type):
+            filename, filepath, _ = save_file(file)
+            # Файл с тем же содержимым уже загружен: его анализы и графики переиспользуются
+            with metrics.stage("db_write"):
+                data_file, created = register_file(
+                    filename=filename,
+                    filepath=filepath,
+                    file_type=file_type,
+                    original_filename=file.filename,
+                )
+                db.session.commit()
+        return uploaded(data_file, created)
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 
+def uploaded(data_file: DataFile, created: bool):
+    """Response for a stored upload; 200 if the same content was stored before"""
+    return (
+        jsonify(
+            {
+                "id": data_file.id,
+                "filename": data_file.original_filename,
+                "message": (
+                    "File uploaded successfully"
+                    if created
+                    else "File with the same content already uploaded"
+                ),
+            }
+        ),
+        201 if created else 200,
+    )
+
+
+@bp.route("/uploads", methods=["POST"])
+def start_upload():
+    """
+    Starts a resumable multipart upload
+
+    Body: {"filename": ..., "size": <bytes>, "part_size": <bytes, optional>}.
+    Parts are then sent with PUT /uploads/<id>/parts/<n> in any order and
+    the upload is finished with POST /uploads/<id>/complete.
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "JSON body required"}), 400
+    filename = body.get("filename")
+    if not isinstance(filename, str) or filename == "":
+        return jsonify({"error": "'filename' required"}), 400
+    if not allowed_file(filename=filename):
+        return jsonify({"error": "Invalid file type"}), 415
+    size, part_size = body.get("size"), body.get("part_size")
+    if not isinstance(size, int) or not isinstance(part_size, int | None):
+        return jsonify({"error": "'size' and 'part_size' must be integers"}), 400
+    try:
+        session = create_upload_session(filename, size, part_size)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except OSError as e:
+        if e.errno != errno.ENOSPC:
+            raise
+        return jsonify({"error": "Not enough storage for the upload"}), 507
+    return (
+        jsonify(upload_status(session)),
+        201,
+        {"Location": url_for("api.get_upload", upload_id=session.id)},
+    )
+
+
+@bp.route("/uploads/<upload_id>", methods=["GET"])
+def get_upload(upload_id):
+    """Gets progress of a multipart upload: received and missing parts"""
+    session = db.get_or_404(UploadSession, upload_id)
+    return jsonify(upload_status(session))
+
+
+@bp.route("/uploads/<upload_id>/parts/<int:part_number>", methods=["PUT"])
+def put_upload_part(upload_id, part_number):
+    """
+    Uploads one part of a multipart upload
+
+    The body is the raw part. An optional X-Content-SHA256 header is checked
+    against the received bytes. Sending a part again replaces it.
+    """
+    session = db.get_or_404(UploadSession, upload_id)
+    try:
+        part = write_part(
+            session,
+            part_number,
+            request.stream,
+            checksum=request.headers.get("X-Content-SHA256"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(
+        {"part_number": part.part_number, "size": part.size, "checksum": part.checksum}
+    )
+
+
+@bp.route("/uploads/<upload_id>/complete", methods=["POST"])
+def finish_upload(upload_id):
+    """
+    Completes a multipart upload and registers the file
+
+    Optional body {"parts": [{"part_number": n, "checksum": ...}, ...]} is
+    verified against the received parts.
+    """
+    session = db.get_or_404(UploadSession, upload_id)
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        body = {}
+    try:
+        checksums = {
+            int(part["part_number"]): str(part["checksum"])
+            for part in body.get("parts", [])
+        }
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Invalid 'parts'"}), 400
+    try:
+        data_file, created = complete_upload(session, checksums)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return uploaded(data_file, created)
+
+
+def job_accepted(job):
+    """Response for a job that is still queued or running"""
+    return (
+        jsonify(
+            {
+                "job_id": job.id,
+                "status": job.state,
+                "status_url": url_for("api.get_job", job_id=job.id),
+            }
+        ),
+        202,
+        {"Location": url_for("api.get_job", job_id=job.id)},
+    )
+
+
 @bp.route("/data/<int:file_id>/stats", methods=["GET"])
 def get_stats(file_id):
-    """Gets data summary"""
-    db.get_or_404(DataFile, file_id)
-    try:
-        stats = analyze_data(file_id=file_id)
-        return jsonify(stats)
-    except RuntimeError:
-        return jsonify({"error": "Invalid data format"}, 500)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    """
+    Gets data summary
+
+    Optional ?columns=a,b limits statistics to the listed columns.
+    With ?mode=approx statistics not computed yet are estimated from a
+    sample right away, with confidence intervals, and exact statistics are
+    computed by a background job (its id is returned) that replaces them.
+    Approximate responses have "approximate": true.
+    """
+    data_file = data_file_or_404(file_id)
+    columns = [c.strip() for c in request.args.get("columns", "").split(",") if c.strip()]
+    mode = request.args.get("mode", "exact")
+    if mode not in ("exact", "approx"):
+        return jsonify({"error": "'mode' must be 'exact' or 'approx'"}), 400
+    if columns:
+        stats = get_cached_column_stats(file_id, columns)
+    else:
+        analysis = get_cached_analysis(file_id, "basic_stats")
+        stats = analysis.get_data() if analysis else None
+    if stats is not None:
+        # Ответ из сохраненной статистики, без обработки файла
+        with metrics.operation("stats", data_file.file_type):
+            metrics.record_cache("result", True)
+        return jsonify({**stats, "approximate": False} if mode == "approx" else stats)
+    if mode == "approx":
+        unknown = [c for c in columns if c not in dataset_columns(data_file)]
+        if unknown:
+            return jsonify({"error": f"Unknown columns: {', '.join(unknown)}"}), 400
+        upgrading = get_cached_analysis(file_id, "approx_stats") is None
+        try:
+            stats = approximate_file_stats(file_id)
+        except RuntimeError:
+            return jsonify({"error": "Invalid data format"}), 500
+        if stats is not None:
+            return approximate_response(file_id, stats, columns, upgrading)
+    job = analyze_data_task.delay(file_id, columns or None)
+    if not job.ready():
+        return job_accepted(job)
+    if job.failed():
+        if isinstance(job.result, ValueError):
+            return jsonify({"error": str(job.result)}), 400
+        if isinstance(job.result, RuntimeError):
+            return jsonify({"error": "Invalid data format"}), 500
+        return jsonify({"error": str(job.result)}), 500
+    return jsonify(job.result), 200, {"X-Job-Id": job.id}
+
+
+def approximate_response(file_id: int, stats: dict, columns: list[str], upgrade: bool):
+    """
+    Response with approximate statistics.
+
+    If `upgrade` is set, the exact statistics job is queued after the
+    response is sent, so with eagerly executed jobs it doesn't delay it.
+    """
+    body = stats_subset(stats, columns) if columns else stats
+    if not upgrade:
+        return jsonify(body)
+    job_id = uuid()
+    response = jsonify(
+        {
+            **body,
+            "job_id": job_id,
+            "status_url": url_for("api.get_job", job_id=job_id),
+        }
+    )
+    response.call_on_close(
+        lambda: analyze_data_task.apply_async((file_id,), task_id=job_id)
+    )
+    return response, 200, {"X-Job-Id": job_id}
 
 
 @bp.route("/data/<int:file_id>/clean", methods=["POST"])
 def get_cleaned_data(file_id):
     """Creates new file with cleaned data and gets cleaning report"""
-    db.get_or_404(DataFile, file_id)
+    data_file_or_404(file_id)
     handle_duplicates = request.args.get("handle_duplicates", "drop")
     fill_missing = request.args.get("fill_missing", "mean")
     force = bool(request.args.get("force", None))
-    try:
-        resp = clean_data(
-            file_id=file_id,
-            handle_duplicates=handle_duplicates,
-            fill_missing=fill_missing,
-            force=force,
-        )
-        return jsonify(resp), 202
-    except ValueError as e:
-        return jsonify({"error": str(e)}), 400
-    except Exception as e:
-        db.session.rollback()
-        return jsonify({"error": str(e)}), 500
+    if not force:
+        analysis = get_cached_analysis(file_id, "cleaning")
+        if analysis:
+            return jsonify(analysis.get_data()), 202
+    job = clean_data_task.delay(
+        file_id=file_id,
+        handle_duplicates=handle_duplicates,
+        fill_missing=fill_missing,
+        force=force,
+    )
+    if not job.ready():
+        return job_accepted(job)
+    if job.failed():
+        if isinstance(job.result, ValueError):
+            return jsonify({"error": str(job.result)}), 400
+        return jsonify({"error": str(job.result)}), 500
+    return jsonify(job.result), 202, {"X-Job-Id": job.id}
+
+
+def plot_spec_error(column, plot_type, x, mode, bins) -> str | None:
+    """Validation error of a plot specification, or None if it is valid"""
+    if not isinstance(column, str) or column == "":
+        return "'column' required"
+    if plot_type not in ["histogram", "scatter"]:
+        return f"Invalid plot type: {plot_type}. Must be 'histogram' or 'scatter'"
+    if x is not None and not isinstance(x, str):
+        return "'x' must be a column name"
+    if plot_type == "scatter" and mode not in SCATTER_MODES:
+        return f"Invalid mode: {mode}. Must be one of {', '.join(SCATTER_MODES)}"
+    if (
+        not isinstance(bins, int)
+        or isinstance(bins, bool)
+        or not 1 <= bins <= HISTOGRAM_MAX_BINS
+    ):
+        return f"'bins' must be an integer from 1 to {HISTOGRAM_MAX_BINS}"
+    return None
+
+
+def plot_columns_error(data_file: DataFile, column: str, x: str | None) -> str | None:
+    """Error for plot columns missing from the file, or None if all exist"""
+    columns = dataset_columns(data_file)
+    for name in (column, x):
+        if name is not None and name not in columns:
+            return f"Column not found: {name}"
+    return None
 
 
 @bp.route("/data/<int:file_id>/plot", methods=["GET"])
 def get_plot(file_id):
     """
     Gets plot
+
+    Scatter plots take ?mode=auto|points|density|sample; auto draws a
+    density grid for large tables (see generate_plot). Histograms take
+    ?bins=N. With ?format=json the plot data (histogram bin counts, scatter
+    points or density grid) is returned instead of a PNG image.
+
+    Rendered plots are sent from the plot store; the ETag is the plot's
+    content address, so If-None-Match is answered with 304 without
+    touching the database.
     """
-    db.get_or_404(DataFile, file_id)
     column = request.args.get("column", "")
-    if column == "":
-        return jsonify({"error": "'column' required"}), 400
     plot_type = request.args.get("plot_type", "histogram")
-    if plot_type not in ["histogram", "scatter"]:
+    x = request.args.get("x", None)
+    mode = request.args.get("mode", "auto")
+    bins = request.args.get("bins", HISTOGRAM_BINS, type=int)
+    error = plot_spec_error(column, plot_type, x, mode, bins)
+    if error:
+        return jsonify({"error": error}), 400
+    output_format = request.args.get("format", "png")
+    if output_format not in ["png", "json"]:
+        return jsonify({"error": "Invalid format. Must be 'png' or 'json'"}), 400
+
+    if output_format == "png":
+        key = plot_storage_key(file_id, column, plot_type, x, mode, bins)
+        path = find_plot(key)
+        if path is not None:
+            return send_file(path, mimetype="image/png", etag=key)
+    # Неизвестная колонка не доходит до чтения файла
+    error = plot_columns_error(data_file_or_404(file_id), column, x)
+    if error:
+        return jsonify({"error": error}), 400
+    plot = None
+    if output_format == "json":
+        plot = get_cached_plot(file_id, column, plot_type, x, mode, bins)
+    job = None
+    if plot is None:
+        try:
+            job = generate_plot_task.delay(
+                file_id=file_id,
+                plot_type=plot_type,
+                column=column,
+                x=x,
+                mode=mode,
+                bins=bins,
+                render=output_format == "png",
+            )
+            if not job.ready():
+                return job_accepted(job)
+            if job.failed():
+                raise job.result
+            plot = db.session.get(DataPlot, job.result["plot_id"])
+        except Exception as e:
+            logger.warning("Plot of file %s failed: %s", file_id, e, exc_info=True)
+            return jsonify({"error": str(e)}), 400
+    if output_format == "json":
+        response = jsonify(plot.plot_json)
+    else:
+        # Ключ графика мог измениться: X по умолчанию - первая колонка
+        response = send_file(
+            plot_path(plot.storage_key), mimetype="image/png", etag=plot.storage_key
+        )
+    if job is not None:
+        response.headers["X-Job-Id"] = job.id
+    return response
+
+
+@bp.route("/data/<int:file_id>/plots", methods=["POST"])
+def create_plots(file_id):
+    """
+    Generates several plots at once
+
+    Body: {"plots": [{"column": ..., "plot_type": ..., "x": ..., "mode": ...,
+    "bins": ...}, ...]} with the same fields and defaults as the query of
+    GET /data/<id>/plot. The columns of all plots are read once and images
+    are rendered in parallel (see generate_plots). Returns a manifest with
+    the id and image URL of every plot, in the order of the request.
+    """
+    data_file = data_file_or_404(file_id, plots=True)
+    body = request.get_json(silent=True)
+    specs = body.get("plots") if isinstance(body, dict) else None
+    if not isinstance(specs, list) or not specs:
+        return jsonify({"error": "'plots' must be a non-empty list"}), 400
+    if len(specs) > PLOT_BATCH_MAX_PLOTS:
         return (
-            jsonify(
-                {
-                    "error": f"Invalid plot type: {plot_type}. Must be 'histogram' or 'scatter'"
-                }
-            ),
+            jsonify({"error": f"At most {PLOT_BATCH_MAX_PLOTS} plots per request"}),
             400,
         )
-    x = request.args.get("x", None)
-    try:
-        data = generate_plot(
-            file_id=file_id,
-            plot_type=plot_type,
-            column=column,
-            x=x,
+    plots = []
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            return jsonify({"error": f"plots[{i}]: must be an object"}), 400
+        spec = {
+            "column": spec.get("column", ""),
+            "plot_type": spec.get("plot_type", "histogram"),
+            "x": spec.get("x"),
+            "mode": spec.get("mode", "auto"),
+            "bins": spec.get("bins", HISTOGRAM_BINS),
+        }
+        error = plot_spec_error(**spec) or plot_columns_error(
+            data_file, spec["column"], spec["x"]
         )
-        return send_file(data, mimetype="image/png")
-    except Exception as e:
-        print(e)
-        return jsonify({"error": str(e)}), 400
+        if error:
+            return jsonify({"error": f"plots[{i}]: {error}"}), 400
+        plots.append(spec)
+
+    job = generate_plots_task.delay(file_id=file_id, specs=plots)
+    if not job.ready():
+        return job_accepted(job)
+    if job.failed():
+        return jsonify({"error": str(job.result)}), 400
+    manifest = [
+        {
+            **spec,
+            "plot_id": plot_id,
+            "url": url_for("api.get_plot_image", plot_id=plot_id),
+        }
+        for spec, plot_id in zip(plots, job.result["plot_ids"])
+    ]
+    return jsonify({"plots": manifest}), 200, {"X-Job-Id": job.id}
+
+
+@bp.route("/plots/<int:plot_id>", methods=["GET"])
+def get_plot_image(plot_id):
+    """Gets stored plot image"""
+    plot = db.get_or_404(DataPlot, plot_id)
+    path = find_plot(plot.storage_key) if plot.storage_key else None
+    if path is not None:
+        return send_file(path, mimetype="image/png", etag=plot.storage_key)
+    if plot.plot_data is None:
+        abort(404)
+    # Графики, сохраненные до появления хранилища, лежат в БД
+    return send_file(BytesIO(plot.plot_data), mimetype="image/png")
+
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Gets status of a background job.
+
+    Status is one of PENDING, STARTED, SUCCESS, FAILURE. Finished jobs include
+    the result (plot jobs return plot ids and image URLs) or the error message.
+    """
+    job = current_app.extensions["celery"].AsyncResult(job_id)
+    data = {"job_id": job.id, "status": job.state}
+    if job.successful():
+        result = job.result
+        if "plot_id" in result:
+            result = {
+                **result,
+                "url": url_for("api.get_plot_image", plot_id=result["plot_id"]),
+            }
+        elif "plot_ids" in result:
+            result = {
+                **result,
+                "urls": [
+                    url_for("api.get_plot_image", plot_id=plot_id)
+                    for plot_id in result["plot_ids"]
+                ],
+            }
+        data["result"] = result
+    elif job.failed():
+        data["error"] = str(job.result)
+    return jsonify(data)
+
+
+@bp.route("/db/pool", methods=["GET"])
+def get_pool_status():
+    """
+    Gets database connection pool status of this worker process.
+
+    Connections checked out, idle and over the pool size, and since the
+    start of the process: checkouts, pool timeouts, total and maximum wait
+    for a connection in seconds (see app.utils.db_pool).
+    """
+    return jsonify(pool_status(db.engine, current_app.config["DB_MAX_OVERFLOW"]))
 
 
 @bp.errorhandler(404)
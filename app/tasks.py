@@ -0,0 +1,64 @@
+from celery import shared_task
+from app.utils.data_processor import (
+    HISTOGRAM_BINS,
+    analyze_data,
+    clean_data,
+    generate_plot,
+    generate_plots,
+)
+from app.utils.multipart_upload import expire_sessions
+
+
+@shared_task
+def analyze_data_task(file_id: int, columns: list[str] | None = None) -> dict:
+    """Background basic statistics computation"""
+    return analyze_data(file_id=file_id, columns=columns)
+
+
+@shared_task
+def clean_data_task(
+    file_id: int, handle_duplicates: str, fill_missing: str, force: bool
+) -> dict:
+    """Background data cleaning"""
+    return clean_data(
+        file_id=file_id,
+        handle_duplicates=handle_duplicates,
+        fill_missing=fill_missing,
+        force=force,
+    )
+
+
+@shared_task
+def generate_plot_task(
+    file_id: int,
+    column: str,
+    plot_type: str,
+    x: str | None,
+    mode: str = "auto",
+    bins: int = HISTOGRAM_BINS,
+    render: bool = True,
+) -> dict:
+    """Background plot rendering. Returns id of the stored DataPlot"""
+    plot = generate_plot(
+        file_id=file_id,
+        column=column,
+        plot_type=plot_type,
+        x=x,
+        mode=mode,
+        bins=bins,
+        render=render,
+    )
+    return {"plot_id": plot.id}
+
+
+@shared_task
+def generate_plots_task(file_id: int, specs: list[dict]) -> dict:
+    """Background rendering of several plots. Returns ids of the stored DataPlots"""
+    plots = generate_plots(file_id=file_id, specs=specs)
+    return {"plot_ids": [plot.id for plot in plots]}
+
+
+@shared_task
+def expire_uploads_task() -> int:
+    """Periodic deletion of abandoned resumable uploads"""
+    return expire_sessions()
@@ -0,0 +1,165 @@
+"""
+Approximate basic statistics from a sample of rows.
+
+CSV files are sampled as blocks of whole lines read at random byte offsets
+(one offset in each of equal strata of the file), so a sample of a large
+file costs a few seeks instead of a full read. Other files (and CSV with a
+Parquet sidecar) are sampled by a reservoir in one streaming pass over
+their chunks.
+
+Estimates come with confidence intervals under the normal approximation:
+    - mean: x̄ ± z·s/√n,
+    - std: s·(1 ± z/√(2(n - 1))),
+    - median: the sketch quantiles at ranks 1/2 ± z/(2√n),
+    - correlation: tanh(atanh(r) ± z/√(n - 3)) (Fisher transformation).
+Min and max are the sample extremes: bounds of the true range, not
+estimates. Rows of a block are correlated, so for block samples the
+intervals are somewhat narrower than they should be.
+"""
+import os
+from io import BytesIO
+from statistics import NormalDist
+from typing import Iterable
+import numpy as np
+import pandas as pd
+from app.utils.schema import read_options
+from app.utils.streaming_stats import StreamingStats
+
+
+def csv_block_sample(
+    filepath: str,
+    schema: dict,
+    columns: list[str],
+    blocks: int,
+    block_bytes: int,
+    seed: int | None = None,
+) -> pd.DataFrame:
+    """
+    Rows of a CSV file from blocks at random byte offsets.
+
+    The file is split into `blocks` equal strata; from a random offset in
+    each one the partial line is skipped and whole lines of about
+    `block_bytes` are read. Lines that don't parse (an offset inside a
+    quoted value) are skipped; values are coerced to numbers.
+
+    Args:
+        filepath: Path to CSV file
+        schema: Schema of the file (see app.utils.schema)
+        columns: Columns to read
+        blocks: Number of blocks
+        block_bytes: Size of each block
+        seed: Seed of the offsets
+
+    Returns:
+        pd.DataFrame: Sampled rows of the columns
+    """
+    rng = np.random.default_rng(seed)
+    size = os.path.getsize(filepath)
+    parts = []
+    with open(filepath, "rb") as f:
+        start = len(f.readline()) if schema["header"] == 0 else 0
+        stratum = (size - start) / blocks
+        for i in range(blocks):
+            offset = start + int((i + rng.random()) * stratum)
+            f.seek(offset)
+            if offset > start:
+                f.readline()  # Дочитываем строку, в которую попало смещение
+            block = f.read(block_bytes)
+            parts.append(block[: block.rfind(b"\n") + 1])
+    options = read_options(schema, "csv", columns)
+    options.update(header=None, names=schema["columns"], dtype=None)
+    sample = pd.read_csv(BytesIO(b"".join(parts)), on_bad_lines="skip", **options)
+    return sample.apply(pd.to_numeric, errors="coerce")
+
+
+def reservoir_sample(
+    chunks: Iterable[pd.DataFrame], rows: int, seed: int | None = None
+) -> pd.DataFrame:
+    """
+    Uniform sample of at most `rows` rows in one pass over chunks.
+
+    Every row gets a random key, the rows with the smallest keys are kept.
+    """
+    rng = np.random.default_rng(seed)
+    kept = None
+    keys = np.empty(0)
+    for chunk in chunks:
+        chunk_keys = rng.random(len(chunk))
+        if kept is not None:
+            chunk = pd.concat([kept, chunk], ignore_index=True)
+            chunk_keys = np.concatenate([keys, chunk_keys])
+        if len(chunk) > rows:
+            order = np.argpartition(chunk_keys, rows - 1)[:rows]
+            chunk, chunk_keys = chunk.iloc[order], chunk_keys[order]
+        kept, keys = chunk.reset_index(drop=True), chunk_keys
+    return kept if kept is not None else pd.DataFrame()
+
+
+def approximate_stats(
+    sample: pd.DataFrame,
+    columns: list[str],
+    confidence: float = 0.95,
+    sketch_size: int = 1000,
+) -> dict:
+    """
+    Basic statistics of a sample with confidence intervals.
+
+    Args:
+        sample: Sampled rows
+        columns: Columns to estimate; non-numeric ones are left out
+        confidence: Confidence level of the intervals
+        sketch_size: KLL sketch parameter k for the median
+
+    Returns:
+        dict: Statistics in the shape of DataAnalysis.get_data() plus
+            "intervals" ({statistic: {column: [low, high]}}, the correlation
+            per column pair), "confidence" and "sample_rows"
+    """
+    stats = StreamingStats(columns=columns, sketch_size=sketch_size)
+    stats.update(sample.reindex(columns=columns))
+    result = stats.result()
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    intervals = {"mean": {}, "median": {}, "std": {}, "correlation": {}}
+    numeric = list(result["mean"])
+    for column in numeric:
+        i = columns.index(column)
+        n = stats.n[i, i]
+        mean, std = result["mean"][column], result["std"][column]
+        if n > 1:
+            half = z * std / np.sqrt(n)
+            intervals["mean"][column] = _interval(mean - half, mean + half)
+            spread = z / np.sqrt(2 * (n - 1))
+            intervals["std"][column] = _interval(std * (1 - spread), std * (1 + spread))
+        else:
+            intervals["mean"][column] = intervals["std"][column] = None
+        if n > 0:
+            # Доверительный интервал медианы - порядковые статистики выборки
+            half = z / (2 * np.sqrt(n))
+            sketch = stats.sketches[i]
+            intervals["median"][column] = _interval(
+                sketch.quantile(max(0.0, 0.5 - half)), sketch.quantile(min(1.0, 0.5 + half))
+            )
+        else:
+            intervals["median"][column] = None
+        intervals["correlation"][column] = {}
+        for other in numeric:
+            r = result["correlation"][column][other]
+            pairs = stats.n[i, columns.index(other)]
+            if pairs > 3 and not np.isnan(r):
+                with np.errstate(divide="ignore"):
+                    center, half = np.arctanh(r), z / np.sqrt(pairs - 3)
+                interval = _interval(np.tanh(center - half), np.tanh(center + half))
+            else:
+                interval = None
+            intervals["correlation"][column][other] = interval
+    return {
+        **result,
+        "intervals": intervals,
+        "confidence": confidence,
+        "sample_rows": len(sample),
+    }
+
+
+def _interval(low: float, high: float) -> list[float | None]:
+    """JSON-friendly interval, NaN bounds become None"""
+    return [None if np.isnan(v) else float(v) for v in (low, high)]
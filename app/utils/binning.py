@@ -0,0 +1,95 @@
+import numpy as np
+
+
+def finite_pairs(x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Pairs of values where both coordinates are finite numbers"""
+    mask = np.isfinite(x) & np.isfinite(y)
+    return x[mask], y[mask]
+
+
+def density_grid(
+    x: np.ndarray, y: np.ndarray, bins: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Count points in a bins x bins grid over the data extent.
+
+    Works in one vectorized pass: cell indices are computed for all points
+    and counted with np.bincount, so the cost is O(rows) of arithmetic and
+    the result size depends only on the grid.
+
+    Args:
+        x: X coordinates (finite)
+        y: Y coordinates (finite)
+        bins: Cells per axis
+
+    Returns:
+        tuple: (counts of shape (bins, bins) indexed [x, y], x edges, y edges)
+    """
+    x_edges = _edges(x, bins)
+    y_edges = _edges(y, bins)
+    ix = _cell_index(x, x_edges)
+    iy = _cell_index(y, y_edges)
+    counts = np.bincount(ix * bins + iy, minlength=bins * bins)
+    return counts.reshape(bins, bins), x_edges, y_edges
+
+
+def histogram_edges(low: float, high: float, bins: int) -> np.ndarray:
+    """Edges of bins equal-width bins over [low, high]"""
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def bin_counts(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Count values in equal-width bins, like np.histogram with these edges.
+
+    NaN and values outside the edges are ignored.
+    """
+    values = values[(values >= edges[0]) & (values <= edges[-1])]
+    return np.bincount(_cell_index(values, edges), minlength=edges.size - 1)
+
+
+def stratified_sample(
+    x: np.ndarray, max_points: int, strata: int, seed: int = 0
+) -> np.ndarray:
+    """
+    Indices of a sample stratified by equal-width bins of x.
+
+    Every bin keeps up to max_points // strata randomly chosen points, so
+    sparse regions (tails, outliers) stay visible while dense ones are
+    thinned out.
+
+    Args:
+        x: Values that define the strata (finite)
+        max_points: Upper bound of the sample size
+        strata: Number of bins
+        seed: Seed of the random choice within bins
+
+    Returns:
+        np.ndarray: Sorted indices of sampled points
+    """
+    if x.size <= max_points:
+        return np.arange(x.size)
+    per_stratum = max(1, max_points // strata)
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(x.size)
+    stratum = _cell_index(x[order], _edges(x, strata))
+    # Устойчивая сортировка сохраняет случайный порядок внутри корзин
+    by_stratum = np.argsort(stratum, kind="stable")
+    sorted_strata = stratum[by_stratum]
+    starts = np.searchsorted(sorted_strata, sorted_strata, side="left")
+    rank = np.arange(x.size) - starts
+    return np.sort(order[by_stratum[rank < per_stratum]])
+
+
+def _edges(values: np.ndarray, bins: int) -> np.ndarray:
+    low, high = (float(values.min()), float(values.max())) if values.size else (0.0, 1.0)
+    return histogram_edges(low, high, bins)
+
+
+def _cell_index(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Bin of each value; the last bin includes its right edge"""
+    bins = edges.size - 1
+    scaled = (values - edges[0]) / (edges[-1] - edges[0]) * bins
+    return np.clip(scaled.astype(np.int64), 0, bins - 1)
@@ -0,0 +1,86 @@
+"""
+Request-scoped access to DataFile records.
+
+A file is fetched once per application context (a request, or a job run by
+a worker) together with its analyses in a single joined query, and later
+lookups of the same file, including those of jobs executed eagerly inside
+the request, are served from flask.g. Plot records can be loaded with the
+file in one more query; only their cache keys are loaded, the plot data is
+fetched on access.
+"""
+from flask import abort, g
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from app.extensions import db
+from app.models import DataAnalysis, DataFile, DataPlot
+
+# Колонки ключа кэша графика (см. get_cached_plot) и адрес картинки
+PLOT_KEY_COLUMNS = (
+    DataPlot.plot_type,
+    DataPlot.column_name,
+    DataPlot.x_column,
+    DataPlot.params_hash,
+    DataPlot.storage_key,
+)
+
+
+def get_data_file(file_id: int, plots: bool = False) -> DataFile | None:
+    """
+    DataFile with its analyses loaded, fetched once per application context.
+
+    Args:
+        file_id: ID of DataFile record
+        plots: Also load cache keys of the file's plots (selectin)
+
+    Returns:
+        DataFile | None: Record or None if it doesn't exist
+    """
+    files = g.setdefault("data_files", {})
+    data_file = files.get(file_id)
+    if data_file is None:
+        stmt = (
+            select(DataFile)
+            .where(DataFile.id == file_id)
+            .options(joinedload(DataFile.analyses))
+        )
+        if plots:
+            stmt = stmt.options(
+                selectinload(DataFile.plots).options(load_only(*PLOT_KEY_COLUMNS))
+            )
+        data_file = db.session.scalars(stmt).unique().first()
+        if data_file is not None:
+            files[file_id] = data_file
+    elif plots and "plots" not in data_file.__dict__:
+        # Файл уже загружен в этом запросе без графиков
+        stmt = (
+            select(DataPlot)
+            .where(DataPlot.data_file_id == file_id)
+            .options(load_only(*PLOT_KEY_COLUMNS))
+        )
+        set_committed_value(data_file, "plots", list(db.session.scalars(stmt)))
+    return data_file
+
+
+def data_file_or_404(file_id: int, plots: bool = False) -> DataFile:
+    """get_data_file that aborts with 404 for a missing file"""
+    data_file = get_data_file(file_id, plots=plots)
+    if data_file is None:
+        abort(404)
+    return data_file
+
+
+def find_analysis(data_file: DataFile, analysis_type: str) -> DataAnalysis | None:
+    """Analysis of a loaded file by type, without a query"""
+    return next(
+        (a for a in data_file.analyses if a.analysis_type == analysis_type), None
+    )
+
+
+def expire_loaded() -> None:
+    """
+    Forget records loaded in this application context, so that later lookups
+    read them again and see what concurrent requests stored since
+    """
+    g.pop("data_files", None)
+    db.session.expire_all()
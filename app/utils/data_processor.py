@@ -1,19 +1,85 @@
 from datetime import datetime
 from typing import Any, Dict
+import functools
+import hashlib
+import json
+import math
+import numpy as np
 import pandas as pd
 from flask import current_app
-from sqlalchemy import select
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm.attributes import set_committed_value
 from werkzeug.utils import secure_filename
 import os
 from app.extensions import db
-from app.models import DataFile, DataAnalysis, DataPlot
+from app.models import DataFile, DataAnalysis, DataPlot, ColumnStats
 from werkzeug.datastructures import FileStorage
-from io import BytesIO
 import tempfile
-import matplotlib.pyplot as plt
+from pandas.api.types import is_numeric_dtype
+from app.utils.data_access import expire_loaded, find_analysis, get_data_file
+from app.utils.loader import (
+    dataset_columns,
+    dataset_schema,
+    file_schema,
+    get_filepath,
+    has_fresh_sidecar,
+    iter_dataset_chunks,
+    load_dataset,
+    schedule_sidecar,
+)
+from app.utils.approx_stats import (
+    approximate_stats,
+    csv_block_sample,
+    reservoir_sample,
+)
+from app.utils.binning import (
+    bin_counts,
+    density_grid,
+    finite_pairs,
+    histogram_edges,
+)
+from app.utils import metrics
+from app.utils.excel import write_xlsx
+from app.utils.parallel_stats import compute_parallel_stats
+from app.utils.plot_store import find_plot, plot_key, store_plot
+from app.utils.rendering import render_histogram, render_many, render_scatter
+from app.utils.schema import numeric_columns
+from app.utils.single_flight import coalesce
+from app.utils.streaming_clean import clean_csv_streaming
+from app.utils.streaming_stats import StreamingStats, compute_streaming_stats
+from app.utils.upload_store import HashingFile, commit_file, commit_upload, copy_to_upload
 
 
-reading_methods = {"csv": pd.read_csv, "xlsx": pd.read_excel}
+# Параметры отрисовки входят в адрес графика: их изменение дает новые картинки
+PLOT_RENDER_OPTIONS = {"format": "png", "dpi": 100}
+
+# Режимы scatter: все точки, сетка плотности, стратифицированная выборка
+SCATTER_MODES = ("auto", "points", "density", "sample")
+
+HISTOGRAM_BINS = 10  # Как у DataFrame.hist по умолчанию
+HISTOGRAM_MAX_BINS = 1000
+PLOT_BATCH_MAX_PLOTS = 100
+
+
+def instrumented(operation: str, plots: bool = False):
+    """
+    Record metrics of a processing entry point taking file_id first as the
+    operation, labeled by the type of the file (see app.utils.metrics).
+    The file is fetched as the entry point itself fetches it, so no query
+    is added.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(file_id: int, *args, **kwargs):
+            data_file = get_data_file(file_id, plots=plots)
+            with metrics.operation(operation, data_file.file_type if data_file else ""):
+                return func(file_id, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
 
 
 def allowed_file(filename: str) -> bool:
@@ -30,85 +96,699 @@ def allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in extensions
 
 
-def save_file(file: FileStorage) -> tuple[str, str]:
+def save_file(file: FileStorage) -> tuple[str, str, bool]:
     """
-    Save uploaded file with unique filename to prevent overwrites.
+    Save uploaded file under its content address.
 
-    Generates sequential filenames if duplicate exists (e.g., "file (1).csv").
+    Files streamed by UploadRequest are already hashed on disk and are only
+    linked into place; other streams are copied in UPLOAD_CHUNK_BYTES
+    chunks. Identical content is stored once.
 
     Args:
         file: Werkzeug FileStorage object to save
 
     Returns:
-        tuple: (unique_filename, full_filepath)
+        tuple: (content-addressed filename, full filepath, True if the
+            content was not stored before)
+    """
+    file_type = secure_filename(file.filename).rsplit(".", 1)[1].lower()
+    upload = file.stream
+    if not isinstance(upload, HashingFile):
+        upload = copy_to_upload(upload, current_app.config["UPLOAD_CHUNK_BYTES"])
+    return commit_upload(upload, file_type)
+
+
+def register_file(
+    filename: str, filepath: str, file_type: str, original_filename: str
+) -> tuple[DataFile, bool]:
+    """
+    DataFile record of a stored file, created if the content is new.
+
+    The record is added to the session; the caller commits it with the rest
+    of the operation. A new record gets the file schema (see app.utils.schema), and background
+    conversion of the file to a Parquet sidecar is queued unless it is a CSV
+    large enough to be processed in chunks. XLSX can't be read in chunks and
+    is always converted, so the workbook is parsed only once.
+
+    Args:
+        filename: Content-addressed filename (see save_file)
+        filepath: Full path of the file
+        file_type: File extension
+        original_filename: Name given by the user or the parent file name
+
+    Returns:
+        tuple: (DataFile, True if the record was created)
+    """
+    stmt = select(DataFile).where(DataFile.filename == filename)
+    existing = db.session.scalar(stmt)
+    if existing is not None:
+        return existing, False
+    schema = file_schema(filepath, file_type)
+    insert_stmt = (
+        insert(DataFile)
+        .values(
+            filename=filename,
+            file_type=file_type,
+            file_size=os.path.getsize(filepath),
+            original_filename=original_filename,
+            upload_date=datetime.now(),
+            file_schema=schema,
+        )
+        .on_conflict_do_nothing(index_elements=["filename"])
+        .returning(DataFile)
+    )
+    data_file = db.session.scalar(insert_stmt)
+    if data_file is None:
+        # Такой же файл зарегистрирован параллельной загрузкой
+        return db.session.scalar(stmt), False
+    # У новой записи анализов нет: их список не загружается запросом
+    set_committed_value(data_file, "analyses", [])
+    # Большие CSV читаются по частям: копия в Parquet требует полной загрузки
+    large = data_file.file_size >= current_app.config["LARGE_FILE_THRESHOLD_BYTES"]
+    if file_type == "xlsx" or not large:
+        if not has_fresh_sidecar(filepath):
+            schedule_sidecar(filepath, file_type, schema)
+    return data_file, True
+
+
+def get_cached_analysis(file_id: int, analysis_type: str) -> DataAnalysis | None:
+    """
+    Find stored analysis of a data file.
+
+    Analyses are loaded with the file once per request (see get_data_file).
+
+    Args:
+        file_id: ID of DataFile record
+        analysis_type: 'basic_stats', 'approx_stats' or 'cleaning'
+
+    Returns:
+        DataAnalysis | None: Stored analysis or None if not computed yet
+    """
+    data_file = get_data_file(file_id)
+    return find_analysis(data_file, analysis_type) if data_file else None
+
+
+def cached_analysis_data(file_id: int, analysis_type: str) -> dict | None:
+    """Data of a stored analysis (see DataAnalysis.get_data) or None"""
+    analysis = get_cached_analysis(file_id, analysis_type)
+    return analysis.get_data() if analysis else None
+
+
+def save_analysis(
+    data_file: DataFile, analysis_type: str, replace: bool = False, **values
+) -> DataAnalysis:
+    """
+    Store the analysis of a file with INSERT ... ON CONFLICT.
+
+    A file has one analysis of each type (unique data_file_id, analysis_type),
+    so concurrent requests that computed the same analysis don't create
+    duplicates: the first stored result is kept and returned to all of them,
+    or, with replace, the last one overwrites it. The loaded analyses of
+    data_file are updated; the caller commits.
+
+    Args:
+        data_file: Analyzed file
+        analysis_type: 'basic_stats', 'approx_stats' or 'cleaning'
+        replace: Overwrite a stored analysis of the type
+        **values: Column values of the analysis
+
+    Returns:
+        DataAnalysis: Stored analysis
+    """
+    values = {"analysis_date": datetime.now(), **values}
+    stmt = insert(DataAnalysis).values(
+        data_file_id=data_file.id, analysis_type=analysis_type, **values
+    )
+    if replace:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["data_file_id", "analysis_type"],
+            set_={name: stmt.excluded[name] for name in values},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=["data_file_id", "analysis_type"]
+        )
+    analysis = db.session.scalar(
+        stmt.returning(DataAnalysis), execution_options={"populate_existing": True}
+    )
+    if analysis is None:
+        # Анализ уже сохранен параллельным запросом
+        analysis = db.session.scalar(
+            select(DataAnalysis)
+            .where(
+                DataAnalysis.data_file_id == data_file.id,
+                DataAnalysis.analysis_type == analysis_type,
+            )
+            .execution_options(populate_existing=True)
+        )
+    analyses = [a for a in data_file.analyses if a.analysis_type != analysis_type]
+    set_committed_value(data_file, "analyses", analyses + [analysis])
+    return analysis
+
+
+def plot_params_hash(options: dict) -> str:
+    """Short hash of plot render options, part of the plot cache key"""
+    payload = json.dumps(options, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def plot_cache_key(plot: DataPlot) -> tuple:
+    """Cache key of a stored plot: plot type, column, x column, params hash"""
+    return (plot.plot_type, plot.column_name, plot.x_column, plot.params_hash)
+
+
+def plot_options(
+    plot_type: str, mode: str = "auto", bins: int = HISTOGRAM_BINS
+) -> dict:
+    """
+    Render options of a plot: histograms add the number of bins, scatter
+    plots their mode and its settings
+    """
+    options = dict(PLOT_RENDER_OPTIONS)
+    if plot_type == "histogram":
+        options.update(bins=bins)
+    elif plot_type == "scatter":
+        config = current_app.config
+        options.update(
+            mode=mode,
+            density_threshold=config["SCATTER_DENSITY_THRESHOLD_ROWS"],
+            grid=config["SCATTER_GRID_SIZE"],
+            sample_points=config["SCATTER_SAMPLE_POINTS"],
+        )
+    return options
+
+
+def plot_storage_key(
+    file_id: int,
+    column: str,
+    plot_type: str,
+    x: str | None,
+    mode: str = "auto",
+    bins: int = HISTOGRAM_BINS,
+) -> str:
+    """Address of a plot in the plot store (see plot_store.plot_key)"""
+    columns = [column] if plot_type == "histogram" else [x, column]
+    return plot_key(file_id, plot_type, columns, plot_options(plot_type, mode, bins))
+
+
+def get_cached_plot(
+    file_id: int,
+    column: str,
+    plot_type: str,
+    x: str | None = None,
+    mode: str = "auto",
+    bins: int = HISTOGRAM_BINS,
+) -> DataPlot | None:
+    """
+    Find stored plot of a data file column.
+
+    Args:
+        file_id: ID of DataFile record
+        column: Plotted column (Y axis of scatter plots)
+        plot_type: 'histogram' or 'scatter'
+        x: X axis column of scatter plots (ignored for histograms)
+        mode: Scatter rendering mode (ignored for histograms)
+        bins: Number of histogram bins (ignored for scatter plots)
+
+    Returns:
+        DataPlot | None: Stored plot or None if not computed yet
+    """
+    options = plot_options(plot_type, mode, bins)
+    stmt = select(DataPlot).where(
+        DataPlot.data_file_id == file_id,
+        DataPlot.plot_type == plot_type,
+        DataPlot.column_name == column,
+        DataPlot.x_column == (x if plot_type == "scatter" else None),
+        DataPlot.params_hash == plot_params_hash(options),
+    )
+    return db.session.scalar(stmt)
+
+
+def cached_column_ranges(
+    data_file: DataFile, columns: list[str]
+) -> dict[str, tuple[float, float] | None]:
+    """
+    Min and max of columns from stored statistics, without reading data.
+
+    Columns not covered by basic_stats are looked up in ColumnStats with one
+    query.
+
+    Returns:
+        dict: (min, max) per column, None if the column was not analyzed
+    """
+    analysis = find_analysis(data_file, "basic_stats")
+    ranges = {}
+    if analysis is not None:
+        for column in columns:
+            if column in (analysis.stats_min or {}):
+                ranges[column] = (analysis.stats_min[column], analysis.stats_max[column])
+    missing = [column for column in columns if column not in ranges]
+    if missing:
+        stmt = select(ColumnStats).where(
+            ColumnStats.data_file_id == data_file.id,
+            ColumnStats.column_name.in_(missing),
+            ColumnStats.is_numeric,
+        )
+        for row in db.session.scalars(stmt):
+            ranges[row.column_name] = (row.min, row.max)
+    result = {}
+    for column in columns:
+        low, high = ranges.get(column, (None, None))
+        low, high = _json_float(low), _json_float(high)
+        result[column] = None if low is None or high is None else (low, high)
+    return result
+
+
+def _numeric_values(values: pd.Series) -> np.ndarray:
+    """Non-missing values of a numeric column as floats"""
+    if not is_numeric_dtype(values):
+        raise ValueError(f"Column '{values.name}' is not numeric")
+    array = values.to_numpy(dtype=float, na_value=np.nan)
+    return array[~np.isnan(array)]
+
+
+def compute_histograms(
+    data_file: DataFile,
+    requests: list[tuple[str, int]],
+    df: pd.DataFrame | None = None,
+) -> list[dict]:
+    """
+    Histograms of numeric columns as bin edges and counts.
+
+    Values are binned with NumPy into equal-width bins between each column's
+    min and max. All requested columns are read together: small files are
+    loaded once, large files are streamed once. If the min and max are
+    stored (basic_stats or column statistics), edges are fixed up front;
+    otherwise large files take an extra pass to find them.
+
+    Args:
+        data_file: DataFile record
+        requests: (numeric column, number of bins) pairs
+        df: Already loaded frame with these columns (small files only)
+
+    Returns:
+        list: {"bins": edges, "counts": counts} per request, JSON-serializable
+
+    Raises:
+        ValueError: If some of the columns is not numeric
+    """
+    config = current_app.config
+    columns = list(dict.fromkeys(column for column, _ in requests))
+    ranges = cached_column_ranges(data_file, columns)
+    if data_file.file_size >= config["LARGE_FILE_THRESHOLD_BYTES"]:
+
+        def chunks():
+            for chunk in iter_dataset_chunks(
+                data_file, config["STREAMING_CHUNK_ROWS"], columns=columns
+            ):
+                yield {column: _numeric_values(chunk[column]) for column in columns}
+
+        unknown = [column for column in columns if ranges[column] is None]
+        if unknown:
+            low = dict.fromkeys(unknown, np.inf)
+            high = dict.fromkeys(unknown, -np.inf)
+            for values in chunks():
+                for column in unknown:
+                    if values[column].size:
+                        low[column] = min(low[column], values[column].min())
+                        high[column] = max(high[column], values[column].max())
+            for column in unknown:
+                found = low[column] <= high[column]
+                ranges[column] = (low[column], high[column]) if found else (0.0, 1.0)
+        edges = [histogram_edges(*ranges[column], bins) for column, bins in requests]
+        counts = [np.zeros(e.size - 1, dtype=np.int64) for e in edges]
+        for values in chunks():
+            for i, (column, _) in enumerate(requests):
+                counts[i] += bin_counts(values[column], edges[i])
+    else:
+        if df is None:
+            df = load_dataset(data_file, columns=columns)
+        values = {column: _numeric_values(df[column]) for column in columns}
+        for column in columns:
+            if ranges[column] is None:
+                v = values[column]
+                ranges[column] = (v.min(), v.max()) if v.size else (0.0, 1.0)
+        edges = [histogram_edges(*ranges[column], bins) for column, bins in requests]
+        counts = [bin_counts(values[column], e) for (column, _), e in zip(requests, edges)]
+    return [{"bins": e.tolist(), "counts": c.tolist()} for e, c in zip(edges, counts)]
+
+
+def scatter_mode(x_values: pd.Series, y_values: pd.Series, options: dict) -> str:
+    """
+    Resolve the rendering mode of a scatter plot.
+
+    'auto' draws every point unless there are more than density_threshold
+    rows of numeric data, which are aggregated into a density grid instead.
+
+    Raises:
+        ValueError: If density or sample mode is requested for non-numeric data
+    """
+    numeric = is_numeric_dtype(x_values) and is_numeric_dtype(y_values)
+    mode = options["mode"]
+    if mode == "auto":
+        large = len(x_values) > options["density_threshold"]
+        return "density" if numeric and large else "points"
+    if mode != "points" and not numeric:
+        raise ValueError(f"Scatter mode '{mode}' needs numeric columns")
+    return mode
+
+
+def scatter_payload(
+    df: pd.DataFrame, column: str, x: str, max_points: int, mode: str
+) -> dict:
+    """
+    Data of a scatter plot for client-side rendering, bounded in size.
+
+    Density plots are described by a grid of point counts with at most
+    max_points cells, other modes by at most max_points points sampled
+    uniformly without replacement.
+
+    Returns:
+        dict: JSON-serializable payload for DataPlot.plot_json
+    """
+    if mode == "density":
+        x_values, y_values = finite_pairs(
+            df[x].to_numpy(dtype=float, na_value=np.nan),
+            df[column].to_numpy(dtype=float, na_value=np.nan),
+        )
+        counts, x_edges, y_edges = density_grid(
+            x_values, y_values, max(1, math.isqrt(max_points))
+        )
+        return {
+            "x_edges": x_edges.tolist(),
+            "y_edges": y_edges.tolist(),
+            "counts": counts.tolist(),
+            "total_points": int(x_values.size),
+        }
+    # X может совпадать с колонкой графика: колонка берется один раз
+    points = df[list(dict.fromkeys([x, column]))].dropna()
+    total = len(points)
+    if total > max_points:
+        rng = np.random.default_rng(0)
+        points = points.iloc[np.sort(rng.choice(total, max_points, replace=False))]
+    return {
+        "x": points[x].tolist(),
+        "y": points[column].tolist(),
+        "total_points": total,
+    }
+
+
+STATS_KEYS = ["mean", "median", "correlation", "std", "min", "max"]
+
+
+def compute_basic_stats(df: pd.DataFrame) -> dict:
+    """
+    Compute basic statistics of numeric columns of an in-memory table.
+
+    Returns:
+        dict: mean, median, correlation, std, min and max per column
+    """
+    return {
+        "mean": df.mean(numeric_only=True).to_dict(),
+        "median": df.median(numeric_only=True).to_dict(),
+        "correlation": df.corr(numeric_only=True).to_dict(),
+        "std": df.std(numeric_only=True).to_dict(),
+        "min": df.min(numeric_only=True).to_dict(),
+        "max": df.max(numeric_only=True).to_dict(),
+    }
+
+
+def _json_float(value) -> float | None:
+    """Float suitable for JSONB: NaN becomes None"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _column_stats_result(rows: dict[str, ColumnStats], columns: list[str]) -> dict:
+    """Statistics of numeric columns in the shape of DataAnalysis.get_data()"""
+    numeric = [c for c in columns if rows[c].is_numeric]
+    data = {key: {} for key in STATS_KEYS}
+    for column in numeric:
+        row = rows[column]
+        count = row.count or 0
+        data["mean"][column] = row.sum / count if count else None
+        data["median"][column] = row.median
+        data["correlation"][column] = {
+            other: row.correlation.get(other) for other in numeric
+        }
+        data["std"][column] = math.sqrt(row.m2 / (count - 1)) if count > 1 else None
+        data["min"][column] = row.min
+        data["max"][column] = row.max
+    return data
+
+
+def stats_subset(data: dict, columns: list[str]) -> dict:
+    """
+    Statistics of the listed columns cut from whole-file statistics.
+
+    Columns missing from the statistics (e.g. text ones) are skipped.
+    Confidence intervals of approximate statistics are cut the same way.
+    """
+    columns = [c for c in columns if c in data["mean"]]
+
+    def cut(stats: dict) -> dict:
+        return {
+            key: (
+                {c: {o: values[c][o] for o in columns} for c in columns}
+                if key == "correlation"
+                else {c: values[c] for c in columns}
+            )
+            for key, values in stats.items()
+        }
+
+    subset = {**data, **cut({key: data[key] for key in STATS_KEYS})}
+    if data.get("intervals"):
+        subset["intervals"] = cut(data["intervals"])
+    return subset
+
+
+def get_cached_column_stats(file_id: int, columns: list[str]) -> dict | None:
+    """
+    Statistics of a column subset from stored aggregates, without reading data.
+
+    Uses the whole-file basic_stats analysis when it covers the columns,
+    otherwise per-column ColumnStats records.
+
+    Args:
+        file_id: ID of DataFile record
+        columns: Requested columns
+
+    Returns:
+        dict | None: Statistics in the shape of DataAnalysis.get_data(), or
+            None if some of the columns (or column pairs) are not computed yet
+    """
+    analysis = get_cached_analysis(file_id, "basic_stats")
+    if analysis and all(c in (analysis.stats_mean or {}) for c in columns):
+        return stats_subset(analysis.get_data(), columns)
+
+    stmt = select(ColumnStats).where(
+        ColumnStats.data_file_id == file_id,
+        ColumnStats.column_name.in_(columns),
+    )
+    rows = {row.column_name: row for row in db.session.scalars(stmt)}
+    if any(c not in rows for c in columns):
+        return None
+    numeric = [c for c in columns if rows[c].is_numeric]
+    if any(o not in rows[c].correlation for c in numeric for o in numeric):
+        return None
+    return _column_stats_result(rows, columns)
+
+
+def analyze_columns(file_id: int, columns: list[str]) -> dict:
+    """
+    Statistics of a column subset, computing only what is not stored yet.
+
+    Reads from disk only the columns without stored aggregates (and columns
+    whose correlation with them is missing), then saves count, sum, sum of
+    squared deviations, min, max, median, quantile sketch and correlations
+    of each column to ColumnStats.
+
+    Args:
+        file_id: ID of DataFile record to analyze
+        columns: Columns to analyze
+
+    Returns:
+        dict: Statistics of numeric columns in the shape of DataAnalysis.get_data()
+
+    Raises:
+        ValueError: If some of the columns don't exist in the file
+        RuntimeError: If file processing fails
     """
-    filename = secure_filename(file.filename)
-    upload_dir = current_app.config["UPLOAD_FOLDER"]
-    base, ext = os.path.splitext(filename)
-    counter = 1
-    new_filename = filename
+    cached = get_cached_column_stats(file_id, columns)
+    metrics.record_cache("result", cached is not None)
+    if cached is not None:
+        return cached
+    return coalesce(
+        ("column_stats", file_id, *sorted(columns)),
+        lambda: _analyze_columns(file_id, columns),
+        cached=lambda: get_cached_column_stats(file_id, columns),
+        refresh=expire_loaded,
+    )
+
+
+def _analyze_columns(file_id: int, columns: list[str]) -> dict:
+    """Compute and store ColumnStats of columns, reusing the stored ones"""
+    data_file = get_data_file(file_id)
+    existing = set(dataset_columns(data_file))
+    unknown = [c for c in columns if c not in existing]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
 
-    while os.path.exists(os.path.join(upload_dir, new_filename)):
-        new_filename = f"{base} ({counter}){ext}"
-        counter += 1
+    stmt = select(ColumnStats).where(
+        ColumnStats.data_file_id == file_id,
+        ColumnStats.column_name.in_(columns),
+    )
+    rows = {row.column_name: row for row in db.session.scalars(stmt)}
+    maybe_numeric = [c for c in columns if c not in rows or rows[c].is_numeric]
+    load = [
+        c
+        for c in columns
+        if c not in rows
+        or (rows[c].is_numeric and any(o not in rows[c].correlation for o in maybe_numeric))
+    ]
+
+    config = current_app.config
+    stats = StreamingStats(columns=load, sketch_size=config["STREAMING_SKETCH_SIZE"])
+    with metrics.stage("compute"):
+        try:
+            if data_file.file_size >= config["LARGE_FILE_THRESHOLD_BYTES"]:
+                chunks = iter_dataset_chunks(
+                    data_file, config["STREAMING_CHUNK_ROWS"], columns=load
+                )
+                for chunk in chunks:
+                    stats.update(chunk)
+                medians = {}
+            else:
+                df = load_dataset(data_file, columns=load)
+                stats.update(df)
+                medians = df.median(numeric_only=True).to_dict()
+        except Exception as e:
+            raise RuntimeError(e)
+        result = stats.result()
 
-    filepath = os.path.join(upload_dir, new_filename)
-    file.save(filepath)
-    return new_filename, filepath
+    for i, column in enumerate(load):
+        row = rows.get(column) or ColumnStats(data_file_id=file_id, column_name=column)
+        row.computed_at = datetime.now()
+        row.is_numeric = column in result["mean"]
+        if row.is_numeric:
+            row.count = int(stats.n[i, i])
+            row.sum = _json_float(stats.mean[i, i] * stats.n[i, i])
+            row.m2 = _json_float(stats.m2[i, i])
+            row.min = _json_float(result["min"][column])
+            row.max = _json_float(result["max"][column])
+            row.median = _json_float(medians.get(column, result["median"][column]))
+            row.sketch = stats.sketches[i].to_dict()
+            row.correlation = {
+                **(row.correlation or {}),
+                **{
+                    other: _json_float(value)
+                    for other, value in result["correlation"][column].items()
+                },
+            }
+        db.session.add(row)
+        rows[column] = row
+    with metrics.stage("db_write"):
+        db.session.commit()
+    return _column_stats_result(rows, columns)
 
 
-def analyze_data(file_id: int) -> dict:
+def compute_file_stats(data_file: DataFile) -> dict:
+    """Basic statistics of a data file, reading it in the cheapest way for its size"""
+    config = current_app.config
+    if (
+        data_file.file_type == "csv"
+        and config["PARALLEL_WORKERS"] > 1
+        and data_file.file_size >= 2 * config["PARALLEL_PARTITION_BYTES"]
+    ):
+        # Части CSV обрабатываются в пуле процессов
+        return compute_parallel_stats(
+            get_filepath(data_file),
+            workers=config["PARALLEL_WORKERS"],
+            partition_bytes=config["PARALLEL_PARTITION_BYTES"],
+            chunksize=config["STREAMING_CHUNK_ROWS"],
+            sketch_size=config["STREAMING_SKETCH_SIZE"],
+            schema=dataset_schema(data_file),
+        )
+    # Текстовые колонки в статистику не входят и не читаются
+    columns = numeric_columns(dataset_schema(data_file))
+    if data_file.file_size >= config["LARGE_FILE_THRESHOLD_BYTES"]:
+        # Файл больше порога: потоковый расчет по частям
+        chunks = iter_dataset_chunks(
+            data_file, config["STREAMING_CHUNK_ROWS"], columns=columns
+        )
+        return compute_streaming_stats(
+            chunks, sketch_size=config["STREAMING_SKETCH_SIZE"]
+        )
+    return compute_basic_stats(load_dataset(data_file, columns=columns))
+
+
+@instrumented("stats")
+def analyze_data(file_id: int, columns: list[str] | None = None) -> dict:
     """
     Perform basic statistical analysis on a data file.
 
     Checks for existing analysis in database before computing new statistics.
+    Files of LARGE_FILE_THRESHOLD_BYTES and more are processed in chunks with
+    mergeable accumulators (the median is then approximated by a sketch).
+    CSV files spanning at least two PARALLEL_PARTITION_BYTES partitions are
+    reduced the same way in a pool of PARALLEL_WORKERS processes. Statistics
+    of cleaned files are stored by clean_data, which computes them while
+    writing the file. A stored approximate analysis of the file (see
+    approximate_file_stats) is replaced by it.
 
     Args:
         file_id: ID of DataFile record to analyze
+        columns: Analyze only these columns (see analyze_columns)
 
     Returns:
         dict: Statistical results including mean, median, correlation, etc.
 
     Raises:
+        ValueError: If some of the requested columns don't exist
         RuntimeError: If file processing fails
     """
+    if columns:
+        return analyze_columns(file_id, columns)
     analysis_type = "basic_stats"
-    stmt = select(DataAnalysis).where(
-        DataAnalysis.data_file_id == file_id,
-        DataAnalysis.analysis_type == analysis_type,
-    )
-    data_analysis = db.session.scalar(stmt)
+    data_analysis = get_cached_analysis(file_id, analysis_type)
+    metrics.record_cache("result", data_analysis is not None)
     if data_analysis:
         return data_analysis.get_data()
-    try:
-        data_file = db.session.get(DataFile, file_id)
-        filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], data_file.filename)
-        # Проверка на наличие заголовков в таблице
-        first_row = reading_methods.get(data_file.file_type)(
-            filepath, header=None, nrows=1
-        )
-        if all(isinstance(x, str) for x in first_row.values[0]):
-            header = 0
-        else:
-            header = None
-        df = reading_methods.get(data_file.file_type)(filepath, header=header)
-        if header is None:
-            df.columns = [f"Column {col}" for col in df.columns]
+    # Одновременные запросы статистики файла считают ее один раз
+    return coalesce(
+        (analysis_type, file_id),
+        lambda: _analyze_file(file_id),
+        cached=lambda: cached_analysis_data(file_id, analysis_type),
+        refresh=expire_loaded,
+    )
+
 
+def _analyze_file(file_id: int) -> dict:
+    """Compute and store basic statistics of a whole file"""
+    analysis_type = "basic_stats"
+    try:
+        data_file = get_data_file(file_id)
+        with metrics.stage("compute"):
+            stats = compute_file_stats(data_file)
     except Exception as e:
         raise RuntimeError(e)
 
-    stats = {
-        "mean": df.mean(numeric_only=True).to_dict(),
-        "median": df.median(numeric_only=True).to_dict(),
-        "correlation": df.corr(numeric_only=True).to_dict(),
-        "std": df.std(numeric_only=True).to_dict(),
-        "min": df.min(numeric_only=True).to_dict(),
-        "max": df.max(numeric_only=True).to_dict(),
-    }
-    analysis = DataAnalysis(
-        data_file_id=file_id,
-        analysis_type="basic_stats",
+    with metrics.stage("db_write"):
+        analysis = save_basic_stats(data_file, stats)
+        db.session.commit()
+    return analysis.get_data()
+
+
+def save_basic_stats(data_file: DataFile, stats: dict) -> DataAnalysis:
+    """
+    Store exact basic statistics of a file in place of its approximate
+    analysis. The caller commits.
+    """
+    analysis = save_analysis(
+        data_file,
+        "basic_stats",
         stats_mean=stats["mean"],
         stats_median=stats["median"],
         stats_correlation=stats["correlation"],
@@ -116,64 +796,124 @@ def analyze_data(file_id: int) -> dict:
         stats_min=stats["min"],
         stats_max=stats["max"],
     )
-    db.session.add(analysis)
-    db.session.commit()
-    return stats
+    # Приближенная статистика файла заменяется точной
+    approximate = find_analysis(data_file, "approx_stats")
+    if approximate is not None:
+        db.session.delete(approximate)
+        set_committed_value(
+            data_file, "analyses", [a for a in data_file.analyses if a is not approximate]
+        )
+    return analysis
 
 
-def clean_data(
-    file_id: int,
-    handle_duplicates: str = "drop",  # ['drop', 'keep']
-    fill_missing: str = "mean",
-    force: bool = False,
-) -> Dict[str, Any]:
+@instrumented("approx_stats")
+def approximate_file_stats(file_id: int) -> dict | None:
     """
-    Clean data by handling duplicates and missing values.
+    Approximate basic statistics of a data file from a sample.
+
+    CSV files without a Parquet sidecar are sampled in APPROX_SAMPLE_BLOCKS
+    blocks of APPROX_BLOCK_BYTES at random offsets, other files by a
+    reservoir of APPROX_SAMPLE_ROWS rows (see app.utils.approx_stats). The
+    result is stored as an 'approx_stats' DataAnalysis, which analyze_data
+    later upgrades to exact statistics.
 
     Args:
-        file_id: ID of DataFile record to clean
+        file_id: ID of DataFile record
+
+    Returns:
+        dict | None: Statistics in the shape of DataAnalysis.get_data() with
+            confidence intervals, or None if the file is not larger than
+            the sample and exact statistics cost the same
+    """
+    analysis = get_cached_analysis(file_id, "approx_stats")
+    metrics.record_cache("result", analysis is not None)
+    if analysis:
+        return analysis.get_data()
+    config = current_app.config
+    data_file = get_data_file(file_id)
+    if data_file.file_size <= config["APPROX_SAMPLE_BLOCKS"] * config["APPROX_BLOCK_BYTES"]:
+        return None
+    return coalesce(
+        ("approx_stats", file_id),
+        lambda: _approximate_file(file_id),
+        cached=lambda: cached_analysis_data(file_id, "approx_stats"),
+        refresh=expire_loaded,
+    )
+
+
+def _approximate_file(file_id: int) -> dict:
+    """Sample a file, store and return its approximate statistics"""
+    config = current_app.config
+    data_file = get_data_file(file_id)
+    filepath = get_filepath(data_file)
+    schema = dataset_schema(data_file)
+    columns = numeric_columns(schema)
+    with metrics.stage("compute"):
+        try:
+            if data_file.file_type == "csv" and not has_fresh_sidecar(filepath):
+                sample = csv_block_sample(
+                    filepath,
+                    schema,
+                    columns,
+                    blocks=config["APPROX_SAMPLE_BLOCKS"],
+                    block_bytes=config["APPROX_BLOCK_BYTES"],
+                )
+            else:
+                chunks = iter_dataset_chunks(
+                    data_file, config["STREAMING_CHUNK_ROWS"], columns=columns
+                )
+                sample = reservoir_sample(chunks, config["APPROX_SAMPLE_ROWS"])
+            stats = approximate_stats(
+                sample,
+                columns,
+                confidence=config["APPROX_CONFIDENCE"],
+                sketch_size=config["STREAMING_SKETCH_SIZE"],
+            )
+        except Exception as e:
+            raise RuntimeError(e)
+
+    def clean(values: dict) -> dict:
+        # NaN не допускается в JSONB
+        return {
+            c: clean(v) if isinstance(v, dict) else _json_float(v)
+            for c, v in values.items()
+        }
+
+    with metrics.stage("db_write"):
+        analysis = save_analysis(
+            data_file,
+            "approx_stats",
+            stats_mean=clean(stats["mean"]),
+            stats_median=clean(stats["median"]),
+            stats_correlation=clean(stats["correlation"]),
+            stats_std=clean(stats["std"]),
+            stats_min=clean(stats["min"]),
+            stats_max=clean(stats["max"]),
+            stats_intervals=stats["intervals"],
+            confidence=stats["confidence"],
+            sample_rows=stats["sample_rows"],
+        )
+        db.session.commit()
+    return analysis.get_data()
+
+
+def clean_dataframe(
+    df: pd.DataFrame, handle_duplicates: str, fill_missing: str
+) -> tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Handle duplicates and missing values of an in-memory table.
+
+    Args:
+        df: Table to clean (modified in place)
         handle_duplicates: 'drop' to remove or 'keep' to preserve duplicates
         fill_missing: Strategy for missing values ('mean', 'median', 'zero')
-        force: Set True to force re-cleaning even if existing analysis exists
 
     Returns:
-        dict: Cleaning report with metrics and new file information
+        tuple: (cleaned DataFrame, cleaning report)
 
     Raises:
         ValueError: For invalid cleaning parameters
-        RuntimeError: If file processing fails
-
-    Creates:
-        - New DataFile entry for cleaned data
-        - DataAnalysis record of cleaning operation
     """
-    analysis_type = "cleaning"
-    if not force:
-        stmt = select(DataAnalysis).where(
-            DataAnalysis.data_file_id == file_id,
-            DataAnalysis.analysis_type == analysis_type,
-        )
-        data_cleaned = db.session.scalar(stmt)
-        if data_cleaned:
-            return data_cleaned.get_data()
-    try:
-        data_file = db.session.get(DataFile, file_id)
-        filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], data_file.filename)
-
-        # Проверка на наличие заголовков в таблице
-        first_row = reading_methods.get(data_file.file_type)(
-            filepath, header=None, nrows=1
-        )
-        if all(isinstance(x, str) for x in first_row.values[0]):
-            header = 0
-        else:
-            header = None
-        df = reading_methods.get(data_file.file_type)(filepath, header=header)
-        if header is None:
-            df.columns = [f"Column {col}" for col in df.columns]
-    except Exception as e:
-        raise RuntimeError(e)
-
     original_shape = df.shape
     data = {
         "duplicates_removed": 0,
@@ -186,7 +926,7 @@ def clean_data(
         duplicates = df.duplicated().sum()
         if duplicates > 0:
             df = df.drop_duplicates()
-            data["duplicates_removed"] = duplicates
+            data["duplicates_removed"] = int(duplicates)
         data["cleaning_report"]["actions_performed"].append("duplicates_dropped")
     elif handle_duplicates != "keep":
         raise ValueError("Invalid value for handle_duplicates. Valid: 'drop' or 'keep'")
@@ -217,55 +957,427 @@ def clean_data(
     }
     data["cleaning_report"]["actions_performed"].append("missing_values_filled")
 
-    # 3. Сохранение очищенных данных
-    cleaned_filename = f"cleaned_{data_file.filename}"
-    file_extension = data_file.file_type
-    buffer = BytesIO()
-    if file_extension == "csv":
-        df.to_csv(buffer, index=False, encoding="utf-8")
-        content_type = "text/csv"
-    elif file_extension == "xlsx":
-        with tempfile.NamedTemporaryFile(suffix=".xlsx") as tmp:
-            df.to_excel(tmp.name, index=False, engine="openpyxl")
-            buffer.write(tmp.read())
-        content_type = (
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-    buffer.seek(0)
-    cleaned_file = FileStorage(
-        stream=buffer, filename=cleaned_filename, content_type=content_type
-    )
-    new_filename, filepath = save_file(cleaned_file)
-    cleaned_data_file = DataFile(
-        filename=new_filename,
-        file_type=file_extension,
-        file_size=os.path.getsize(filepath),
-        original_filename=data_file.filename,
-        upload_date=datetime.now(),
-    )
-    db.session.add(cleaned_data_file)
-    db.session.commit()
-    data["cleaning_report"]["cleaned_file_id"] = cleaned_data_file.id
-    data["cleaning_report"]["cleaned_filename"] = new_filename
-    cleaning_analysis = DataAnalysis(
-        data_file_id=file_id,
-        analysis_date=datetime.now(),
-        analysis_type=analysis_type,
-        duplicates_removed=data["duplicates_removed"],
-        missing_values_filled=data["missing_values_filled"],
-        cleaning_report=data["cleaning_report"],
+    return df, data
+
+
+def save_cleaned_dataframe(
+    df: pd.DataFrame, data_file: DataFile
+) -> tuple[str, str, bool]:
+    """
+    Save cleaned table in the format of the original file.
+
+    The table is written straight to a temporary file of the upload folder
+    (XLSX with a streaming write-only workbook) and moved to its content
+    address.
+
+    Returns:
+        tuple: (content-addressed filename, full filepath, True if new), see save_file
+    """
+    config = current_app.config
+    fd, output_path = tempfile.mkstemp(dir=config["UPLOAD_FOLDER"], prefix=".cleaned-")
+    os.close(fd)
+    with metrics.stage("serialize"):
+        try:
+            if data_file.file_type == "xlsx":
+                write_xlsx(df, output_path)
+            else:
+                df.to_csv(output_path, index=False, encoding="utf-8")
+        except Exception:
+            os.remove(output_path)
+            raise
+        return commit_file(output_path, data_file.file_type, config["UPLOAD_CHUNK_BYTES"])
+
+
+@instrumented("clean")
+def clean_data(
+    file_id: int,
+    handle_duplicates: str = "drop",  # ['drop', 'keep']
+    fill_missing: str = "mean",
+    force: bool = False,
+) -> Dict[str, Any]:
+    """
+    Clean data by handling duplicates and missing values.
+
+    CSV files of LARGE_FILE_THRESHOLD_BYTES and more are cleaned in two
+    streaming passes without loading them whole.
+
+    Args:
+        file_id: ID of DataFile record to clean
+        handle_duplicates: 'drop' to remove or 'keep' to preserve duplicates
+        fill_missing: Strategy for missing values ('mean', 'median', 'zero')
+        force: Set True to force re-cleaning even if existing analysis exists
+
+    Returns:
+        dict: Cleaning report with metrics and new file information
+
+    Raises:
+        ValueError: For invalid cleaning parameters
+        RuntimeError: If file processing fails
+
+    Creates:
+        - New DataFile entry for cleaned data, unless cleaning changed
+          nothing (the report then refers to the source file)
+        - DataAnalysis record of cleaning operation
+    """
+    analysis_type = "cleaning"
+    requested = datetime.now()
+    if not force:
+        data_cleaned = get_cached_analysis(file_id, analysis_type)
+        metrics.record_cache("result", data_cleaned is not None)
+        if data_cleaned:
+            return data_cleaned.get_data()
+
+    def cached() -> dict | None:
+        # Повторной очистке подходит только отчет, сохраненный после запроса
+        analysis = get_cached_analysis(file_id, analysis_type)
+        if analysis and (not force or analysis.analysis_date >= requested):
+            return analysis.get_data()
+        return None
+
+    return coalesce(
+        (analysis_type, file_id, handle_duplicates, fill_missing, force),
+        lambda: _clean_file(file_id, handle_duplicates, fill_missing, force),
+        cached=cached,
+        refresh=expire_loaded,
     )
-    db.session.add(cleaning_analysis)
-    db.session.commit()
-    return data
 
 
-def generate_plot(file_id: int, column: str, plot_type: str, x: str | None):
-    stmt = select(DataPlot).where(
-        DataPlot.data_file_id == file_id,
-        DataPlot.plot_type == plot_type,
-        DataPlot.columns_used.has_key(column),
+def _changed(data: Dict[str, Any]) -> bool:
+    """Check that cleaning removed duplicates or filled missing values"""
+    return bool(data["duplicates_removed"] or data["missing_values_filled"])
+
+
+def _clean_file(
+    file_id: int, handle_duplicates: str, fill_missing: str, force: bool
+) -> Dict[str, Any]:
+    """
+    Clean a file, register the cleaned file and store the cleaning report.
+
+    If cleaning changes nothing, no file is written: the report refers to
+    the source file as the cleaned one and has file_changed False. Basic
+    statistics of a new cleaned file are computed from the data being
+    written and stored with it, so analyzing it later reads nothing.
+    """
+    analysis_type = "cleaning"
+    config = current_app.config
+    try:
+        data_file = get_data_file(file_id)
+        streaming = (
+            data_file.file_type == "csv"
+            and data_file.file_size >= config["LARGE_FILE_THRESHOLD_BYTES"]
+        )
+        if not streaming:
+            # Копия: кэшированный фрейм разделяется с другими запросами
+            df = load_dataset(data_file).copy()
+    except Exception as e:
+        raise RuntimeError(e)
+
+    if streaming:
+        # Большой CSV очищается потоково во временный файл папки загрузок
+        fd, output_path = tempfile.mkstemp(
+            dir=config["UPLOAD_FOLDER"], prefix=".cleaned-"
+        )
+        os.close(fd)
+        # Запись очищенного файла идет вместе с очисткой
+        with metrics.stage("compute"):
+            data = clean_csv_streaming(
+                data_file,
+                output_path,
+                handle_duplicates=handle_duplicates,
+                fill_missing=fill_missing,
+                chunksize=config["STREAMING_CHUNK_ROWS"],
+                hash_memory_bytes=config["CLEANING_HASH_MEMORY_BYTES"],
+                sketch_size=config["STREAMING_SKETCH_SIZE"],
+            )
+        stats = data.pop("stats")
+        if _changed(data):
+            with metrics.stage("serialize"):
+                new_filename, filepath, _ = commit_file(
+                    output_path, data_file.file_type, config["UPLOAD_CHUNK_BYTES"]
+                )
+        else:
+            os.remove(output_path)
+    else:
+        with metrics.stage("compute"):
+            df, data = clean_dataframe(df, handle_duplicates, fill_missing)
+            stats = compute_basic_stats(df) if _changed(data) else None
+        if _changed(data):
+            new_filename, filepath, _ = save_cleaned_dataframe(df, data_file)
+    # Новый файл и отчет об очистке сохраняются одной транзакцией
+    with metrics.stage("db_write"):
+        if _changed(data):
+            cleaned_data_file, _ = register_file(
+                new_filename, filepath, data_file.file_type, data_file.filename
+            )
+            save_basic_stats(cleaned_data_file, stats)
+        else:
+            # Данные не изменились: очищенный файл - сам исходный
+            cleaned_data_file = data_file
+        data["cleaning_report"]["file_changed"] = _changed(data)
+        data["cleaning_report"]["cleaned_file_id"] = cleaned_data_file.id
+        data["cleaning_report"]["cleaned_filename"] = cleaned_data_file.filename
+        # Повторная очистка (force) заменяет сохраненный отчет
+        cleaning_analysis = save_analysis(
+            data_file,
+            analysis_type,
+            replace=force,
+            duplicates_removed=data["duplicates_removed"],
+            missing_values_filled=data["missing_values_filled"],
+            cleaning_report=data["cleaning_report"],
+        )
+        db.session.commit()
+    return cleaning_analysis.get_data()
+
+
+def _has_image(plot: DataPlot) -> bool:
+    """Check that the image of a stored plot is in the plot store"""
+    return bool(plot.storage_key) and find_plot(plot.storage_key) is not None
+
+
+@instrumented("plot", plots=True)
+def generate_plots(
+    file_id: int, specs: list[dict], render: bool = True
+) -> list[DataPlot]:
+    """
+    Generate and cache several plots of a data file at once.
+
+    Columns of all plots that are not cached yet are read together (see
+    compute_histograms), and images are rendered in a pool of
+    PARALLEL_WORKERS processes.
+
+    Args:
+        file_id: ID of DataFile record to visualize
+        specs: Plot specifications with keys 'column', 'plot_type'
+            ('histogram' by default), 'x', 'mode' and 'bins' (see generate_plot)
+        render: Render PNG images. If False, only plot_json is computed
+            and matplotlib is not used
+
+    Returns:
+        list: Stored DataPlot per spec, in the order of specs
+
+    Raises:
+        ValueError: For invalid specs or non-numeric histogram columns
+        KeyError: If a column doesn't exist
+    """
+    # Ключи всех графиков файла загружаются вместе с ним, а не запросом на график
+    data_file = get_data_file(file_id, plots=True)
+    unique, spec_keys, todo = plan_plots(data_file, specs, render)
+    metrics.record_cache("result", not todo)
+    if not todo:
+        return [unique[key]["plot"] for key in spec_keys]
+
+    def cached() -> list[DataPlot] | None:
+        unique, spec_keys, todo = plan_plots(
+            get_data_file(file_id, plots=True), specs, render
+        )
+        return None if todo else [unique[key]["plot"] for key in spec_keys]
+
+    # Одновременные запросы тех же графиков строят их один раз
+    return coalesce(
+        ("plots", file_id, render, *sorted(unique, key=repr)),
+        lambda: _generate_plots(file_id, specs, render),
+        cached=cached,
+        refresh=expire_loaded,
     )
+
+
+def plan_plots(
+    data_file: DataFile, specs: list[dict], render: bool
+) -> tuple[dict[tuple, dict], list[tuple], list[dict]]:
+    """
+    Match plot specs with the stored plots of a file.
+
+    Returns:
+        tuple: (plot items by cache key, cache key per spec, items that
+            still have to be computed or rendered)
+
+    Raises:
+        ValueError: For invalid plot types or scatter modes
+    """
+    stored = {plot_cache_key(plot): plot for plot in data_file.plots}
+    first_column = None
+    unique: dict[tuple, dict] = {}
+    spec_keys = []
+    for spec in specs:
+        plot_type = spec.get("plot_type", "histogram")
+        column, x = spec["column"], spec.get("x")
+        mode, bins = spec.get("mode", "auto"), spec.get("bins", HISTOGRAM_BINS)
+        if plot_type == "histogram":
+            x = None
+        elif plot_type == "scatter":
+            if mode not in SCATTER_MODES:
+                raise ValueError(f"Invalid scatter mode: {mode}")
+            if x is None:
+                # Колонка X по умолчанию - первая
+                first_column = first_column or dataset_columns(data_file)[0]
+                x = first_column
+        else:
+            raise ValueError(f"Invalid plot type: {plot_type}")
+        options = plot_options(plot_type, mode, bins)
+        key = (plot_type, column, x, plot_params_hash(options))
+        spec_keys.append(key)
+        if key not in unique:
+            unique[key] = {
+                "plot_type": plot_type,
+                "column": column,
+                "x": x,
+                "mode": mode,
+                "bins": bins,
+                "options": options,
+                "plot": stored.get(key),
+            }
+
+    todo = [
+        item
+        for item in unique.values()
+        if item["plot"] is None
+        or (render and not _has_image(item["plot"]))
+    ]
+    return unique, spec_keys, todo
+
+
+def _generate_plots(file_id: int, specs: list[dict], render: bool) -> list[DataPlot]:
+    """Compute, render and store the plots of specs that are not stored yet"""
+    data_file = get_data_file(file_id, plots=True)
+    unique, spec_keys, todo = plan_plots(data_file, specs, render)
+    histograms = [
+        item
+        for item in todo
+        if item["plot_type"] == "histogram" and item["plot"] is None
+    ]
+    scatters = [item for item in todo if item["plot_type"] == "scatter"]
+    # Колонки всех графиков читаются одним вызовом; для больших файлов
+    # гистограммы считаются потоково в compute_histograms
+    large = data_file.file_size >= current_app.config["LARGE_FILE_THRESHOLD_BYTES"]
+    loaded = scatters if large else histograms + scatters
+    with metrics.stage("compute"):
+        df = None
+        if loaded:
+            columns = list(
+                dict.fromkeys(c for item in loaded for c in (item["x"], item["column"]) if c)
+            )
+            df = load_dataset(data_file, columns=columns)
+        if histograms:
+            payloads = compute_histograms(
+                data_file,
+                [(item["column"], item["bins"]) for item in histograms],
+                df=None if large else df,
+            )
+            for item, payload in zip(histograms, payloads):
+                item["payload"] = payload
+        if scatters:
+            max_points = current_app.config["PLOT_JSON_MAX_POINTS"]
+            for item in scatters:
+                x_values, y_values = df[item["x"]], df[item["column"]]
+                item["drawn_mode"] = scatter_mode(x_values, y_values, item["options"])
+                if item["plot"] is None:
+                    item["payload"] = scatter_payload(
+                        df, item["column"], item["x"], max_points, item["drawn_mode"]
+                    )
+    for item in todo:
+        if item["plot"] is not None:
+            item["payload"] = item["plot"].plot_json
+
+    if render and todo:
+        calls = []
+        for item in todo:
+            column, x = item["column"], item["x"]
+            if item["plot_type"] == "histogram":
+                args = (item["payload"], f"Histogram of {column}", item["options"])
+                calls.append((render_histogram, args))
+            else:
+                args = (
+                    df[x],
+                    df[column],
+                    item["drawn_mode"],
+                    f"Scatter plot: {x} vs {column}",
+                    item["options"],
+                )
+                calls.append((render_scatter, args))
+        with metrics.stage("render"):
+            images = render_many(calls, current_app.config["PARALLEL_WORKERS"])
+        with metrics.stage("serialize"):
+            for item, image in zip(todo, images):
+                item["storage_key"] = plot_storage_key(
+                    file_id,
+                    item["column"],
+                    item["plot_type"],
+                    item["x"],
+                    item["mode"],
+                    item["bins"],
+                )
+                store_plot(item["storage_key"], image)
+
+    new = []
+    for item in todo:
+        if item["plot"] is not None:
+            # Запись есть, но картинки нет (не рисовалась или пропала из хранилища)
+            item["plot"].storage_key = item.get("storage_key")
+        else:
+            new.append(item)
+    with metrics.stage("db_write"):
+        if new:
+            for key, plot in store_plots(data_file, new).items():
+                unique[key]["plot"] = plot
+        if todo:
+            db.session.commit()
+    return [unique[key]["plot"] for key in spec_keys]
+
+
+def store_plots(data_file: DataFile, items: list[dict]) -> dict[tuple, DataPlot]:
+    """
+    Insert plot records of a file with one INSERT ... ON CONFLICT.
+
+    A plot that a concurrent request stored first is kept; only its missing
+    storage_key is filled. The loaded plots of data_file are updated; the
+    caller commits.
+
+    Args:
+        data_file: Plotted file
+        items: Generated plots of generate_plots
+
+    Returns:
+        dict: Stored DataPlot by cache key (plot type, column, x column,
+            params hash)
+    """
+    rows = [
+        {
+            "data_file_id": data_file.id,
+            "plot_type": item["plot_type"],
+            "column_name": item["column"],
+            "x_column": item["x"],
+            "params_hash": plot_params_hash(item["options"]),
+            "storage_key": item.get("storage_key"),
+            "columns_used": list(dict.fromkeys(c for c in (item["x"], item["column"]) if c)),
+            "plot_json": item["payload"],
+            "created_at": datetime.now(),
+        }
+        for item in items
+    ]
+    stmt = insert(DataPlot).values(rows)
+    # DO UPDATE, а не DO NOTHING: RETURNING возвращает и уже сохраненные строки
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["data_file_id", "plot_type", "column_name", "x_column", "params_hash"],
+        set_={
+            "storage_key": func.coalesce(DataPlot.storage_key, stmt.excluded.storage_key)
+        },
+    ).returning(DataPlot)
+    plots = db.session.scalars(stmt, execution_options={"populate_existing": True}).all()
+    stored = {plot_cache_key(plot): plot for plot in plots}
+    loaded = [plot for plot in data_file.plots if plot_cache_key(plot) not in stored]
+    set_committed_value(data_file, "plots", loaded + plots)
+    return stored
+
+
+def generate_plot(
+    file_id: int,
+    column: str,
+    plot_type: str,
+    x: str | None,
+    mode: str = "auto",
+    bins: int = HISTOGRAM_BINS,
+    render: bool = True,
+) -> DataPlot:
     """
     Generate and cache data visualization plots for dataset columns.
 
@@ -279,72 +1391,41 @@ def generate_plot(file_id: int, column: str, plot_type: str, x: str | None):
             - 'histogram': Single column distribution
             - 'scatter': Relationship between two columns (requires x parameter)
         x: For scatter plots - column name for X-axis. If None, uses first column.
+        mode: Scatter rendering mode, one of SCATTER_MODES (see
+            rendering.draw_scatter).
+            'auto' switches to a density grid above SCATTER_DENSITY_THRESHOLD_ROWS
+        bins: Number of histogram bins
+        render: Render the PNG image. If False, only plot_json is computed
+            and matplotlib is not used
 
     Returns:
-        BytesIO: PNG image buffer ready for HTTP response
+        DataPlot: Stored plot, its PNG image (if rendered) is in the plot
+            store under storage_key
 
     Raises:
         ValueError: If invalid plot_type provided or column doesn't exist
         RuntimeError: If data loading or plot generation fails
 
     Creates:
-        - New DataPlot record with image binary and metadata
-        - Updates plot cache in database
+        - PNG image in the plot store (if rendered)
+        - New DataPlot record with metadata and plot_json
 
     Notes:
         - For scatter plots without specified x, uses first available column
-        - Histograms automatically handle numeric data only
-        - Plot images are stored as PNG binaries in database
-        - Column usage metadata stored in JSONB columns_used field
+        - Histograms handle numeric data only; they are binned with NumPy
+          (see compute_histograms) and drawn from the bin counts
+        - Plot images are stored as PNG files in the content-addressed plot
+          store (PLOT_FOLDER), the database keeps only their storage_key
+        - The plot is cached by file, plot type, column, x column and a hash
+          of render options; plot_json holds its data downsampled to at most
+          PLOT_JSON_MAX_POINTS points
 
     Example:
         # Generate histogram for 'age' column
-        img = generate_plot(123, 'age', 'histogram', None)
+        plot = generate_plot(123, 'age', 'histogram', None)
         
         # Generate scatter plot comparing 'height' and 'weight'
-        img = generate_plot(123, 'weight', 'scatter', 'height')
-    """
-    plot = db.session.scalar(stmt)
-    if plot:
-        img = BytesIO(plot.plot_data)
-        img.seek(0)
-        return img
-    data_file = db.session.get(DataFile, file_id)
-    filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], data_file.filename)
-    first_row = reading_methods.get(data_file.file_type)(filepath, header=None, nrows=1)
-    if all(isinstance(x, str) for x in first_row.values[0]):
-        header = 0
-    else:
-        header = None
-    df = reading_methods.get(data_file.file_type)(filepath, header=header)
-    if header is None:
-        df.columns = [f"Column {col}" for col in df.columns]
-    plt.figure()
-    columns = [column]
-    if plot_type == "histogram":
-        df[column].hist()
-        plt.title(f"Histogram of {column}")
-    elif plot_type == "scatter":
-        if x is None:
-            x_col = df.columns[0]
-        else:
-            x_col = x
-        columns.append(x_col)
-        plt.scatter(df[x_col], df[column])
-        plt.title(f"Scatter plot: {x_col} vs {column}")
-    img = BytesIO()
-    plt.savefig(img, format="png")
-    img.seek(0)
-    plt.close()
-    img_data = img.getvalue()
-    # Сохранение информации о графике в БД
-    plot = DataPlot(
-        data_file_id=file_id,
-        plot_type=plot_type,
-        plot_data=img_data,
-        columns_used=df[columns].fillna(0).to_dict(),
-        # plot_json для фронта
-    )
-    db.session.add(plot)
-    db.session.commit()
-    return img
+        plot = generate_plot(123, 'weight', 'scatter', 'height')
+    """
+    spec = {"column": column, "plot_type": plot_type, "x": x, "mode": mode, "bins": bins}
+    return generate_plots(file_id, [spec], render=render)[0]
@@ -0,0 +1,111 @@
+"""
+Database connection pool configuration and statistics.
+
+Every web or Celery worker process keeps a pool of DB_POOL_SIZE connections
+plus up to DB_MAX_OVERFLOW temporary ones. A request holds a connection
+from its first statement to the end of the request, so a request that finds
+all of them checked out waits up to DB_POOL_TIMEOUT seconds. The pool
+records how many connections were handed out, how long requests waited for
+them and how many waits timed out; pool_status() reports these together
+with the current pool occupancy.
+"""
+import threading
+import time
+from flask import Config
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+class PoolStats:
+    """Thread-safe counters of connection checkouts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, wait: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+    def record_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that measures how long checkouts wait for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        # Ожидание включает открытие нового соединения, если пул не заполнен
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(config: Config) -> dict:
+    """
+    SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings of the app.
+
+    DB_STATEMENT_TIMEOUT_MS (0 disables it) is set for every connection,
+    so a runaway query can't hold a pooled connection forever.
+    """
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": config["DB_POOL_SIZE"],
+        "max_overflow": config["DB_MAX_OVERFLOW"],
+        "pool_timeout": config["DB_POOL_TIMEOUT"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+    }
+    if config["DB_STATEMENT_TIMEOUT_MS"]:
+        options["connect_args"] = {
+            "options": f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"
+        }
+    return options
+
+
+def pool_status(engine: Engine, max_overflow: int) -> dict:
+    """
+    Occupancy of the engine's pool and its checkout statistics.
+
+    Returns:
+        dict: Pool size and max_overflow, connections checked out, idle and
+            over the pool size, plus checkouts, timeouts and total and
+            maximum wait for a connection in seconds
+    """
+    pool = engine.pool
+    status = {
+        "size": pool.size(),
+        "max_overflow": max_overflow,
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+    }
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        status.update(stats.snapshot())
+    return status
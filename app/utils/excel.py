@@ -0,0 +1,147 @@
+"""
+Fast reading and writing of XLSX workbooks.
+
+pd.read_excel with the default openpyxl engine builds a cell object for
+every value and then parses the rows with the Python text parser. Here the
+first worksheet is read with the calamine engine when python-calamine is
+installed, and otherwise streamed with openpyxl in read-only mode as plain
+values, collected column by column into the frame. Cleaned tables are
+written with a write-only workbook straight to the destination path.
+
+XLSX files are converted to a Parquet sidecar once on upload (see
+app.utils.loader), so these readers are normally used only for that
+conversion and for schema inference.
+"""
+import importlib.util
+import itertools
+import numpy as np
+import openpyxl
+from openpyxl.utils import get_column_letter
+import pandas as pd
+
+
+def calamine_available() -> bool:
+    """Check that the calamine engine of pd.read_excel can be used"""
+    return importlib.util.find_spec("python_calamine") is not None
+
+
+def header_names(values: list) -> list[str]:
+    """
+    Column names from a header row, as pd.read_excel names them.
+
+    Blank names become "Unnamed: <position>", repeated ones get ".1", ".2"
+    suffixes.
+    """
+    names = []
+    seen: dict[str, int] = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if pd.isna(value) or str(value) == "" else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def read_xlsx(
+    filepath: str,
+    header: int | None = 0,
+    names: list | None = None,
+    dtype: dict | None = None,
+    nrows: int | None = None,
+    usecols: list | None = None,
+) -> pd.DataFrame:
+    """
+    Read the first worksheet of a workbook into a DataFrame.
+
+    Takes the same arguments as pd.read_excel, which read_options builds.
+
+    Args:
+        filepath: Path to XLSX file
+        header: 0 if the first row holds column names, None otherwise
+        names: Column names of a headerless sheet (positions by default)
+        dtype: Dtypes of columns by name
+        nrows: Read at most this many data rows
+        usecols: Build only these columns
+
+    Returns:
+        pd.DataFrame: Worksheet values
+
+    Raises:
+        ValueError: If a value doesn't fit its dtype
+    """
+    if calamine_available():
+        df = pd.read_excel(
+            filepath, engine="calamine", header=header, names=names, nrows=nrows
+        )
+        if header == 0:
+            df.columns = header_names(list(df.columns))
+        return _select(df, dtype, usecols)
+
+    workbook = openpyxl.load_workbook(
+        filepath, read_only=True, data_only=True, keep_links=False
+    )
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        first = next(rows, None) if header == 0 else None
+        rows = list(itertools.islice(rows, nrows))
+    finally:
+        workbook.close()
+    # Пустые строки в конце листа pd.read_excel тоже отбрасывает
+    while rows and all(value is None for value in rows[-1]):
+        rows.pop()
+    width = max(map(len, rows), default=0)
+    if first is not None:
+        width = max(width, len(first))
+        columns = header_names(list(first) + [None] * (width - len(first)))
+    else:
+        columns = list(names) if names is not None else list(range(width))
+    wanted = set(columns if usecols is None else usecols)
+    data = {}
+    for i, name in enumerate(columns):
+        if name in wanted:
+            # Колонки собираются сразу списками значений, без разбора строк
+            values = pd.Series(
+                [row[i] if i < len(row) else None for row in rows], dtype=object
+            )
+            # Пропуски как в pd.read_excel: NaN, а не None
+            data[name] = values.where(values.notna(), np.nan).infer_objects()
+    df = pd.DataFrame(data, columns=[c for c in columns if c in wanted])
+    return _select(df, dtype, None)
+
+
+def _select(df: pd.DataFrame, dtype: dict | None, usecols: list | None) -> pd.DataFrame:
+    """Frame with the requested columns converted to their dtypes"""
+    if usecols is not None:
+        df = df[usecols]
+    dtype = {name: t for name, t in (dtype or {}).items() if name in df.columns}
+    if dtype:
+        try:
+            df = df.astype(dtype)
+        except TypeError as e:
+            raise ValueError(e) from e
+    return df
+
+
+def write_xlsx(df: pd.DataFrame, filepath: str) -> None:
+    """
+    Write a frame to a workbook with a header row, streaming rows to the file.
+
+    Missing values are written as empty cells, like DataFrame.to_excel does.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    # Размер листа известен заранее. Без элемента dimension читатели в режиме
+    # read-only просматривают весь лист, даже чтобы прочитать первые строки
+    last_cell = f"{get_column_letter(max(len(df.columns), 1))}{len(df) + 1}"
+    sheet.calculate_dimension = lambda: f"A1:{last_cell}"
+    sheet.append([str(c) for c in df.columns])
+    # Значения колонок переводятся в объекты Python один раз, а не по ячейке
+    columns = [
+        column.astype(object).where(column.notna(), None).tolist()
+        for _, column in df.items()
+    ]
+    for row in zip(*columns):
+        sheet.append(row)
+    workbook.save(filepath)
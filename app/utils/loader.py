@@ -0,0 +1,358 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator
+import pandas as pd
+import pyarrow.parquet as pq
+from pandas.api.types import is_bool_dtype, is_integer_dtype
+from flask import current_app
+from app.models import DataFile
+from app.utils import metrics
+from app.utils.excel import read_xlsx
+from app.utils.schema import infer_schema, read_options
+
+
+reading_methods = {"csv": pd.read_csv, "xlsx": read_xlsx}
+
+SIDECAR_SUFFIX = ".parquet"
+
+logger = logging.getLogger(__name__)
+
+# Конвертация в Parquet идет в фоне, чтобы не задерживать ответ на загрузку
+sidecar_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sidecar")
+
+
+class DatasetCache:
+    """
+    In-process LRU cache of parsed DataFrames with a memory budget.
+
+    Entries are keyed by file id, mtime and size (plus the loaded column
+    subset), so a file replaced on disk never returns a stale frame. When the total size of cached frames exceeds
+    the budget, least recently used entries are evicted.
+    """
+
+    def __init__(self, max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_bytes = app.config.get("DATASET_CACHE_MAX_BYTES", 0)
+
+    def get(self, key: tuple) -> pd.DataFrame | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            # Фреймы больше всего бюджета не кэшируем
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (df, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def get_columns(self, key: tuple) -> pd.DataFrame | None:
+        """
+        Frame of a column subset, also sliced from a cached frame of more columns.
+
+        Args:
+            key: (file id, mtime, size, tuple of columns)
+        """
+        columns = set(key[3])
+        with self._lock:
+            for entry_key in reversed(self._entries):
+                cached = entry_key[3]
+                if entry_key[:3] != key[:3] or cached is None:
+                    continue
+                if not columns <= set(cached):
+                    continue
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                df = self._entries[entry_key][0]
+                return df if cached == key[3] else df[list(key[3])]
+            self.misses += 1
+            return None
+
+    def __contains__(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+dataset_cache = DatasetCache()
+
+
+def get_filepath(data_file: DataFile) -> str:
+    """Absolute path of an uploaded data file."""
+    return os.path.join(current_app.config["UPLOAD_FOLDER"], data_file.filename)
+
+
+def file_schema(filepath: str, file_type: str) -> dict:
+    """Schema of a data file inferred with the configured sample sizes"""
+    with metrics.stage("sniff"):
+        return infer_schema(
+            filepath,
+            file_type,
+            sample_bytes=current_app.config["SCHEMA_SAMPLE_BYTES"],
+            offsets=current_app.config["SCHEMA_SAMPLE_OFFSETS"],
+        )
+
+
+def dataset_schema(data_file: DataFile) -> dict:
+    """
+    Schema of a data file (see app.utils.schema).
+
+    The schema is stored on upload; files uploaded before that have it
+    inferred on each call.
+    """
+    if data_file.file_schema is not None:
+        return data_file.file_schema
+    return file_schema(get_filepath(data_file), data_file.file_type)
+
+
+def sidecar_path(filepath: str) -> str:
+    """Path of the columnar Parquet copy stored next to a data file."""
+    return filepath + SIDECAR_SUFFIX
+
+
+def has_fresh_sidecar(filepath: str) -> bool:
+    """Check that a sidecar exists and is not older than its source file."""
+    try:
+        return os.path.getmtime(sidecar_path(filepath)) >= os.path.getmtime(filepath)
+    except OSError:
+        return False
+
+
+def dataset_columns(data_file: DataFile) -> list[str]:
+    """
+    Column names of a data file without loading its rows.
+
+    Headerless tables get generated names ("Column 0", "Column 1", ...).
+    """
+    filepath = get_filepath(data_file)
+    if has_fresh_sidecar(filepath):
+        return pq.read_schema(sidecar_path(filepath)).names
+    return list(dataset_schema(data_file)["columns"])
+
+
+def parse_dataset(
+    filepath: str, file_type: str, schema: dict, columns: list[str] | None = None
+) -> pd.DataFrame:
+    """
+    Parse the original CSV/XLSX file into a DataFrame.
+
+    The file is read with the delimiter, encoding, header and dtypes of its
+    schema. Headerless tables get generated column names ("Column 0",
+    "Column 1", ...). If a value doesn't fit a sampled dtype, the file is
+    read again with pandas type inference. Integer columns are downcast to
+    the smallest type that holds their values.
+
+    Args:
+        filepath: Path to the original data file
+        file_type: File extension ('csv', 'xlsx')
+        schema: Schema of the file (see app.utils.schema)
+        columns: Read only these columns (None for all)
+    """
+    read = reading_methods[file_type]
+    options = read_options(schema, file_type, columns)
+    try:
+        df = read(filepath, **options)
+    except ValueError:
+        logger.warning("%s doesn't match its schema dtypes", filepath, exc_info=True)
+        df = read(filepath, **{**options, "dtype": None})
+    if columns is not None:
+        df = df[columns]
+    return downcast_integers(df)
+
+
+def downcast_integers(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame with integer columns in the smallest integer type that fits them"""
+    downcast = {
+        column: pd.to_numeric(df[column], downcast="integer")
+        for column in df.columns
+        if is_integer_dtype(df[column]) and not is_bool_dtype(df[column])
+    }
+    return df.assign(**downcast) if downcast else df
+
+
+def write_sidecar(filepath: str, file_type: str, schema: dict) -> str | None:
+    """
+    Convert a data file into a typed Parquet sidecar.
+
+    The sidecar is written to a temporary file and atomically renamed, so
+    readers never see a partially written copy.
+
+    Returns:
+        str | None: Sidecar path, or None if the table can't be stored as Parquet
+    """
+    target = sidecar_path(filepath)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    try:
+        df = parse_dataset(filepath, file_type, schema)
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, target)
+    except Exception:
+        # Например, колонки со смешанными типами: читаем исходный файл
+        logger.warning("Parquet sidecar for %s was not created", filepath, exc_info=True)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    return target
+
+
+def schedule_sidecar(filepath: str, file_type: str, schema: dict) -> Future:
+    """Queue background conversion of a freshly saved file to Parquet."""
+    return sidecar_executor.submit(write_sidecar, filepath, file_type, schema)
+
+
+def read_dataset(
+    filepath: str, file_type: str, schema: dict, columns: list[str] | None = None
+) -> pd.DataFrame:
+    """
+    Read a data file, bypassing the cache.
+
+    Uses the Parquet sidecar when it is up to date, falling back to parsing
+    the original CSV/XLSX with its schema otherwise.
+
+    Args:
+        filepath: Path to the original data file
+        file_type: File extension ('csv', 'xlsx')
+        schema: Schema of the file (see app.utils.schema)
+        columns: Load only these columns (None for all)
+
+    Returns:
+        pd.DataFrame: Parsed table
+    """
+    with metrics.stage("read"):
+        if has_fresh_sidecar(filepath):
+            path = sidecar_path(filepath)
+            df = pd.read_parquet(path, columns=columns)
+        else:
+            path = filepath
+            df = parse_dataset(filepath, file_type, schema, columns=columns)
+    metrics.add_bytes(os.path.getsize(path))
+    return df
+
+
+def load_dataset(
+    data_file: DataFile, columns: list[str] | None = None
+) -> pd.DataFrame:
+    """
+    Load a data file as a DataFrame through the shared dataset cache.
+
+    The returned frame may be shared with other requests and must not be
+    modified in place; callers that mutate it should work on a copy.
+
+    Args:
+        data_file: DataFile record to load
+        columns: Load only these columns (None for all). Column-pruned reads
+            come from the Parquet sidecar or from CSV with usecols; XLSX
+            without a sidecar is loaded whole and sliced.
+
+    Returns:
+        pd.DataFrame: Parsed table
+    """
+    filepath = get_filepath(data_file)
+    schema = dataset_schema(data_file)
+    stat = os.stat(filepath)
+    full_key = (data_file.id, stat.st_mtime_ns, stat.st_size, None)
+    prunable = data_file.file_type == "csv" or has_fresh_sidecar(filepath)
+    if columns is None or full_key in dataset_cache or not prunable:
+        df = dataset_cache.get(full_key)
+        metrics.record_cache("dataset", df is not None)
+        if df is None:
+            df = read_dataset(filepath, data_file.file_type, schema)
+            dataset_cache.put(full_key, df)
+        metrics.add_rows(len(df))
+        return df if columns is None else df[columns]
+
+    key = full_key[:3] + (tuple(columns),)
+    df = dataset_cache.get_columns(key)
+    metrics.record_cache("dataset", df is not None)
+    if df is None:
+        df = read_dataset(filepath, data_file.file_type, schema, columns=columns)
+        dataset_cache.put(key, df)
+    metrics.add_rows(len(df))
+    return df
+
+
+def iter_dataset_chunks(
+    data_file: DataFile, chunksize: int, columns: list[str] | None = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Read a data file in chunks of rows without loading it whole.
+
+    Reads record batches of the Parquet sidecar when it is up to date, CSV
+    files via pandas chunked reader. XLSX can't be parsed in parts and is
+    yielded as a single chunk.
+
+    Args:
+        data_file: DataFile record to read
+        chunksize: Number of rows per chunk
+        columns: Read only these columns (None for all)
+
+    Yields:
+        pd.DataFrame: Consecutive chunks of the table
+    """
+    filepath = get_filepath(data_file)
+    if data_file.file_type != "csv" and not has_fresh_sidecar(filepath):
+        chunk = read_dataset(filepath, data_file.file_type, dataset_schema(data_file), columns)
+        metrics.add_rows(len(chunk))
+        yield chunk
+        return
+    for chunk in metrics.timed_chunks(_read_chunks(data_file, filepath, chunksize, columns)):
+        metrics.add_rows(len(chunk))
+        yield chunk
+
+
+def _read_chunks(
+    data_file: DataFile, filepath: str, chunksize: int, columns: list[str] | None
+) -> Iterator[pd.DataFrame]:
+    """Chunks of the Parquet sidecar or of a CSV file"""
+    if has_fresh_sidecar(filepath):
+        path = sidecar_path(filepath)
+        parquet_file = pq.ParquetFile(path)
+        metrics.add_bytes(os.path.getsize(path))
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    # Текст во float-колонке после выборки делает ее текстовой в своем чанке
+    # (см. StreamingStats), а не ломает чтение
+    options = read_options(dataset_schema(data_file), "csv", columns, floats=False)
+    metrics.add_bytes(os.path.getsize(filepath))
+    with pd.read_csv(filepath, chunksize=chunksize, **options) as reader:
+        for chunk in reader:
+            yield chunk if columns is None else chunk[columns]
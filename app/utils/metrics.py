@@ -0,0 +1,292 @@
+"""
+Prometheus-style metrics of the processing pipeline.
+
+Processors mark their work with two context managers:
+    - operation(name, file_type) labels everything recorded inside it and,
+      on exit, observes the bytes read and rows processed by the operation,
+    - stage(name) times a stage: read, sniff (schema inference), compute,
+      render, serialize or db_write. Stages may nest; each one records only
+      its own time, without the stages inside it, so the stage durations of
+      an operation add up to its total.
+Cache lookups are counted by record_cache(), and init_app() observes the
+duration and peak RSS of every request (the peak is reset through
+/proc/self/clear_refs at the start of the request on Linux, so with
+concurrent requests it is the peak of the process while the request ran).
+GET /metrics returns everything in the Prometheus text format.
+
+Recording is a few dictionary updates under a lock, cheap enough to keep
+on in production. Metrics live in the memory of each process: with a
+Celery broker the processing metrics are recorded by the worker that runs
+the job.
+"""
+import bisect
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, Iterator
+from flask import Flask, Response, g, request
+
+# Границы корзин гистограмм
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+BYTES_BUCKETS = tuple(2**p for p in range(10, 36, 2))  # 1 KiB - 32 GiB
+ROWS_BUCKETS = tuple(10**p for p in range(1, 10))
+
+STAGES = ("read", "sniff", "compute", "render", "serialize", "db_write")
+
+
+class Histogram:
+    """Cumulative histogram with labels, exposed as _bucket, _sum and _count"""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            pairs = _label_pairs(self.labels, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f'{self.name}_bucket{{{pairs}{"," if pairs else ""}le="{le}"}} {cumulative}'
+            yield f"{self.name}_sum{{{pairs}}} {total!r}"
+            yield f"{self.name}_count{{{pairs}}} {cumulative}"
+
+
+class Counter:
+    """Counter with labels, exposed as _total"""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._series: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, value: float = 1) -> None:
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name}_total {self.help}"
+        yield f"# TYPE {self.name}_total counter"
+        with self._lock:
+            series = sorted(self._series.items())
+        for labels, value in series:
+            yield f"{self.name}_total{{{_label_pairs(self.labels, labels)}}} {value!r}"
+
+
+def _label_pairs(names: tuple[str, ...], values: tuple) -> str:
+    escaped = (
+        str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values
+    )
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+OPERATION_LABELS = ("operation", "file_type")
+
+stage_seconds = Histogram(
+    "pipeline_stage_seconds",
+    "Time spent in a pipeline stage, without nested stages",
+    OPERATION_LABELS + ("stage",),
+    SECONDS_BUCKETS,
+)
+bytes_read = Histogram(
+    "pipeline_bytes_read", "Bytes read from disk by an operation", OPERATION_LABELS, BYTES_BUCKETS
+)
+rows_processed = Histogram(
+    "pipeline_rows_processed", "Data rows processed by an operation", OPERATION_LABELS, ROWS_BUCKETS
+)
+cache_lookups = Counter(
+    "pipeline_cache_lookups", "Cache lookups", OPERATION_LABELS + ("cache", "result")
+)
+errors = Counter("pipeline_errors", "Failed operations", OPERATION_LABELS)
+request_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Duration of requests",
+    ("endpoint", "method", "status"),
+    SECONDS_BUCKETS,
+)
+request_peak_rss = Histogram(
+    "http_request_peak_rss_bytes",
+    "Peak resident memory of the process during a request",
+    ("endpoint", "file_type"),
+    BYTES_BUCKETS,
+)
+
+REGISTRY = (
+    stage_seconds,
+    bytes_read,
+    rows_processed,
+    cache_lookups,
+    errors,
+    request_seconds,
+    request_peak_rss,
+)
+
+
+class _Operation:
+    def __init__(self, name: str, file_type: str):
+        self.labels = (name, file_type)
+        self.bytes = 0
+        self.rows = 0
+
+
+_operation: ContextVar[_Operation | None] = ContextVar("operation", default=None)
+# Время вложенных этапов текущего этапа (вычитается из его длительности)
+_nested: ContextVar[list[float] | None] = ContextVar("nested_stages", default=None)
+
+
+@contextmanager
+def operation(name: str, file_type: str) -> Iterator[None]:
+    """
+    Label the metrics recorded inside the block with the operation and the
+    type of its file; failures are counted as errors
+    """
+    current = _Operation(name, file_type)
+    token = _operation.set(current)
+    try:
+        yield
+    except Exception:
+        errors.inc(*current.labels)
+        raise
+    finally:
+        _operation.reset(token)
+        if current.bytes:
+            bytes_read.observe(current.bytes, *current.labels)
+        if current.rows:
+            rows_processed.observe(current.rows, *current.labels)
+
+
+def _labels() -> tuple[str, str]:
+    current = _operation.get()
+    return current.labels if current is not None else ("other", "")
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a stage of the current operation (see STAGES)"""
+    parent = _nested.get()
+    nested = [0.0]
+    token = _nested.set(nested)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _nested.reset(token)
+        if parent is not None:
+            parent[0] += elapsed
+        stage_seconds.observe(max(elapsed - nested[0], 0.0), *_labels(), name)
+
+
+def timed_chunks(chunks: Iterable, name: str = "read") -> Iterator:
+    """Iterate over chunks, timing the production of each one as a stage"""
+    iterator = iter(chunks)
+    try:
+        while True:
+            with stage(name):
+                chunk = next(iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Читатель файла закрывается и при досрочной остановке итерации
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            close()
+
+
+def add_bytes(count: int) -> None:
+    """Count bytes read by the current operation"""
+    current = _operation.get()
+    if current is not None:
+        current.bytes += count
+
+
+def add_rows(count: int) -> None:
+    """Count rows processed by the current operation"""
+    current = _operation.get()
+    if current is not None:
+        current.rows += count
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """
+    Count a cache lookup of the current operation: 'result' for stored
+    analyses and plots, 'dataset' for parsed tables (see DatasetCache)
+    """
+    cache_lookups.inc(*_labels(), cache, "hit" if hit else "miss")
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = [line for metric in REGISTRY for line in metric.render()]
+    return "\n".join(lines) + "\n"
+
+
+def _reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass  # Не Linux: пик RSS за все время процесса
+
+
+def _peak_rss() -> int:
+    """Peak RSS of the process in bytes (since the last reset on Linux)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def init_app(app: Flask) -> None:
+    """Record request metrics and serve GET /metrics"""
+
+    @app.before_request
+    def start_request():
+        g.metrics_started = time.perf_counter()
+        _reset_peak_rss()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is None or request.endpoint == "metrics":
+            return response
+        endpoint = request.endpoint or "unknown"
+        request_seconds.observe(
+            time.perf_counter() - started, endpoint, request.method, str(response.status_code)
+        )
+        # Тип файла запроса - по файлам, загруженным get_data_file
+        files = g.get("data_files") or {}
+        file_type = next((f.file_type for f in files.values()), "")
+        request_peak_rss.observe(_peak_rss(), endpoint, file_type)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
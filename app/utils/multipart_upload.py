@@ -0,0 +1,296 @@
+"""
+Resumable multipart uploads.
+
+An upload session preallocates the whole file in the upload folder. Parts
+are written with os.pwrite at their offsets, so they may arrive in any
+order, in parallel and more than once; each received part is recorded
+with its SHA-256 checksum. Completing the session moves the file to its
+content address and registers it as a regular DataFile.
+
+Open sessions together may reserve at most MULTIPART_MAX_RESERVED_BYTES.
+Sessions without activity (creation or a received part) for
+MULTIPART_SESSION_TTL_SECONDS are abandoned: expire_sessions() deletes them
+with their files. It runs before a new session reserves space and
+periodically as a Celery beat job.
+"""
+import errno
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import BinaryIO
+from flask import current_app
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from werkzeug.utils import secure_filename
+from app.extensions import db
+from app.models import DataFile, UploadPart, UploadSession
+from app.utils.data_processor import register_file
+from app.utils.single_flight import lock_id
+from app.utils.upload_store import commit_file
+
+
+def session_path(session: UploadSession) -> str:
+    """Path of the preallocated file of an upload session"""
+    folder = current_app.config["UPLOAD_FOLDER"]
+    return os.path.join(folder, f".multipart-{session.id}")
+
+
+def create_upload_session(
+    filename: str, total_size: int, part_size: int | None = None
+) -> UploadSession:
+    """
+    Start a multipart upload and preallocate its file.
+
+    Args:
+        filename: Original filename (its extension must be allowed)
+        total_size: Size of the whole file in bytes
+        part_size: Size of every part but the last (MULTIPART_PART_BYTES
+            by default)
+
+    Returns:
+        UploadSession: Stored session
+
+    Raises:
+        ValueError: For sizes out of the configured limits (total_size is
+            limited by MULTIPART_MAX_FILE_BYTES)
+        OSError: If the file can't be preallocated, e.g. ENOSPC when the
+            upload folder has no room for it or open sessions already
+            reserve MULTIPART_MAX_RESERVED_BYTES
+    """
+    config = current_app.config
+    part_size = part_size or config["MULTIPART_PART_BYTES"]
+    if total_size < 0:
+        raise ValueError("'size' must not be negative")
+    if total_size > config["MULTIPART_MAX_FILE_BYTES"]:
+        limit = config["MULTIPART_MAX_FILE_BYTES"]
+        raise ValueError(f"'size' must not exceed {limit} bytes")
+    low, high = config["MULTIPART_MIN_PART_BYTES"], config["MULTIPART_MAX_PART_BYTES"]
+    if not low <= part_size <= high:
+        raise ValueError(f"'part_size' must be from {low} to {high} bytes")
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        original_filename=filename,
+        file_type=secure_filename(filename).rsplit(".", 1)[1].lower(),
+        total_size=total_size,
+        part_size=part_size,
+    )
+    expire_sessions()
+    # Проверка и резервирование под блокировкой: параллельные запросы не
+    # превысят предел вместе (блокировка снимается commit)
+    db.session.execute(select(func.pg_advisory_xact_lock(lock_id(("upload_reservations",)))))
+    reserved = db.session.scalar(select(func.coalesce(func.sum(UploadSession.total_size), 0)))
+    if reserved + total_size > config["MULTIPART_MAX_RESERVED_BYTES"]:
+        raise OSError(errno.ENOSPC, "Open uploads reserve all the allowed space")
+    os.makedirs(config["UPLOAD_FOLDER"], exist_ok=True)
+    path = session_path(session)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    try:
+        if total_size:
+            preallocate(fd, total_size)
+    except OSError:
+        os.close(fd)
+        os.remove(path)
+        raise
+    os.close(fd)
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+
+def expire_sessions() -> int:
+    """
+    Delete upload sessions inactive for MULTIPART_SESSION_TTL_SECONDS and
+    their preallocated files.
+
+    Returns:
+        int: Number of deleted sessions
+    """
+    ttl = current_app.config["MULTIPART_SESSION_TTL_SECONDS"]
+    cutoff = datetime.now() - timedelta(seconds=ttl)
+    last_part = (
+        select(func.max(UploadPart.received_at))
+        .where(UploadPart.session_id == UploadSession.id)
+        .scalar_subquery()
+    )
+    stale = db.session.scalars(
+        select(UploadSession).where(
+            func.greatest(UploadSession.created_at, func.coalesce(last_part, UploadSession.created_at))
+            < cutoff
+        )
+    ).all()
+    for session in stale:
+        try:
+            os.remove(session_path(session))
+        except FileNotFoundError:
+            pass
+        db.session.delete(session)
+    db.session.commit()
+    return len(stale)
+
+
+def preallocate(fd: int, size: int) -> None:
+    """
+    Reserve size bytes of disk for a file. Where the platform or file system
+    can't preallocate, the file is only extended (sparse); other errors, such
+    as ENOSPC, are raised.
+    """
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except AttributeError:
+        os.ftruncate(fd, size)  # Нет posix_fallocate (macOS)
+    except OSError as e:
+        if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+            raise
+        # Файловая система без fallocate: разреженный файл нужного размера
+        os.ftruncate(fd, size)
+
+
+def write_part(
+    session: UploadSession,
+    part_number: int,
+    stream: BinaryIO,
+    checksum: str | None = None,
+) -> UploadPart:
+    """
+    Write a part at its offset and record its checksum.
+
+    The body is read in UPLOAD_CHUNK_BYTES chunks. A part that is sent again
+    overwrites the previous one; its record is deleted before the write, so
+    if the new body fails verification the part counts as missing instead
+    of keeping the checksum of bytes that were overwritten.
+
+    Args:
+        session: Upload session
+        part_number: Number of the part, from 1
+        stream: Part body
+        checksum: Expected SHA-256 of the part (hex), if the client sent one
+
+    Returns:
+        UploadPart: Stored part record
+
+    Raises:
+        ValueError: For a wrong part number, size or checksum. The part is
+            not recorded then and must be sent again
+    """
+    if not 1 <= part_number <= session.part_count:
+        raise ValueError(f"Part number must be from 1 to {session.part_count}")
+    expected = session.part_length(part_number)
+    offset = (part_number - 1) * session.part_size
+    chunk_bytes = current_app.config["UPLOAD_CHUNK_BYTES"]
+    # Прежние байты части сейчас будут перезаписаны
+    db.session.execute(
+        delete(UploadPart).where(
+            UploadPart.session_id == session.id, UploadPart.part_number == part_number
+        )
+    )
+    db.session.commit()
+    digest = hashlib.sha256()
+    written = 0
+    fd = os.open(session_path(session), os.O_WRONLY)
+    try:
+        while chunk := stream.read(chunk_bytes):
+            if written + len(chunk) > expected:
+                raise ValueError(f"Part {part_number} must be {expected} bytes")
+            digest.update(chunk)
+            view = memoryview(chunk)
+            while view:
+                # pwrite может записать меньше, чем передано
+                n = os.pwrite(fd, view, offset + written)
+                view = view[n:]
+                written += n
+    finally:
+        os.close(fd)
+    if written != expected:
+        raise ValueError(f"Part {part_number} must be {expected} bytes, got {written}")
+    if checksum is not None and checksum.lower() != digest.hexdigest():
+        raise ValueError(f"Checksum mismatch for part {part_number}")
+
+    # Повторно присланная часть заменяет запись о прежней
+    values = {
+        "session_id": session.id,
+        "part_number": part_number,
+        "size": written,
+        "checksum": digest.hexdigest(),
+    }
+    stmt = insert(UploadPart).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["session_id", "part_number"],
+        set_={"size": stmt.excluded.size, "checksum": stmt.excluded.checksum},
+    ).returning(UploadPart)
+    part = db.session.scalar(stmt, execution_options={"populate_existing": True})
+    db.session.commit()
+    return part
+
+
+def received_parts(session: UploadSession) -> dict[int, str]:
+    """Checksums of received parts by part number"""
+    rows = db.session.execute(
+        select(UploadPart.part_number, UploadPart.checksum)
+        .where(UploadPart.session_id == session.id)
+        .order_by(UploadPart.part_number)
+    )
+    return dict(rows.all())
+
+
+def upload_status(session: UploadSession) -> dict:
+    """
+    Progress of an upload: received parts with checksums and missing part numbers
+    """
+    parts = received_parts(session)
+    return {
+        "upload_id": session.id,
+        "filename": session.original_filename,
+        "size": session.total_size,
+        "part_size": session.part_size,
+        "part_count": session.part_count,
+        "parts": [
+            {"part_number": number, "checksum": checksum}
+            for number, checksum in parts.items()
+        ],
+        "missing_parts": [
+            number for number in range(1, session.part_count + 1) if number not in parts
+        ],
+    }
+
+
+def complete_upload(
+    session: UploadSession, checksums: dict[int, str] | None = None
+) -> tuple[DataFile, bool]:
+    """
+    Finish a multipart upload and register the file.
+
+    The assembled file is moved to its content address (see
+    app.utils.upload_store), so content that is already stored is
+    deduplicated like a regular upload. The session is deleted.
+
+    Args:
+        session: Upload session with all parts received
+        checksums: Part checksums known to the client, verified against
+            the received ones
+
+    Returns:
+        tuple: (DataFile, True if the record was created)
+
+    Raises:
+        ValueError: If parts are missing or checksums differ
+    """
+    config = current_app.config
+    parts = received_parts(session)
+    missing = [n for n in range(1, session.part_count + 1) if n not in parts]
+    if missing:
+        raise ValueError(f"Missing parts: {', '.join(map(str, missing))}")
+    for number, checksum in (checksums or {}).items():
+        if parts.get(number) != checksum.lower():
+            raise ValueError(f"Checksum mismatch for part {number}")
+
+    file_type = session.file_type
+    filename, filepath, _ = commit_file(
+        session_path(session), file_type, config["UPLOAD_CHUNK_BYTES"]
+    )
+    data_file, registered = register_file(
+        filename, filepath, file_type, session.original_filename
+    )
+    db.session.delete(session)
+    db.session.commit()
+    return data_file, registered
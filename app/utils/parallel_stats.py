@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+import pandas as pd
+from app.utils.schema import infer_schema, read_options
+from app.utils.streaming_stats import StreamingStats
+
+
+# forkserver: дочерние процессы не наследуют потоки и соединения с БД, а
+# pandas/NumPy загружаются в сервер один раз, а не в каждом процессе
+mp_context = multiprocessing.get_context("forkserver")
+mp_context.set_forkserver_preload([__name__])
+
+
+def csv_partitions(
+    filepath: str, partition_bytes: int, data_start: int = 0
+) -> list[tuple[int, int]]:
+    """
+    Split a CSV file into byte ranges aligned to line boundaries.
+
+    Every range but the last is extended to the end of the line it cuts, so
+    each partition holds whole rows. Quoted values with line breaks inside
+    are not supported.
+
+    Args:
+        filepath: Path to CSV file
+        partition_bytes: Approximate size of a partition
+        data_start: Offset of the first data row (after the header line)
+
+    Returns:
+        list: (start, end) byte offsets of partitions
+    """
+    size = os.path.getsize(filepath)
+    partitions = []
+    with open(filepath, "rb") as f:
+        start = data_start
+        while start < size:
+            end = min(start + partition_bytes, size)
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            partitions.append((start, end))
+            start = end
+    return partitions
+
+
+def reduce_partition(
+    filepath: str,
+    start: int,
+    end: int,
+    columns: list[str],
+    chunksize: int,
+    sketch_size: int,
+    options: dict | None = None,
+) -> StreamingStats:
+    """
+    Parse one byte range of a CSV file and accumulate its statistics
+
+    options are extra pd.read_csv arguments (delimiter, encoding, dtype).
+    """
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    stats = StreamingStats(columns=columns, sketch_size=sketch_size)
+    if not data.strip():
+        return stats
+    with pd.read_csv(
+        BytesIO(data),
+        header=None,
+        names=columns,
+        chunksize=chunksize,
+        **(options or {}),
+    ) as reader:
+        for chunk in reader:
+            stats.update(chunk)
+    return stats
+
+
+def compute_parallel_stats(
+    filepath: str,
+    workers: int,
+    partition_bytes: int,
+    chunksize: int = 100_000,
+    sketch_size: int = 1000,
+    schema: dict | None = None,
+) -> dict:
+    """
+    Compute basic statistics of a CSV file in a pool of processes.
+
+    The file is split into line-aligned byte ranges; each range is parsed and
+    reduced to mergeable accumulators (moments, co-moments, min/max, median
+    sketch) in a worker process, and the partial results are merged.
+
+    Inside daemonic processes (e.g. Celery prefork workers), which can't have
+    children, partitions are reduced one by one in the current process; the
+    compose worker therefore runs with --pool=threads.
+
+    Args:
+        filepath: Path to CSV file
+        workers: Number of worker processes
+        partition_bytes: Approximate size of a partition
+        chunksize: Rows parsed at a time within a partition
+        sketch_size: KLL sketch parameter k for the median
+        schema: Schema of the file (see app.utils.schema), inferred if None
+
+    Returns:
+        dict: Statistics in the shape returned by DataAnalysis.get_data()
+    """
+    if schema is None:
+        schema = infer_schema(filepath, "csv")
+    columns = schema["columns"]
+    data_start = 0
+    if schema["header"] == 0:
+        with open(filepath, "rb") as f:
+            f.readline()
+            data_start = f.tell()
+    options = read_options(schema, "csv", floats=False)
+    # Имена и заголовок задаются по частям, не из schema
+    options = {key: options[key] for key in ("sep", "encoding", "dtype")}
+
+    partitions = csv_partitions(filepath, partition_bytes, data_start)
+    args = [
+        (filepath, start, end, columns, chunksize, sketch_size, options)
+        for start, end in partitions
+    ]
+    total = StreamingStats(columns=columns, sketch_size=sketch_size)
+    if workers <= 1 or len(partitions) <= 1 or multiprocessing.current_process().daemon:
+        for partition_args in args:
+            total.merge(reduce_partition(*partition_args))
+        return total.result()
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(partitions)), mp_context=mp_context
+    ) as pool:
+        futures = [pool.submit(reduce_partition, *partition_args) for partition_args in args]
+        for future in as_completed(futures):
+            total.merge(future.result())
+    return total.result()
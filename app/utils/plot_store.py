@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+import threading
+from flask import current_app
+
+
+def plot_key(file_id: int, plot_type: str, columns: list, options: dict) -> str:
+    """
+    Content address of a rendered plot.
+
+    The key is a SHA-256 of everything the image depends on, so it doubles
+    as a strong ETag: equal keys always mean equal images.
+
+    Args:
+        file_id: ID of the plotted DataFile
+        plot_type: Plot type ('histogram', 'scatter')
+        columns: Plotted columns in axis order
+        options: Render options
+
+    Returns:
+        str: Hex digest
+    """
+    payload = json.dumps(
+        [file_id, plot_type, columns, options], sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def plot_path(key: str) -> str:
+    """
+    Absolute path of a stored plot image.
+
+    Images are spread over 256 subdirectories by the first byte of the key.
+    """
+    folder = os.path.abspath(current_app.config["PLOT_FOLDER"])
+    return os.path.join(folder, key[:2], f"{key}.png")
+
+
+def find_plot(key: str) -> str | None:
+    """Path of a stored plot image, or None if it is not rendered yet"""
+    path = plot_path(key)
+    return path if os.path.exists(path) else None
+
+
+def store_plot(key: str, image: bytes) -> str:
+    """
+    Write a plot image to the store.
+
+    The image is written to a temporary file and atomically renamed, so
+    concurrent readers never see a partially written file.
+
+    Returns:
+        str: Path of the stored image
+    """
+    path = plot_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(image)
+    os.replace(tmp_path, path)
+    return path
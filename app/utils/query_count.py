@@ -0,0 +1,77 @@
+"""
+Counting of SQL statements.
+
+Every statement sent through any SQLAlchemy engine is recorded by the
+counters active in the executing thread. count_queries() measures a block
+of code (tests assert a fixed number of statements per endpoint with it);
+init_app() counts the statements of every request, background jobs that
+run eagerly inside it included, logs them and, with QUERY_COUNT_HEADER
+set, returns the count in the X-Query-Count response header.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+from flask import Flask, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _record(conn, cursor, statement, parameters, context, executemany):
+    for statements in getattr(_local, "counters", ()):
+        statements.append(statement)
+
+
+@contextmanager
+def count_queries() -> Iterator[list[str]]:
+    """
+    Collect SQL statements executed in this thread inside the block.
+
+    Yields:
+        list: Statements in execution order, filled while the block runs
+    """
+    statements = _start()
+    try:
+        yield statements
+    finally:
+        _stop(statements)
+
+
+def _start() -> list[str]:
+    statements: list[str] = []
+    _local.__dict__.setdefault("counters", []).append(statements)
+    return statements
+
+
+def _stop(statements: list[str]) -> None:
+    # По идентичности: одинаковые списки разных счетчиков равны
+    _local.counters = [c for c in _local.counters if c is not statements]
+
+
+def init_app(app: Flask) -> None:
+    """Count SQL statements of every request of the app"""
+
+    @app.before_request
+    def start_counting():
+        g.queries = _start()
+
+    @app.after_request
+    def report_count(response):
+        queries = g.get("queries")
+        if queries is None:
+            return response
+        logger.debug("%s %s: %d SQL statements", request.method, request.path, len(queries))
+        if app.config.get("QUERY_COUNT_HEADER"):
+            response.headers["X-Query-Count"] = str(len(queries))
+        return response
+
+    @app.teardown_request
+    def stop_counting(exc):
+        queries = g.pop("queries", None)
+        if queries is not None:
+            _stop(queries)
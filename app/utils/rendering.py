@@ -0,0 +1,125 @@
+"""
+Plot rendering on matplotlib's object-oriented API.
+
+Each plot gets its own Figure on an Agg canvas: no pyplot global state is
+touched, so plots can be rendered from several threads at once. matplotlib
+is imported on first use, so processes that never draw (e.g. web workers
+that only serve stored plots) don't pay for it.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Callable
+import numpy as np
+import pandas as pd
+from app.utils.binning import density_grid, finite_pairs, stratified_sample
+from app.utils.parallel_stats import mp_context
+
+
+def new_figure():
+    """
+    Figure with a single axes on its own Agg canvas.
+
+    Returns:
+        tuple: (Figure, Axes)
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+def figure_bytes(fig, options: dict) -> bytes:
+    """Encode a figure as an image with the format and dpi from render options"""
+    img = BytesIO()
+    fig.savefig(img, format=options["format"], dpi=options["dpi"])
+    return img.getvalue()
+
+
+def draw_histogram(ax, payload: dict) -> None:
+    """Draw histogram bars from precomputed edges and counts"""
+    ax.stairs(payload["counts"], payload["bins"], fill=True)
+    ax.grid(True)
+
+
+def draw_scatter(
+    ax, x_values: pd.Series, y_values: pd.Series, mode: str, options: dict
+) -> None:
+    """
+    Draw a scatter plot.
+
+    'points' draws every row. 'density' counts points in a grid x grid cells
+    and draws the counts as an image on a log color scale, so drawing cost
+    depends on the grid, not on the row count. 'sample' draws at most
+    sample_points points stratified by X.
+    """
+    if mode == "points":
+        ax.scatter(x_values, y_values)
+        return
+    x, y = finite_pairs(
+        x_values.to_numpy(dtype=float, na_value=np.nan),
+        y_values.to_numpy(dtype=float, na_value=np.nan),
+    )
+    if mode == "sample":
+        idx = stratified_sample(x, options["sample_points"], strata=options["grid"])
+        ax.scatter(x[idx], y[idx], s=4, alpha=0.5)
+        return
+    counts, x_edges, y_edges = density_grid(x, y, options["grid"])
+    if not counts.any():
+        return
+    from matplotlib.colors import LogNorm
+
+    image = ax.imshow(
+        np.ma.masked_equal(counts.T, 0),
+        origin="lower",
+        extent=(x_edges[0], x_edges[-1], y_edges[0], y_edges[-1]),
+        aspect="auto",
+        interpolation="nearest",
+        norm=LogNorm(),
+        cmap="viridis",
+    )
+    ax.figure.colorbar(image, ax=ax, label="Points")
+
+
+def render_histogram(payload: dict, title: str, options: dict) -> bytes:
+    """Image of a histogram from its bin edges and counts"""
+    fig, ax = new_figure()
+    draw_histogram(ax, payload)
+    ax.set_title(title)
+    return figure_bytes(fig, options)
+
+
+def render_scatter(
+    x_values: pd.Series, y_values: pd.Series, mode: str, title: str, options: dict
+) -> bytes:
+    """Image of a scatter plot drawn in the given mode (see draw_scatter)"""
+    fig, ax = new_figure()
+    draw_scatter(ax, x_values, y_values, mode, options)
+    ax.set_title(title)
+    return figure_bytes(fig, options)
+
+
+def render_many(calls: list[tuple[Callable, tuple]], workers: int) -> list[bytes]:
+    """
+    Run rendering calls, in a pool of processes when there are several.
+
+    Inside daemonic processes (e.g. Celery prefork workers), which can't have
+    children, calls run one by one in the current process; the compose
+    worker therefore runs with --pool=threads.
+
+    Args:
+        calls: (render function, arguments) pairs
+        workers: Number of worker processes
+
+    Returns:
+        list: Images in the order of calls
+    """
+    if workers <= 1 or len(calls) <= 1 or multiprocessing.current_process().daemon:
+        return [func(*args) for func, args in calls]
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(calls)), mp_context=mp_context
+    ) as pool:
+        futures = [pool.submit(func, *args) for func, args in calls]
+        return [future.result() for future in futures]
@@ -0,0 +1,267 @@
+"""
+Schema inference of uploaded tables.
+
+The schema is detected once, when a file is stored, and kept on its
+DataFile: delimiter, encoding, header presence, column names and column
+dtypes. Readers pass it to pandas explicitly (see read_options), so files
+are not re-sniffed on every read and text columns are not type-guessed
+chunk by chunk. Text columns are read as category or Arrow strings instead
+of Python objects, which takes several times less memory.
+
+CSV files are sampled from the head and from whole lines at random byte
+offsets, so a column that is empty in the first rows still gets its type
+from values further on. XLSX files can't be read at an offset and are
+sampled from the first rows only, in a single read of the workbook.
+"""
+import csv
+import os
+import random
+from io import StringIO
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from app.utils.excel import header_names, read_xlsx
+
+DELIMITERS = ",;\t|"
+# Текстовая колонка с долей различных значений не выше этой читается как category
+CATEGORY_MAX_DISTINCT_RATIO = 0.5
+# Значения остальных текстовых колонок хранятся в Arrow, а не объектами Python
+STRING_DTYPE = "string[pyarrow]"
+# Без BOM и не UTF-8 - скорее всего выгрузка из Excel в кодировке Windows
+ENCODINGS = ("utf-8", "cp1251")
+
+
+def sample_csv(
+    filepath: str, sample_bytes: int, offsets: int, seed: int = 0
+) -> tuple[bytes, bytes]:
+    """
+    Byte sample of a CSV file.
+
+    Args:
+        filepath: Path to CSV file
+        sample_bytes: Size of the head sample and total size of the offset
+            samples
+        offsets: Number of random offsets to sample lines from
+        seed: Seed of the offsets
+
+    Returns:
+        tuple: (head cut to whole lines, whole lines from random offsets)
+    """
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        head = f.read(sample_bytes)
+        if size <= sample_bytes or not offsets:
+            return head, b""
+        # Последняя строка головы оборвана
+        head = head[: head.rfind(b"\n") + 1] or head
+        rng = random.Random(seed)
+        step = max(1, sample_bytes // offsets)
+        lines = []
+        for offset in sorted(rng.randrange(len(head), size) for _ in range(offsets)):
+            f.seek(offset)
+            f.readline()  # Дочитываем строку, в которую попало смещение
+            lines.extend(f.read(step).splitlines(keepends=True)[:-1])
+    return head, b"".join(lines)
+
+
+def detect_encoding(data: bytes) -> str:
+    """First of ENCODINGS that decodes a sample; latin-1 decodes anything"""
+    if data.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig"
+    for encoding in ENCODINGS:
+        try:
+            data.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def detect_delimiter(text: str) -> str:
+    """Delimiter of a CSV sample, comma if it can't be told"""
+    try:
+        return csv.Sniffer().sniff(text, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+
+def dtype_name(values: pd.Series) -> str | None:
+    """
+    Dtype name of sampled column values, None if there are no values.
+
+    Text columns get a compact dtype: 'category' if values repeat (the
+    sample has at most CATEGORY_MAX_DISTINCT_RATIO distinct values), Arrow
+    strings otherwise.
+    """
+    present = values.dropna()
+    if present.empty:
+        return None
+    if is_bool_dtype(values):
+        return "bool"
+    if is_numeric_dtype(values):
+        return str(values.dtype)
+    if present.nunique() <= CATEGORY_MAX_DISTINCT_RATIO * len(present):
+        return "category"
+    return STRING_DTYPE
+
+
+def has_header(first_row: list, data: pd.DataFrame) -> bool:
+    """
+    Decide whether the first row of a table holds column names.
+
+    It does if some column that is numeric in the data has a non-numeric
+    value in the first row; blank cells are gaps, not names. Tables without numeric columns have a header
+    unless the first row has blanks or repeats, or every its value also
+    occurs in its column.
+
+    Args:
+        first_row: Values of the first row
+        data: Sample of the following rows, parsed with type inference
+    """
+    numeric = [
+        value
+        for value, column in zip(first_row, data.columns)
+        if dtype_name(data[column]) in ("int64", "float64")
+    ]
+    if numeric:
+        return any(
+            not pd.isna(value)
+            and str(value).strip()
+            and pd.isna(pd.to_numeric(value, errors="coerce"))
+            for value in numeric
+        )
+    values = ["" if pd.isna(value) else str(value).strip() for value in first_row]
+    if not all(values) or len(set(values)) < len(values):
+        return False
+    return not all(
+        value in set(data[column].dropna().astype(str).str.strip())
+        for value, column in zip(values, data.columns)
+    )
+
+
+def infer_schema(
+    filepath: str,
+    file_type: str,
+    sample_bytes: int = 64 * 1024,
+    offsets: int = 8,
+    sample_rows: int = 1000,
+) -> dict:
+    """
+    Detect the schema of a CSV/XLSX file from a sample.
+
+    Args:
+        filepath: Path to the file
+        file_type: File extension ('csv', 'xlsx')
+        sample_bytes: CSV head sample size (see sample_csv)
+        offsets: Number of random CSV offsets to sample
+        sample_rows: Number of XLSX rows to sample
+
+    Returns:
+        dict: {"delimiter", "encoding" (None for XLSX), "header" (0 or None),
+            "columns": names, "dtypes": {name: dtype name}}. Columns without
+            values in the sample have no dtype
+    """
+    schema = {"delimiter": None, "encoding": None, "header": None}
+    if file_type == "csv":
+        head, lines = sample_csv(filepath, sample_bytes, offsets)
+        encoding = detect_encoding(head + lines)
+        text = head.decode(encoding)
+        delimiter = detect_delimiter(text)
+        schema.update(delimiter=delimiter, encoding=encoding)
+        head_lines = text.splitlines(keepends=True)
+        if not head_lines:
+            return {**schema, "columns": [], "dtypes": {}}
+        first = pd.read_csv(
+            StringIO(head_lines[0]),
+            sep=delimiter,
+            header=None,
+            dtype=str,
+            keep_default_na=False,
+        )
+        first_row = first.iloc[0].tolist()
+        names = list(range(first.shape[1]))
+        rest = "".join(head_lines[1:]) + lines.decode(encoding)
+        data = _parse_sample(rest, delimiter, names)
+        header = 0 if has_header(first_row, data) else None
+        if header == 0:
+            columns = list(pd.read_csv(StringIO(text), sep=delimiter, nrows=0).columns)
+        else:
+            data = _parse_sample(head_lines[0] + rest, delimiter, names)
+    else:
+        raw = read_xlsx(filepath, header=None, nrows=sample_rows)
+        if raw.empty:
+            return {**schema, "columns": [], "dtypes": {}}
+        data = raw.iloc[1:].infer_objects()
+        header = 0 if has_header(raw.iloc[0].tolist(), data) else None
+        if header == 0:
+            columns = header_names(raw.iloc[0].tolist())
+        else:
+            data = raw.infer_objects()
+    if header is None:
+        columns = [f"Column {i}" for i in range(data.shape[1])]
+    dtypes = {}
+    for name, column in zip(columns, data.columns):
+        dtype = dtype_name(data[column])
+        if dtype is not None:
+            dtypes[name] = dtype
+    return {**schema, "header": header, "columns": columns, "dtypes": dtypes}
+
+
+def _parse_sample(text: str, delimiter: str, names: list[int]) -> pd.DataFrame:
+    """Sampled rows parsed with pandas type inference"""
+    if not text.strip():
+        return pd.DataFrame(columns=names)
+    # Строки со случайных смещений могут оказаться внутри значения в кавычках
+    return pd.read_csv(
+        StringIO(text), sep=delimiter, header=None, names=names, on_bad_lines="skip"
+    )
+
+
+# Целые и логические колонки оставлены pandas: пропуск после выборки
+# превращает их во float, а заданный dtype отверг бы такой файл
+PINNED_DTYPES = ("float64", "category", STRING_DTYPE, "object")
+TEXT_DTYPES = ("category", STRING_DTYPE, "object")
+
+
+def numeric_columns(schema: dict) -> list[str]:
+    """
+    Columns that may hold numbers: all but the sampled text ones.
+
+    A column with text in the sample is text in the whole file, so
+    statistics can skip reading it. Columns without sampled values are kept.
+    """
+    return [c for c in schema["columns"] if schema["dtypes"].get(c) not in TEXT_DTYPES]
+
+
+def read_options(
+    schema: dict, file_type: str, columns: list[str] | None = None, floats: bool = True
+) -> dict:
+    """
+    Keyword arguments of pd.read_csv/read_xlsx that read a file with its schema.
+
+    Args:
+        schema: Schema from infer_schema
+        file_type: File extension ('csv', 'xlsx')
+        columns: Read only these columns (None for all), passed as usecols
+        floats: Pin float columns too. Chunked readers can't re-read the
+            file when text follows the sample, so they pin only text
+            columns and leave numbers to per-chunk inference
+
+    Returns:
+        dict: header, names of headerless tables, dtype of sampled float and
+            text columns (see PINNED_DTYPES), usecols, and for CSV sep and
+            encoding
+    """
+    options = {"header": schema["header"]}
+    if schema["header"] is None:
+        options["names"] = schema["columns"]
+    if file_type == "csv":
+        options.update(sep=schema["delimiter"], encoding=schema["encoding"])
+    if columns is not None:
+        options["usecols"] = columns
+    options["dtype"] = {
+        name: dtype
+        for name, dtype in schema["dtypes"].items()
+        if dtype in (PINNED_DTYPES if floats else TEXT_DTYPES)
+        and (columns is None or name in columns)
+    }
+    return options
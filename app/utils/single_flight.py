@@ -0,0 +1,94 @@
+"""
+Coalescing of identical concurrent computations (single flight).
+
+Concurrent requests for the same missing result (same file, operation and
+parameters) compute it once:
+    - within a process, the first call registers a future under the key and
+      computes; identical calls in other threads wait on the future,
+    - across processes (web and Celery workers), the computing call holds a
+      Postgres transaction-level advisory lock derived from the key. It is
+      released when the computation commits its result (or rolls back);
+      callers that find the lock taken wait on it in shared mode.
+Under the lock, and after waiting, a call reads the stored result and
+computes only if nothing was stored. Callers check their cache first, so
+stored results are returned without taking the lock. An error of the
+computing call is raised in the calls of the same process that waited.
+"""
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Callable, TypeVar
+from sqlalchemy import func, select
+from app.extensions import db
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_in_flight: dict[tuple, Future] = {}
+
+
+def lock_id(key: tuple) -> int:
+    """Advisory lock id of a key: signed 64 bits of its SHA-256"""
+    digest = hashlib.sha256(repr(key).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def coalesce(
+    key: tuple,
+    compute: Callable[[], T],
+    cached: Callable[[], T | None],
+    refresh: Callable[[], None],
+) -> T:
+    """
+    Compute a result once for concurrent calls with the same key.
+
+    The caller checks its cache before; compute stores the result and
+    commits the session, which releases the advisory lock.
+
+    Args:
+        key: Operation and its parameters, e.g. ("basic_stats", file_id)
+        compute: Computes, stores and returns the result
+        cached: Returns the stored result or None
+        refresh: Drops records loaded by this call, so that cached reads
+            what the computing call stored
+
+    Returns:
+        Result of compute, or the stored result after waiting for another call
+    """
+    with _lock:
+        future = _in_flight.get(key)
+        leader = future is None
+        if leader:
+            future = _in_flight[key] = Future()
+    if not leader:
+        future.result()  # Ошибка вычисляющего вызова поднимается и здесь
+        return _stored_or_computed(compute, cached, refresh)
+    try:
+        lock = lock_id(key)
+        if not db.session.scalar(select(func.pg_try_advisory_xact_lock(lock))):
+            # Результат считает другой процесс: ждем его commit столько, сколько
+            # длится расчет, без statement_timeout соединения
+            timeout = db.session.scalar(select(func.current_setting("statement_timeout")))
+            db.session.execute(select(func.set_config("statement_timeout", "0", True)))
+            db.session.execute(select(func.pg_advisory_xact_lock_shared(lock)))
+            db.session.execute(select(func.set_config("statement_timeout", timeout, True)))
+        # Кэш проверяется еще раз под блокировкой: результат мог быть сохранен
+        # между проверкой вызывающего и захватом блокировки
+        result = _stored_or_computed(compute, cached, refresh)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(None)
+        return result
+    finally:
+        with _lock:
+            del _in_flight[key]
+
+
+def _stored_or_computed(
+    compute: Callable[[], T], cached: Callable[[], T | None], refresh: Callable[[], None]
+) -> T:
+    refresh()
+    result = cached()
+    return compute() if result is None else result
@@ -0,0 +1,272 @@
+import os
+import shutil
+import tempfile
+from typing import Any, Dict
+import numpy as np
+import pandas as pd
+from app.models import DataFile
+from app.utils.loader import iter_dataset_chunks
+from app.utils.streaming_stats import StreamingStats
+
+
+SPILL_BUCKET_BITS = 6  # 64 файла-корзины при сбросе хэшей на диск
+SPILL_RECORD = np.dtype([("hash", "<u8"), ("position", "<i8")])
+
+
+def row_hashes(chunk: pd.DataFrame) -> np.ndarray:
+    """
+    64-bit hashes of whole rows.
+
+    Numeric columns are hashed as float64, so the same value hashes equally
+    in chunks where pandas parsed the column as int and as float.
+    """
+    numeric = chunk.select_dtypes(include=["number"]).columns
+    normalized = chunk.astype({column: "float64" for column in numeric})
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+def first_occurrences(hashes: np.ndarray) -> np.ndarray:
+    """Mask of values that occur for the first time within the array"""
+    mask = np.zeros(hashes.size, dtype=bool)
+    mask[np.unique(hashes, return_index=True)[1]] = True
+    return mask
+
+
+class RowHashSet:
+    """
+    Compact set of 64-bit hashes, 8 bytes per hash.
+
+    Hashes are kept in sorted NumPy runs that are merged when a newer run
+    grows comparable to the previous one, so lookups cost O(log n) per run
+    and there are O(log n) runs.
+    """
+
+    def __init__(self):
+        self._runs: list[np.ndarray] = []
+
+    @property
+    def nbytes(self) -> int:
+        return sum(run.nbytes for run in self._runs)
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        found = np.zeros(hashes.size, dtype=bool)
+        for run in self._runs:
+            idx = np.minimum(np.searchsorted(run, hashes), run.size - 1)
+            found |= run[idx] == hashes
+        return found
+
+    def add(self, hashes: np.ndarray) -> None:
+        if not hashes.size:
+            return
+        self._runs.append(np.unique(hashes))
+        while len(self._runs) > 1 and self._runs[-2].size <= 2 * self._runs[-1].size:
+            last = self._runs.pop()
+            self._runs[-1] = np.union1d(self._runs[-1], last)
+
+
+class DuplicateDetector:
+    """
+    Find duplicate rows (every occurrence but the first) by row hashes.
+
+    Hashes of unique rows are kept in memory up to max_bytes. Past the budget,
+    hashes of further rows are spilled to bucket files on disk (by the top
+    bits of the hash) and resolved bucket by bucket in finish(). Until then
+    check() reports only duplicates of rows seen before the spill.
+
+    Args:
+        max_bytes: Memory budget of the in-memory hash set
+        spill_dir: Directory for spill files (system temp dir by default)
+    """
+
+    def __init__(self, max_bytes: int, spill_dir: str | None = None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spilled = False
+        self._seen = RowHashSet()
+        self._duplicates: list[np.ndarray] = []
+        self._tmpdir = None
+
+    def _bucket_path(self, bucket: int) -> str:
+        return os.path.join(self._tmpdir, f"{bucket:02x}.bin")
+
+    def _spill(self, hashes: np.ndarray, positions: np.ndarray) -> None:
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.mkdtemp(prefix="dedup-", dir=self.spill_dir)
+        records = np.empty(hashes.size, dtype=SPILL_RECORD)
+        records["hash"] = hashes
+        records["position"] = positions
+        buckets = hashes >> np.uint64(64 - SPILL_BUCKET_BITS)
+        for bucket in np.unique(buckets):
+            with open(self._bucket_path(int(bucket)), "ab") as f:
+                records[buckets == bucket].tofile(f)
+
+    def check(self, hashes: np.ndarray, offset: int) -> np.ndarray:
+        """
+        Register hashes of consecutive rows starting at global position offset.
+
+        Returns:
+            np.ndarray: Mask of rows already known to be duplicates
+        """
+        positions = offset + np.arange(hashes.size)
+        duplicate = self._seen.contains(hashes)
+        if not self.spilled and self._seen.nbytes + hashes.nbytes > self.max_bytes:
+            self.spilled = True
+        if self.spilled:
+            rest = ~duplicate
+            self._spill(hashes[rest], positions[rest])
+        else:
+            duplicate |= ~first_occurrences(hashes)
+            self._seen.add(hashes[~duplicate])
+        self._duplicates.append(positions[duplicate])
+        return duplicate
+
+    def finish(self) -> np.ndarray:
+        """
+        Resolve spilled buckets and return global positions of all duplicates.
+
+        Returns:
+            np.ndarray: Sorted positions of duplicate rows
+        """
+        if self._tmpdir is not None:
+            for name in sorted(os.listdir(self._tmpdir)):
+                records = np.fromfile(os.path.join(self._tmpdir, name), dtype=SPILL_RECORD)
+                records = records[np.lexsort((records["position"], records["hash"]))]
+                repeated = records["hash"][1:] == records["hash"][:-1]
+                self._duplicates.append(records["position"][1:][repeated])
+            shutil.rmtree(self._tmpdir, ignore_errors=True)
+            self._tmpdir = None
+        if not self._duplicates:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(self._duplicates))
+
+
+def _kept(chunk: pd.DataFrame, offset: int, duplicates: np.ndarray) -> pd.DataFrame:
+    """Drop rows of the chunk whose global positions are in duplicates"""
+    lo, hi = np.searchsorted(duplicates, [offset, offset + len(chunk)])
+    if lo == hi:
+        return chunk
+    mask = np.ones(len(chunk), dtype=bool)
+    mask[duplicates[lo:hi] - offset] = False
+    return chunk[mask]
+
+
+def clean_csv_streaming(
+    data_file: DataFile,
+    output_path: str,
+    handle_duplicates: str = "drop",
+    fill_missing: str = "mean",
+    chunksize: int = 100_000,
+    hash_memory_bytes: int = 256 * 1024 * 1024,
+    sketch_size: int = 1000,
+    spill_dir: str | None = None,
+) -> Dict[str, Any]:
+    """
+    Clean a CSV file in two streaming passes without holding it in memory.
+
+    The first pass finds duplicate rows by 64-bit row hashes and accumulates
+    fill values (mean exactly, median from a sketch) over the kept rows. The
+    second pass drops duplicates, fills missing values and appends cleaned
+    chunks straight to the output file, accumulating basic statistics of the
+    cleaned data on the way. If the hash set outgrows
+    hash_memory_bytes it spills to disk and fill values need an extra pass.
+
+    Rows with colliding 64-bit hashes are treated as duplicates; for a
+    billion rows the chance of any collision is about 3%.
+
+    Args:
+        data_file: DataFile record of the CSV to clean
+        output_path: Path of the cleaned CSV to write
+        handle_duplicates: 'drop' to remove or 'keep' to preserve duplicates
+        fill_missing: Strategy for missing values ('mean', 'median', 'zero')
+        chunksize: Rows per chunk
+        hash_memory_bytes: Memory budget of the duplicate hash set
+        sketch_size: KLL sketch parameter k for the median
+        spill_dir: Directory for spilled hashes
+
+    Returns:
+        dict: Cleaning report in the same structure as for in-memory cleaning,
+            plus 'stats' with basic statistics of the cleaned file
+
+    Raises:
+        ValueError: For invalid cleaning parameters
+    """
+    if handle_duplicates not in ("drop", "keep"):
+        raise ValueError("Invalid value for handle_duplicates. Valid: 'drop' or 'keep'")
+    if fill_missing not in ("mean", "median", "zero"):
+        raise ValueError("Invalid fill_missing. Valid: 'mean', 'median', 'zero'")
+
+    # 1-й проход: дубликаты и значения для заполнения
+    detector = (
+        DuplicateDetector(hash_memory_bytes, spill_dir)
+        if handle_duplicates == "drop"
+        else None
+    )
+    columns, stats = None, None
+    rows = 0
+    with_missing: set[str] = set()
+    for chunk in iter_dataset_chunks(data_file, chunksize):
+        if columns is None:
+            columns = list(chunk.columns)
+            numeric_cols = list(chunk.select_dtypes(include=["number"]).columns)
+            stats = StreamingStats(columns=numeric_cols, sketch_size=sketch_size)
+        with_missing.update(chunk.columns[chunk.isna().any()])
+        kept = chunk
+        if detector is not None:
+            kept = chunk[~detector.check(row_hashes(chunk), rows)]
+        if detector is None or not detector.spilled:
+            stats.update(kept)
+        rows += len(chunk)
+
+    duplicates = detector.finish() if detector is not None else np.empty(0, dtype=np.int64)
+    if detector is not None and detector.spilled:
+        # Дубликаты известны только после разбора корзин: отдельный проход
+        stats = StreamingStats(columns=numeric_cols, sketch_size=sketch_size)
+        offset = 0
+        for chunk in iter_dataset_chunks(data_file, chunksize):
+            stats.update(_kept(chunk, offset, duplicates))
+            offset += len(chunk)
+
+    fill_cols = [c for c in numeric_cols if c not in stats.non_numeric]
+    if fill_missing == "zero":
+        fill_values = dict.fromkeys(fill_cols, 0)
+    else:
+        result = stats.result()
+        fill_values = {c: result[fill_missing][c] for c in fill_cols}
+    # Колонки с пропусками при полном чтении имели бы тип float
+    float_cols = [c for c in fill_cols if c in with_missing]
+
+    # 2-й проход: запись очищенных частей сразу в итоговый файл
+    missing_before = dict.fromkeys(fill_cols, 0)
+    missing_after = dict.fromkeys(fill_cols, 0)
+    cleaned = StreamingStats(columns=numeric_cols, sketch_size=sketch_size)
+    offset = 0
+    with open(output_path, "w", encoding="utf-8", newline="") as out:
+        for i, chunk in enumerate(iter_dataset_chunks(data_file, chunksize)):
+            size = len(chunk)
+            chunk = _kept(chunk, offset, duplicates).copy()
+            offset += size
+            for column, count in chunk[fill_cols].isna().sum().items():
+                missing_before[column] += int(count)
+            chunk = chunk.astype({c: "float64" for c in float_cols})
+            chunk[fill_cols] = chunk[fill_cols].fillna(fill_values)
+            for column, count in chunk[fill_cols].isna().sum().items():
+                missing_after[column] += int(count)
+            cleaned.update(chunk)
+            chunk.to_csv(out, header=i == 0, index=False)
+
+    actions = ["duplicates_dropped"] if detector is not None else []
+    actions.append("missing_values_filled")
+    return {
+        "duplicates_removed": int(duplicates.size),
+        "missing_values_filled": sum(missing_before.values()) - sum(missing_after.values()),
+        "cleaning_report": {
+            "original_shape": [rows, len(columns)],
+            "actions_performed": actions,
+            "missing_values_filled": {
+                "before": missing_before,
+                "after": missing_after,
+                "method": fill_missing,
+            },
+        },
+        "stats": cleaned.result(),
+    }
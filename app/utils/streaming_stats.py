@@ -0,0 +1,277 @@
+from typing import Iterable
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+
+class KLLSketch:
+    """
+    Mergeable quantile sketch (KLL) over a stream of floats.
+
+    Keeps a hierarchy of compactors: items at level h carry weight 2**h.
+    Memory is O(k) regardless of the stream length, rank error is about 1.7/k.
+    While nothing has been compacted the sketch holds all values and
+    quantiles are exact.
+    """
+
+    def __init__(self, k: int = 1000, seed: int | None = None):
+        self.k = k
+        self.count = 0
+        self.levels: list[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if items.size > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                rest = items[:0]
+                if items.size % 2:
+                    rest, items = items[-1:], items[:-1]
+                # Каждый второй элемент поднимается на уровень выше с весом x2
+                offset = self._rng.integers(2)
+                self.levels[level + 1] = np.concatenate(
+                    [self.levels[level + 1], items[offset::2]]
+                )
+                self.levels[level] = rest
+            level += 1
+
+    def update(self, values: np.ndarray) -> None:
+        """Add values to the sketch, NaN are ignored"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        self.count += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Merge another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def to_dict(self) -> dict:
+        """JSON-serializable state of the sketch"""
+        return {
+            "k": self.k,
+            "count": self.count,
+            "levels": [level.tolist() for level in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(k=data["k"])
+        sketch.count = data["count"]
+        sketch.levels = [np.asarray(level, dtype=float) for level in data["levels"]]
+        return sketch
+
+    def quantile(self, q: float) -> float:
+        """Estimate q-quantile (0 <= q <= 1), NaN for an empty sketch"""
+        if self.count == 0:
+            return float("nan")
+        if len(self.levels) == 1:
+            return float(np.quantile(self.levels[0], q))
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(level.size, 2.0**h) for h, level in enumerate(self.levels)]
+        )
+        order = np.argsort(items)
+        cumulative = np.cumsum(weights[order])
+        idx = np.searchsorted(cumulative, q * cumulative[-1])
+        return float(items[order][min(idx, items.size - 1)])
+
+
+def _merge_moments(n_a, mean_a, m2_a, c_a, n_b, mean_b, m2_b, c_b):
+    """
+    Parallel-variance merge (Chan et al.) of pairwise moment matrices.
+
+    For a pair of columns (i, j) only rows where both are present count;
+    mean[i, j] and m2[i, j] describe column i over those rows, c[i, j] is the
+    co-moment. The diagonal holds per-column moments.
+    """
+    n = n_a + n_b
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight_b = np.where(n > 0, n_b / n, 0.0)
+        factor = np.where(n > 0, n_a * n_b / n, 0.0)
+    delta = mean_b - mean_a
+    mean = mean_a + delta * weight_b
+    m2 = m2_a + m2_b + delta**2 * factor
+    c = c_a + c_b + delta * delta.T * factor
+    return n, mean, m2, c
+
+
+class StreamingStats:
+    """
+    Mergeable accumulator of basic statistics over DataFrame chunks.
+
+    Mean and std use Welford/parallel-variance merging, the correlation
+    matrix uses pairwise co-moment sums (NaN are excluded pairwise, as in
+    DataFrame.corr), min/max are running extremes and the median comes from
+    a KLL sketch. Memory does not depend on the number of rows.
+
+    Args:
+        columns: Columns to accumulate. If None, numeric columns of the first
+            chunk are used. Columns that turn out non-numeric in any chunk
+            are left out of the result, like with a full-file read.
+        sketch_size: KLL sketch parameter k for the median
+        seed: Seed of the sketch compaction randomness
+    """
+
+    def __init__(
+        self,
+        columns: list[str] | None = None,
+        sketch_size: int = 1000,
+        seed: int | None = None,
+    ):
+        self.columns = list(columns) if columns is not None else None
+        self.sketch_size = sketch_size
+        self.seed = seed
+        self.non_numeric: set[str] = set()
+        self.n = None
+
+    def _init_state(self) -> None:
+        k = len(self.columns)
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))
+        self.m2 = np.zeros((k, k))
+        self.comoment = np.zeros((k, k))
+        self.min = np.full(k, np.nan)
+        self.max = np.full(k, np.nan)
+        self.sketches = [KLLSketch(self.sketch_size, self.seed) for _ in range(k)]
+
+    def _to_array(self, chunk: pd.DataFrame) -> np.ndarray:
+        frame = chunk.reindex(columns=self.columns)
+        for column in self.columns:
+            if not is_numeric_dtype(frame[column]):
+                self.non_numeric.add(column)
+                frame[column] = pd.to_numeric(frame[column], errors="coerce")
+        return frame.to_numpy(dtype=float, na_value=np.nan)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        """Accumulate one chunk of rows"""
+        if self.columns is None:
+            self.columns = [c for c in chunk.columns if is_numeric_dtype(chunk[c])]
+        if self.n is None:
+            self._init_state()
+        x = self._to_array(chunk)
+        mask = ~np.isnan(x)
+        if not mask.any():
+            return
+
+        # Моменты чанка считаются по данным, сдвинутым на среднее колонки,
+        # чтобы суммы квадратов не теряли точность
+        present = mask.astype(float)
+        counts = present.sum(axis=0)
+        totals = np.where(mask, x, 0.0).sum(axis=0)
+        shift = np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+        shifted = np.where(mask, x - shift, 0.0)
+
+        n = present.T @ present
+        sums = shifted.T @ present
+        sums_sq = (shifted * shifted).T @ present
+        products = shifted.T @ shifted
+        mean_shifted = np.divide(sums, n, out=np.zeros_like(sums), where=n > 0)
+        chunk_moments = (
+            n,
+            mean_shifted + shift[:, None],
+            sums_sq - sums * mean_shifted,
+            products - sums * mean_shifted.T,
+        )
+        self.n, self.mean, self.m2, self.comoment = _merge_moments(
+            self.n, self.mean, self.m2, self.comoment, *chunk_moments
+        )
+
+        chunk_min = np.where(mask, x, np.inf).min(axis=0)
+        chunk_max = np.where(mask, x, -np.inf).max(axis=0)
+        self.min = np.fmin(self.min, np.where(np.isinf(chunk_min), np.nan, chunk_min))
+        self.max = np.fmax(self.max, np.where(np.isinf(chunk_max), np.nan, chunk_max))
+        for i, sketch in enumerate(self.sketches):
+            sketch.update(x[:, i])
+
+    def merge(self, other: "StreamingStats") -> None:
+        """Merge accumulator built over another part of the same file"""
+        if other.n is None:
+            return
+        if self.n is None:
+            self.columns = other.columns
+            self._init_state()
+        if self.columns != other.columns:
+            raise ValueError("Cannot merge statistics over different columns")
+        self.n, self.mean, self.m2, self.comoment = _merge_moments(
+            self.n, self.mean, self.m2, self.comoment,
+            other.n, other.mean, other.m2, other.comoment,
+        )
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        for sketch, other_sketch in zip(self.sketches, other.sketches):
+            sketch.merge(other_sketch)
+        self.non_numeric |= other.non_numeric
+
+    def result(self) -> dict:
+        """
+        Statistics in the shape returned by DataAnalysis.get_data()
+
+        Returns:
+            dict: mean, median, correlation, std, min and max per column
+        """
+        columns = [c for c in (self.columns or []) if c not in self.non_numeric]
+        if self.n is None or not columns:
+            return {key: {} for key in ["mean", "median", "correlation", "std", "min", "max"]}
+        idx = [self.columns.index(c) for c in columns]
+        n = self.n[np.ix_(idx, idx)]
+        mean = self.mean[np.ix_(idx, idx)]
+        m2 = self.m2[np.ix_(idx, idx)]
+        comoment = self.comoment[np.ix_(idx, idx)]
+        count = np.diag(n)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.where(count > 0, np.diag(mean), np.nan)
+            stds = np.where(count > 1, np.sqrt(np.diag(m2) / (count - 1)), np.nan)
+            denominator = np.sqrt(m2 * m2.T)
+            corr = np.where((n > 1) & (denominator > 0), comoment / denominator, np.nan)
+        corr = np.clip(corr, -1.0, 1.0)
+
+        def by_column(values):
+            return {c: float(v) for c, v in zip(columns, values)}
+
+        return {
+            "mean": by_column(means),
+            "median": {c: self.sketches[i].quantile(0.5) for c, i in zip(columns, idx)},
+            "correlation": {
+                c: by_column(corr[:, j]) for j, c in enumerate(columns)
+            },
+            "std": by_column(stds),
+            "min": by_column(self.min[idx]),
+            "max": by_column(self.max[idx]),
+        }
+
+
+def compute_streaming_stats(
+    chunks: Iterable[pd.DataFrame], sketch_size: int = 1000
+) -> dict:
+    """
+    Compute basic statistics over a stream of DataFrame chunks.
+
+    Args:
+        chunks: Chunks of the same table (e.g. pd.read_csv(chunksize=...))
+        sketch_size: KLL sketch parameter k for the median
+
+    Returns:
+        dict: Statistics in the shape returned by DataAnalysis.get_data()
+    """
+    stats = StreamingStats(sketch_size=sketch_size)
+    for chunk in chunks:
+        stats.update(chunk)
+    return stats.result()
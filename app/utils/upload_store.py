@@ -0,0 +1,129 @@
+"""
+Content-addressed storage of uploaded data files.
+
+Files are stored in the upload folder as "<sha256>.<ext>". Uploads are
+written to a temporary file in the same folder while their hash is
+computed, then linked under the final name, so storing a file never probes
+for a free name and identical content always ends up in one file.
+"""
+import hashlib
+import os
+import tempfile
+from typing import BinaryIO
+from flask import Request, current_app
+
+
+class HashingFile:
+    """
+    Temporary upload file that hashes everything written to it.
+
+    The file lives in the upload folder, so it is linked under its content
+    address without copying. It is removed on close; the linked name stays.
+    """
+
+    def __init__(self, folder: str):
+        os.makedirs(folder, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=folder, prefix=".upload-")
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    @property
+    def name(self) -> str:
+        return self._file.name
+
+    def write(self, data: bytes) -> int:
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def __getattr__(self, attr):
+        # read/seek/flush/close идут в сам файл
+        return getattr(self._file, attr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+
+class UploadRequest(Request):
+    """
+    Request that streams uploaded files straight into the upload folder.
+
+    Werkzeug's form parser writes each chunk of a multipart file to the
+    stream returned here, so the body is hashed while it is received and
+    never spooled to a separate temporary file or kept in memory.
+    """
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        return HashingFile(current_app.config["UPLOAD_FOLDER"])
+
+
+def upload_filename(digest: str, file_type: str) -> str:
+    """Content-addressed name of a data file"""
+    return f"{digest}.{file_type}"
+
+
+def copy_to_upload(stream: BinaryIO, chunk_bytes: int) -> HashingFile:
+    """Copy a stream to a hashed temporary upload file in fixed-size chunks"""
+    target = HashingFile(current_app.config["UPLOAD_FOLDER"])
+    while chunk := stream.read(chunk_bytes):
+        target.write(chunk)
+    return target
+
+
+def commit_upload(upload: HashingFile, file_type: str) -> tuple[str, str, bool]:
+    """
+    Store a hashed temporary upload under its content address.
+
+    If a file with the same content is already stored, the upload is
+    discarded. The temporary file is closed (and removed) either way.
+
+    Args:
+        upload: Fully written temporary upload
+        file_type: File extension ('csv', 'xlsx')
+
+    Returns:
+        tuple: (filename, full filepath, True if the file is new)
+    """
+    filename = upload_filename(upload.hexdigest(), file_type)
+    filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
+    with upload:
+        upload.flush()
+        try:
+            os.link(upload.name, filepath)
+        except FileExistsError:
+            # То же содержимое уже сохранено (в том числе параллельной загрузкой)
+            return filename, filepath, False
+    return filename, filepath, True
+
+
+def commit_file(path: str, file_type: str, chunk_bytes: int) -> tuple[str, str, bool]:
+    """
+    Move a file written in place (e.g. by streaming cleaning) to its content address.
+
+    Args:
+        path: File in the upload folder
+        file_type: File extension
+        chunk_bytes: Read size for hashing
+
+    Returns:
+        tuple: (filename, full filepath, True if the file is new)
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_bytes):
+            digest.update(chunk)
+    filename = upload_filename(digest.hexdigest(), file_type)
+    filepath = os.path.join(current_app.config["UPLOAD_FOLDER"], filename)
+    if os.path.exists(filepath):
+        os.remove(path)
+        return filename, filepath, False
+    os.replace(path, filepath)
+    return filename, filepath, True
@@ -0,0 +1,121 @@
+"""
+Benchmark: analysis cache lookups with and without the unique index.
+
+Two temporary tables shaped like data_analyses are filled with --rows
+analyses (four types per file): one without indexes, as data_analyses was
+before, and one with the unique (data_file_id, analysis_type) constraint.
+For each table the median time over --lookups random files is reported for:
+    - lookup: the cache check of get_cached_analysis,
+    - write: storing an analysis, as SELECT then INSERT without the
+      constraint and as one INSERT ... ON CONFLICT DO NOTHING with it,
+and the plan of the lookup is printed.
+
+The database of Config is used (DB_* environment variables); the tables
+are temporary and disappear with the connection.
+
+Usage:
+    DB_NAME=data_analytics_db python benchmarks/bench_cache_index.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config import Config  # noqa: E402
+
+TYPES = ("basic_stats", "approx_stats", "cleaning", "correlation")
+
+TABLE = """
+CREATE TEMPORARY TABLE {name} (
+    id serial PRIMARY KEY,
+    data_file_id integer NOT NULL,
+    analysis_type varchar(50),
+    analysis_date timestamp DEFAULT now(),
+    stats_mean jsonb
+)
+"""
+
+FILL = """
+INSERT INTO {name} (data_file_id, analysis_type, stats_mean)
+SELECT i / 4, (ARRAY['basic_stats', 'approx_stats', 'cleaning', 'correlation'])[i % 4 + 1],
+       jsonb_build_object('value', i)
+FROM generate_series(0, :rows - 1) AS i
+"""
+
+LOOKUP = "SELECT * FROM {name} WHERE data_file_id = :file_id AND analysis_type = :type"
+
+UPSERT = """
+INSERT INTO {name} (data_file_id, analysis_type, stats_mean)
+VALUES (:file_id, :type, '{{}}')
+ON CONFLICT (data_file_id, analysis_type) DO NOTHING
+RETURNING id
+"""
+
+INSERT = """
+INSERT INTO {name} (data_file_id, analysis_type, stats_mean)
+VALUES (:file_id, :type, '{{}}')
+"""
+
+
+def timed(calls) -> float:
+    runs = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine(Config.SQLALCHEMY_DATABASE_URI)
+    rng = random.Random(0)
+    files = args.rows // len(TYPES)
+    keys = [
+        {"file_id": rng.randrange(files), "type": rng.choice(TYPES)}
+        for _ in range(args.lookups)
+    ]
+    # Новые файлы: запись анализа, которого еще нет
+    new_keys = [{"file_id": files + i, "type": "basic_stats"} for i in range(args.lookups)]
+    with engine.connect() as conn:
+        print(f"{args.rows} analyses of {files} files")
+        print(f"{'table':>14}  {'lookup, ms':>10}  {'write, ms':>9}  plan")
+        for name, index in (("seq_scan", False), ("unique_index", True)):
+            conn.execute(text(TABLE.format(name=name)))
+            conn.execute(text(FILL.format(name=name)), {"rows": args.rows})
+            if index:
+                conn.execute(
+                    text(f"ALTER TABLE {name} ADD UNIQUE (data_file_id, analysis_type)")
+                )
+            conn.execute(text(f"ANALYZE {name}"))
+            lookup = text(LOOKUP.format(name=name))
+            plan = conn.execute(text("EXPLAIN " + LOOKUP.format(name=name)), keys[0])
+            node = plan.scalar().split("  (")[0]
+            lookup_ms = timed(lambda key=key: conn.execute(lookup, key) for key in keys)
+            if index:
+                upsert = text(UPSERT.format(name=name))
+                write_ms = timed(lambda key=key: conn.execute(upsert, key) for key in new_keys)
+            else:
+                # Без ограничения: проверка наличия, затем вставка
+                insert = text(INSERT.format(name=name))
+
+                def write(key):
+                    if conn.execute(lookup, key).first() is None:
+                        conn.execute(insert, key)
+
+                write_ms = timed(lambda key=key: write(key) for key in new_keys)
+            print(f"{name:>14}  {lookup_ms:10.3f}  {write_ms:9.3f}  {node}")
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
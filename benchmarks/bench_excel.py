@@ -0,0 +1,91 @@
+"""
+Benchmark: reading and writing a large XLSX workbook.
+
+A workbook with integer, float, repeated text and date columns is written
+once, then each operation is timed (median over --repeat runs):
+    - write: DataFrame.to_excel (openpyxl, whole workbook in memory) against
+      write_xlsx (write-only workbook streamed to the path),
+    - read: pd.read_excel against read_xlsx (calamine if installed,
+      otherwise openpyxl read-only values collected by column),
+    - schema: infer_schema of the workbook,
+    - sidecar: reading the Parquet sidecar every later request uses.
+
+Usage:
+    python benchmarks/bench_excel.py --rows 200000 --columns 10 --repeat 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils.excel import calamine_available, read_xlsx, write_xlsx  # noqa: E402
+from app.utils.loader import write_sidecar  # noqa: E402
+from app.utils.schema import infer_schema, read_options  # noqa: E402
+
+
+def make_frame(rows: int, columns: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    words = np.array([f"category_{i}" for i in range(20)])
+    data = {}
+    for i in range(columns):
+        kind = i % 4
+        if kind == 0:
+            data[f"int_{i}"] = rng.integers(0, 1000, rows)
+        elif kind == 1:
+            data[f"float_{i}"] = rng.normal(0, 1, rows)
+        elif kind == 2:
+            data[f"label_{i}"] = words[rng.integers(0, words.size, rows)]
+        else:
+            data[f"date_{i}"] = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+                rng.integers(0, 365 * 24, rows), unit="h"
+            )
+    return pd.DataFrame(data)
+
+
+def timed(func, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--columns", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.columns)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "large.xlsx")
+        write_xlsx(df, path)
+        size_mb = os.path.getsize(path) / 2**20
+        engine = "calamine" if calamine_available() else "openpyxl read-only"
+        print(f"{args.rows} rows x {args.columns} columns, {size_mb:.1f} MB, reader: {engine}")
+        schema = infer_schema(path, "xlsx")
+        write_sidecar(path, "xlsx", schema)
+        options = read_options(schema, "xlsx")
+        operations = {
+            "to_excel": lambda: df.to_excel(os.path.join(folder, "a.xlsx"), index=False),
+            "write_xlsx": lambda: write_xlsx(df, os.path.join(folder, "b.xlsx")),
+            "pd.read_excel": lambda: pd.read_excel(path),
+            "read_xlsx": lambda: read_xlsx(path, **options),
+            "infer_schema": lambda: infer_schema(path, "xlsx"),
+            "parquet sidecar": lambda: pd.read_parquet(path + ".parquet"),
+        }
+        print(f"{'operation':>16}  {'time, s':>8}")
+        for name, operation in operations.items():
+            print(f"{name:>16}  {timed(operation, args.repeat):8.2f}")
+
+
+if __name__ == "__main__":
+    main()
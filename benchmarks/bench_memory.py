@@ -0,0 +1,110 @@
+"""
+Benchmark: memory of loading a wide CSV file.
+
+A synthetic table with equal shares of small integer, float, repeated text
+and unique text columns is written once, then every operation runs in a
+fresh interpreter and reports (median over --repeat runs) wall time, the
+deep memory size of the resulting frame and the peak RSS growth during the
+operation (Linux only: the peak is reset through /proc/self/clear_refs):
+    - pandas defaults: pd.read_csv with type guessing and object strings,
+    - schema: parse_dataset with the inferred schema (category and Arrow
+      strings, downcast integers),
+    - stats columns: parse_dataset of the columns basic statistics need.
+
+Usage:
+    python benchmarks/bench_memory.py --rows 200000 --columns 100 --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+from app.utils.loader import parse_dataset
+from app.utils.schema import infer_schema, numeric_columns
+
+def status(field):
+    with open("/proc/self/status") as f:
+        return int(f.read().split(field + ":")[1].split()[0])
+
+path = {path!r}
+schema = infer_schema(path, "csv")
+# Сброс пикового RSS (VmHWM): пик импорта не должен маскировать пик операции
+with open("/proc/self/clear_refs", "w") as f:
+    f.write("5")
+before = status("VmRSS")
+started = time.perf_counter()
+{operation}
+elapsed = time.perf_counter() - started
+peak = status("VmHWM") - before
+print(json.dumps({{"seconds": elapsed, "frame_mb": df.memory_usage(deep=True).sum() / 2**20,
+                  "peak_mb": peak / 1024}}))
+"""
+
+OPERATIONS = {
+    "pandas defaults": "df = pd.read_csv(path)",
+    "schema": "df = parse_dataset(path, 'csv', schema)",
+    "stats columns": (
+        "df = parse_dataset(path, 'csv', schema, columns=numeric_columns(schema))"
+    ),
+}
+
+
+def make_table(path: str, rows: int, columns: int) -> None:
+    rng = np.random.default_rng(0)
+    words = np.array([f"category_{i}" for i in range(20)])
+    data = {}
+    for i in range(columns):
+        kind = i % 4
+        if kind == 0:
+            data[f"int_{i}"] = rng.integers(0, 100, rows)
+        elif kind == 1:
+            data[f"float_{i}"] = rng.normal(0, 1, rows)
+        elif kind == 2:
+            data[f"label_{i}"] = words[rng.integers(0, words.size, rows)]
+        else:
+            data[f"id_{i}"] = [f"id-{i}-{j}" for j in range(rows)]
+    pd.DataFrame(data).to_csv(path, index=False)
+
+
+def probe(path: str, operation: str) -> dict:
+    code = PROBE.format(root=ROOT, path=path, operation=operation)
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--columns", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "wide.csv")
+        make_table(path, args.rows, args.columns)
+        size_mb = os.path.getsize(path) / 2**20
+        print(f"{args.rows} rows x {args.columns} columns, {size_mb:.1f} MB on disk")
+        print(f"{'operation':>16}  {'time, s':>8}  {'frame, MB':>9}  {'peak RSS, MB':>12}")
+        for name, operation in OPERATIONS.items():
+            runs = [probe(path, operation) for _ in range(args.repeat)]
+            seconds = statistics.median(run["seconds"] for run in runs)
+            frame = statistics.median(run["frame_mb"] for run in runs)
+            peak = statistics.median(run["peak_mb"] for run in runs)
+            print(f"{name:>16}  {seconds:8.2f}  {frame:9.1f}  {peak:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
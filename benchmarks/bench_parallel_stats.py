@@ -0,0 +1,75 @@
+"""
+Benchmark: parallel partitioned analysis vs the in-memory analyze_data path.
+
+Generates a synthetic numeric CSV and times
+    - pd.read_csv + compute_basic_stats (what analyze_data does for files
+      that fit in memory),
+    - compute_parallel_stats with 1, 4, 16 and 32 worker processes.
+
+Usage:
+    python benchmarks/bench_parallel_stats.py --rows 5000000 --cols 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.utils.data_processor import compute_basic_stats
+from app.utils.parallel_stats import compute_parallel_stats
+
+
+def make_csv(path: str, rows: int, cols: int) -> None:
+    rng = np.random.default_rng(0)
+    block = 1_000_000
+    for i, start in enumerate(range(0, rows, block)):
+        size = min(block, rows - start)
+        df = pd.DataFrame(
+            rng.normal(0, 1, (size, cols)), columns=[f"c{j}" for j in range(cols)]
+        )
+        df.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+
+def timed(func, *args, **kwargs) -> float:
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--cols", type=int, default=10)
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--partition-mb", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.csv")
+        make_csv(path, args.rows, args.cols)
+        size_mb = os.path.getsize(path) / 2**20
+        print(f"file: {args.rows} rows x {args.cols} cols, {size_mb:.0f} MB")
+        print(f"host cpus: {os.cpu_count()}")
+
+        baseline = timed(lambda: compute_basic_stats(pd.read_csv(path)))
+        print(f"{'in-memory analyze_data':>24}: {baseline:8.2f} s")
+        for cores in args.cores:
+            elapsed = timed(
+                compute_parallel_stats,
+                path,
+                workers=cores,
+                partition_bytes=args.partition_mb * 2**20,
+            )
+            note = " (more workers than cpus)" if cores > (os.cpu_count() or 1) else ""
+            print(
+                f"{f'parallel, {cores} cores':>24}: {elapsed:8.2f} s"
+                f"  x{baseline / elapsed:.2f}{note}"
+            )
+
+
+if __name__ == "__main__":
+    main()
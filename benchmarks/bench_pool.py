@@ -0,0 +1,143 @@
+"""
+Load test: connection pool under concurrent requests.
+
+The app is served by a threaded WSGI server in this process, and --concurrency
+clients send --requests GET /data/<id>/stats requests in total (statistics
+are cached, so each request is a database round trip) for every pool
+setting:
+    - SQLAlchemy defaults: 5 connections + 10 overflow,
+    - Config defaults: DB_POOL_SIZE + DB_MAX_OVERFLOW,
+    - sized for the concurrency: --concurrency / 2 + --concurrency / 2.
+Reported are the request latency percentiles, errors, and from /db/pool the
+maximum and mean wait for a connection and the number of pool timeouts
+(DB_POOL_TIMEOUT is lowered to --pool-timeout so that starvation shows up
+as errors instead of 30 s stalls).
+
+The database of Config is used (DB_* environment variables) and must be
+migrated (flask db upgrade).
+
+Usage:
+    DB_NAME=data_analytics_db python benchmarks/bench_pool.py --concurrency 64
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from config import Config  # noqa: E402
+
+
+def upload(base: str) -> int:
+    boundary = uuid.uuid4().hex
+    csv = "a,b\n" + "".join(f"{i},{i % 7}\n" for i in range(1000)) + f"0,{boundary}\n"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="pool.csv"\r\n'
+        "Content-Type: text/csv\r\n\r\n"
+        f"{csv}\r\n--{boundary}--\r\n"
+    ).encode()
+    request = urllib.request.Request(
+        f"{base}/upload",
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)["id"]
+
+
+def get(url: str) -> tuple[float, bool]:
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=60) as response:
+            response.read()
+        ok = True
+    except urllib.error.URLError:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def run(settings: dict, args) -> dict:
+    with tempfile.TemporaryDirectory() as folder:
+
+        class BenchConfig(Config):
+            UPLOAD_FOLDER = folder
+            PLOT_FOLDER = os.path.join(folder, "plots")
+            DB_POOL_TIMEOUT = args.pool_timeout
+            CREATE_DATABASE = False
+
+        for name, value in settings.items():
+            setattr(BenchConfig, name, value)
+        app = create_app(BenchConfig)
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_port}/api/v1"
+        try:
+            file_id = upload(base)
+            get(f"{base}/data/{file_id}/stats")
+            url = f"{base}/data/{file_id}/stats"
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                results = list(pool.map(get, [url] * args.requests))
+            elapsed = time.perf_counter() - started
+            with urllib.request.urlopen(f"{base}/db/pool") as response:
+                status = json.load(response)
+        finally:
+            server.shutdown()
+            with app.app_context():
+                db.engine.dispose()
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        "rps": len(results) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": sum(not ok for _, ok in results),
+        "wait_max": status["wait_seconds_max"] * 1000,
+        "wait_mean": status["wait_seconds_total"] / max(status["checkouts"], 1) * 1000,
+        "timeouts": status["timeouts"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--pool-timeout", type=int, default=5)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    half = args.concurrency // 2
+    scenarios = {
+        "sqlalchemy 5+10": {"DB_POOL_SIZE": 5, "DB_MAX_OVERFLOW": 10},
+        f"config {Config.DB_POOL_SIZE}+{Config.DB_MAX_OVERFLOW}": {},
+        f"sized {half}+{half}": {"DB_POOL_SIZE": half, "DB_MAX_OVERFLOW": half},
+    }
+    print(f"{args.requests} requests, {args.concurrency} concurrent")
+    print(
+        f"{'pool':>16}  {'req/s':>7}  {'p50, ms':>8}  {'p99, ms':>8}  {'errors':>6}"
+        f"  {'wait max, ms':>12}  {'wait mean, ms':>13}  {'timeouts':>8}"
+    )
+    for name, settings in scenarios.items():
+        r = run(settings, args)
+        print(
+            f"{name:>16}  {r['rps']:7.0f}  {r['p50']:8.1f}  {r['p99']:8.1f}  {r['errors']:6d}"
+            f"  {r['wait_max']:12.1f}  {r['wait_mean']:13.2f}  {r['timeouts']:8d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: worker startup cost of the application modules.
+
+Each scenario runs in a fresh interpreter and reports import wall time and
+peak RSS (median over --repeat runs):
+    - app modules as imported now (matplotlib is loaded on first plot),
+    - app modules plus matplotlib.pyplot, which is what every worker paid
+      when data_processor imported pyplot at module level,
+    - app modules plus rendering of the first plot.
+
+Usage:
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import app.routes, app.tasks
+{extra}
+elapsed = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "rss_mb": rss / 1024,
+                  "matplotlib": "matplotlib" in sys.modules}}))
+"""
+
+SCENARIOS = {
+    "app (lazy matplotlib)": "",
+    "app + pyplot (eager)": "import matplotlib.pyplot",
+    "app + first plot": (
+        "from app.utils.rendering import new_figure, figure_bytes\n"
+        "fig, ax = new_figure()\n"
+        "ax.stairs([1, 3, 2], [0, 1, 2, 3], fill=True)\n"
+        "figure_bytes(fig, {'format': 'png', 'dpi': 100})"
+    ),
+}
+
+
+def probe(extra: str) -> dict:
+    code = PROBE.format(root=ROOT, extra=extra)
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'scenario':>24}  {'import, s':>9}  {'peak RSS, MB':>12}  matplotlib")
+    for name, extra in SCENARIOS.items():
+        runs = [probe(extra) for _ in range(args.repeat)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss = statistics.median(run["rss_mb"] for run in runs)
+        print(f"{name:>24}  {seconds:9.3f}  {rss:12.1f}  {runs[0]['matplotlib']}")
+
+
+if __name__ == "__main__":
+    main()
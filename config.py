@@ -12,7 +12,80 @@ class Config:
     SQLALCHEMY_DATABASE_URI = f"postgresql+psycopg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = "uploads"
+    # Размер части при копировании и хэшировании загружаемых файлов
+    UPLOAD_CHUNK_BYTES = 1024 * 1024
+    # Выборка для определения схемы файла: начало и строки со случайных смещений
+    SCHEMA_SAMPLE_BYTES = 64 * 1024
+    SCHEMA_SAMPLE_OFFSETS = 8
+    # Размер частей возобновляемой загрузки (последняя может быть меньше)
+    MULTIPART_PART_BYTES = 8 * 1024 * 1024
+    MULTIPART_MIN_PART_BYTES = 1024 * 1024
+    MULTIPART_MAX_PART_BYTES = 1024 * 1024 * 1024
+    # Предел размера файла возобновляемой загрузки (место выделяется сразу)
+    MULTIPART_MAX_FILE_BYTES = int(
+        os.environ.get("MULTIPART_MAX_FILE_BYTES") or 64 * 1024**3
+    )
+    # Предел места, зарезервированного всеми открытыми загрузками
+    MULTIPART_MAX_RESERVED_BYTES = int(
+        os.environ.get("MULTIPART_MAX_RESERVED_BYTES") or 256 * 1024**3
+    )
+    # Загрузка без новых частей дольше этого срока удаляется вместе с файлом
+    MULTIPART_SESSION_TTL_SECONDS = int(
+        os.environ.get("MULTIPART_SESSION_TTL_SECONDS") or 24 * 3600
+    )
+    # Хранилище отрисованных графиков (PNG по адресу содержимого)
+    PLOT_FOLDER = os.environ.get("PLOT_FOLDER") or "plots"
+    # Предел числа точек в plot_json для отрисовки на клиенте
+    PLOT_JSON_MAX_POINTS = 5000
+    # Scatter с большим числом строк рисуется сеткой плотности (режим auto)
+    SCATTER_DENSITY_THRESHOLD_ROWS = int(
+        os.environ.get("SCATTER_DENSITY_THRESHOLD_ROWS") or 100_000
+    )
+    SCATTER_GRID_SIZE = 256
+    SCATTER_SAMPLE_POINTS = 20_000
     ALLOWED_EXTENSIONS = {"csv", "xlsx"}
+    # Бюджет памяти кэша разобранных DataFrame (байты)
+    DATASET_CACHE_MAX_BYTES = int(
+        os.environ.get("DATASET_CACHE_MAX_BYTES") or 512 * 1024 * 1024
+    )
+    # Файлы от этого размера обрабатываются по частям, не загружаясь целиком
+    LARGE_FILE_THRESHOLD_BYTES = int(
+        os.environ.get("LARGE_FILE_THRESHOLD_BYTES") or 256 * 1024 * 1024
+    )
+    STREAMING_CHUNK_ROWS = 100_000
+    STREAMING_SKETCH_SIZE = 1000
+    # Приближенная статистика (?mode=approx): блоки CSV со случайных смещений
+    # или резервуарная выборка строк; файлы не больше выборки считаются точно
+    APPROX_SAMPLE_BLOCKS = 64
+    APPROX_BLOCK_BYTES = 64 * 1024
+    APPROX_SAMPLE_ROWS = 100_000
+    APPROX_CONFIDENCE = 0.95
+    # Бюджет памяти хэшей строк при потоковом удалении дубликатов
+    CLEANING_HASH_MEMORY_BYTES = 256 * 1024 * 1024
+    # Параллельный анализ CSV: число процессов и размер части файла
+    PARALLEL_WORKERS = int(os.environ.get("PARALLEL_WORKERS") or os.cpu_count() or 1)
+    PARALLEL_PARTITION_BYTES = int(
+        os.environ.get("PARALLEL_PARTITION_BYTES") or 64 * 1024 * 1024
+    )
+    # "memory://" выполняет задачи в процессе веб-сервера (без Redis)
+    CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL") or "memory://"
+    CELERY_RESULT_BACKEND = (
+        os.environ.get("CELERY_RESULT_BACKEND") or "cache+memory://"
+    )
+    # Число SQL-запросов обработки запроса в заголовке X-Query-Count
+    QUERY_COUNT_HEADER = os.environ.get("QUERY_COUNT_HEADER") == "1"
+    # Пул соединений с БД каждого процесса (см. app.utils.db_pool)
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE") or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW") or 20)
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT") or 30)  # Секунды
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE") or 1800)  # Секунды
+    DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS") or 30_000)
+    # Создание БД при запуске; в production БД уже есть и проверка не нужна
+    CREATE_DATABASE = (
+        os.environ.get("CREATE_DATABASE")
+        or ("0" if os.environ.get("FLASK_ENV") == "production" else "1")
+    ) == "1"
     MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
 
 
@@ -27,6 +100,39 @@ class TestConfig:
     SQLALCHEMY_DATABASE_URI = f"postgresql+psycopg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), "tests", "test_uploads")
+    UPLOAD_CHUNK_BYTES = 1024 * 1024
+    SCHEMA_SAMPLE_BYTES = 64 * 1024
+    SCHEMA_SAMPLE_OFFSETS = 8
+    MULTIPART_PART_BYTES = 8 * 1024 * 1024
+    MULTIPART_MIN_PART_BYTES = 1
+    MULTIPART_MAX_PART_BYTES = 1024 * 1024 * 1024
+    MULTIPART_MAX_FILE_BYTES = 1024 * 1024 * 1024
+    MULTIPART_MAX_RESERVED_BYTES = 4 * 1024 * 1024 * 1024
+    MULTIPART_SESSION_TTL_SECONDS = 24 * 3600
+    PLOT_FOLDER = os.path.join(os.path.dirname(__file__), "tests", "test_plots")
+    PLOT_JSON_MAX_POINTS = 5000
+    SCATTER_DENSITY_THRESHOLD_ROWS = 100_000
+    SCATTER_GRID_SIZE = 256
+    SCATTER_SAMPLE_POINTS = 20_000
     CELERY_BROKER_URL = "memory://"
     CELERY_RESULT_BACKEND = "cache+memory://"
     ALLOWED_EXTENSIONS = {"csv", "xlsx"}
+    DATASET_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    LARGE_FILE_THRESHOLD_BYTES = 256 * 1024 * 1024
+    STREAMING_CHUNK_ROWS = 100_000
+    STREAMING_SKETCH_SIZE = 1000
+    APPROX_SAMPLE_BLOCKS = 16
+    APPROX_BLOCK_BYTES = 4096
+    APPROX_SAMPLE_ROWS = 2000
+    APPROX_CONFIDENCE = 0.95
+    CLEANING_HASH_MEMORY_BYTES = 256 * 1024 * 1024
+    PARALLEL_WORKERS = 1
+    PARALLEL_PARTITION_BYTES = 64 * 1024 * 1024
+    QUERY_COUNT_HEADER = True
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+    DB_STATEMENT_TIMEOUT_MS = 30_000
+    CREATE_DATABASE = True
@@ -97,6 +97,10 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        # DDL и построение индексов не ограничиваются statement_timeout
+        # соединений приложения (DB_STATEMENT_TIMEOUT_MS)
+        connection.exec_driver_sql("SET statement_timeout = 0")
+        connection.commit()
         from app.models import Base  # Импортируем ваш Base
         context.configure(
             connection=connection,
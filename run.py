@@ -3,6 +3,7 @@ from app import create_app
 from config import Config
 
 app = create_app(Config)
+celery_app = app.extensions["celery"]
 
 if __name__ == '__main__':
     # Создаем папку для загрузок, если ее нет
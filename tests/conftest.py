@@ -1,6 +1,7 @@
 import pytest
 from io import BytesIO
 import os
+import shutil
 import sys
 from sqlalchemy_utils import create_database, database_exists
 
@@ -8,6 +9,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from app import create_app
 from app.extensions import db as _db
+from app.utils.loader import sidecar_executor
 from config import TestConfig
 import pandas as pd
 
@@ -25,9 +27,12 @@ def app():
     yield app
     with app.app_context():
         _db.drop_all()
+    # Дожидаемся фоновой конвертации в Parquet перед удалением файлов
+    sidecar_executor.submit(lambda: None).result()
     # Очистка тестовых файлов
     for f in os.listdir(TestConfig.UPLOAD_FOLDER):
         os.remove(os.path.join(TestConfig.UPLOAD_FOLDER, f))
+    shutil.rmtree(TestConfig.PLOT_FOLDER, ignore_errors=True)
 
 
 @pytest.fixture(scope="module")
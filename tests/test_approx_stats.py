@@ -0,0 +1,83 @@
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from app.models import DataAnalysis
+from app.utils.approx_stats import approximate_stats, csv_block_sample, reservoir_sample
+from app.utils.loader import sidecar_executor
+from app.utils.schema import infer_schema
+
+
+@pytest.fixture
+def wide_frame():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({"a": rng.normal(10, 2, 20_000), "c": rng.exponential(3, 20_000)})
+    df["b"] = df["a"] * 0.5 + rng.normal(0, 1, 20_000)
+    df["label"] = np.where(df["a"] > 10, "high", "low")
+    return df
+
+
+def _covers(interval, value):
+    return interval[0] <= value <= interval[1]
+
+
+def test_intervals_cover_exact_values(tmp_path, wide_frame):
+    """Тест: интервалы по блокам со случайных смещений накрывают точные значения"""
+    path = tmp_path / "wide.csv"
+    wide_frame.to_csv(path, index=False)
+    schema = infer_schema(str(path), "csv")
+    sample = csv_block_sample(str(path), schema, ["a", "b", "c"], blocks=32, block_bytes=8192, seed=1)
+    assert 0 < len(sample) < len(wide_frame)
+    stats = approximate_stats(sample, ["a", "b", "c"], confidence=0.99)
+    assert stats["sample_rows"] == len(sample)
+    exact = wide_frame[["a", "b", "c"]]
+    for column in ["a", "b", "c"]:
+        assert _covers(stats["intervals"]["mean"][column], exact[column].mean())
+        assert _covers(stats["intervals"]["std"][column], exact[column].std())
+        assert _covers(stats["intervals"]["median"][column], exact[column].median())
+    assert _covers(stats["intervals"]["correlation"]["a"]["b"], exact["a"].corr(exact["b"]))
+
+
+def test_reservoir_sample_is_uniform(wide_frame):
+    """Тест: резервуарная выборка за один проход по частям"""
+    chunks = [wide_frame.iloc[i : i + 3000] for i in range(0, len(wide_frame), 3000)]
+    sample = reservoir_sample(chunks, 1000, seed=0)
+    assert len(sample) == 1000
+    assert sample["a"].mean() == pytest.approx(wide_frame["a"].mean(), abs=0.3)
+    assert len(reservoir_sample(chunks[:1], 5000)) == 3000
+
+
+def test_approx_mode_upgraded_to_exact(client, db, wide_frame):
+    """Тест: ?mode=approx отвечает по выборке и запускает точный расчет"""
+    data = BytesIO(wide_frame.to_csv(index=False).encode())
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "approx_test.csv")},
+        content_type="multipart/form-data",
+    ).json["id"]
+    sidecar_executor.submit(lambda: None).result()
+
+    response = client.get(f"/api/v1/data/{file_id}/stats?mode=approx&columns=a,b")
+    assert response.status_code == 200
+    body = response.json
+    assert body["approximate"] is True
+    assert set(body["mean"]) == {"a", "b"}
+    assert set(body["intervals"]["correlation"]["a"]) == {"a", "b"}
+    assert body["sample_rows"] < len(wide_frame)
+    assert _covers(body["intervals"]["mean"]["a"], wide_frame["a"].mean())
+    # Задача точного расчета запускается после отправки ответа (сервер WSGI
+    # закрывает ответ сам, тестовый клиент - нет)
+    response.close()
+    job = client.get(body["status_url"]).json
+    assert job["status"] == "SUCCESS"
+
+    with client.application.app_context():
+        analyses = db.session.query(DataAnalysis).filter_by(data_file_id=file_id).all()
+        assert [a.analysis_type for a in analyses] == ["basic_stats"]
+    exact = client.get(f"/api/v1/data/{file_id}/stats?mode=approx").json
+    assert exact["approximate"] is False
+    assert "intervals" not in exact
+    assert exact["mean"]["a"] == pytest.approx(wide_frame["a"].mean())
+
+    response = client.get(f"/api/v1/data/{file_id}/stats?mode=fast")
+    assert response.status_code == 400
@@ -0,0 +1,41 @@
+import numpy as np
+from app.utils.binning import (
+    bin_counts,
+    density_grid,
+    histogram_edges,
+    stratified_sample,
+)
+
+
+def test_density_grid_matches_histogram2d():
+    """Тест: сетка плотности совпадает с np.histogram2d"""
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(0, 1, 10_000), rng.exponential(2, 10_000)
+    counts, x_edges, y_edges = density_grid(x, y, 32)
+    expected, _, _ = np.histogram2d(x, y, bins=[x_edges, y_edges])
+    assert counts.sum() == x.size
+    # Точки на внутренних границах могут попасть в соседнюю ячейку из-за округления
+    assert np.abs(counts - expected).sum() <= 4
+
+
+def test_stratified_sample_keeps_tails():
+    """Тест: выборка ограничена и сохраняет редкие значения"""
+    rng = np.random.default_rng(1)
+    x = np.concatenate([rng.normal(0, 1, 100_000), [50.0, 60.0]])
+    idx = stratified_sample(x, max_points=1000, strata=50)
+    assert idx.size <= 1000
+    assert np.all(np.diff(idx) > 0)
+    assert {x.size - 2, x.size - 1} <= set(idx.tolist())
+
+
+def test_bin_counts_match_numpy():
+    """Тест: счетчики корзин совпадают с np.histogram, по частям - тоже"""
+    rng = np.random.default_rng(3)
+    values = rng.gamma(2, 3, 20_000)
+    values[::100] = np.nan
+    edges = histogram_edges(np.nanmin(values), np.nanmax(values), 25)
+    expected, _ = np.histogram(values[~np.isnan(values)], bins=edges)
+    assert np.abs(bin_counts(values, edges) - expected).sum() <= 2
+    chunks = np.array_split(values, 7)
+    by_chunks = sum(bin_counts(chunk, edges) for chunk in chunks)
+    assert np.array_equal(by_chunks, bin_counts(values, edges))
@@ -0,0 +1,65 @@
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from app.models import DataFile
+from app.utils import data_processor
+from app.utils.data_processor import compute_file_stats
+
+
+def _csv(df):
+    data = BytesIO()
+    df.to_csv(data, index=False)
+    data.seek(0)
+    return data
+
+
+@pytest.fixture
+def gappy_frame():
+    rng = np.random.default_rng(5)
+    df = pd.DataFrame(rng.normal(10, 4, (300, 3)), columns=["a", "b", "c"])
+    df.loc[::5, "a"] = np.nan
+    df.loc[::11, "b"] = np.nan
+    df["text"] = "t"
+    return df
+
+
+def _cleaned_child(client, df, name, **params):
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (_csv(df), name)},
+        content_type="multipart/form-data",
+    ).json["id"]
+    # force: файл с тем же содержимым мог быть очищен в другом тесте
+    report = client.post(
+        f"/api/v1/data/{file_id}/clean", query_string={**params, "force": 1}
+    ).json
+    return report["cleaning_report"]["cleaned_file_id"]
+
+
+def _assert_stats_match(actual, expected):
+    for key in ["mean", "median", "std", "min", "max"]:
+        assert set(actual[key]) == set(expected[key])
+        for column, value in expected[key].items():
+            assert actual[key][column] == pytest.approx(value, rel=1e-9)
+    for column, values in expected["correlation"].items():
+        for other, value in values.items():
+            assert actual["correlation"][column][other] == pytest.approx(value, rel=1e-9)
+
+
+@pytest.mark.parametrize("threshold", [2**40, 0], ids=["in_memory", "streaming"])
+@pytest.mark.parametrize("fill_missing", ["mean", "median", "zero"])
+def test_cleaned_stats_stored_by_cleaning(
+    client, db, gappy_frame, fill_missing, threshold, monkeypatch
+):
+    """Тест: статистика очищенного файла сохраняется при очистке, файл не читается"""
+    monkeypatch.setitem(client.application.config, "LARGE_FILE_THRESHOLD_BYTES", threshold)
+    monkeypatch.setitem(client.application.config, "STREAMING_CHUNK_ROWS", 70)
+    df = pd.concat([gappy_frame, gappy_frame.iloc[:20]])
+    child_id = _cleaned_child(client, df, "cleaned_stats.csv", fill_missing=fill_missing)
+    with monkeypatch.context() as m:
+        m.setattr(data_processor, "compute_file_stats", None)
+        stats = client.get(f"/api/v1/data/{child_id}/stats").json
+    with client.application.app_context():
+        expected = compute_file_stats(db.session.get(DataFile, child_id))
+    _assert_stats_match(stats, expected)
@@ -1,3 +1,7 @@
+import os
+from io import BytesIO
+import pandas as pd
+import pytest
 from app.models import DataFile
 
 
@@ -28,3 +32,26 @@ def test_clean_data(client, sample_csv, db):
             f"/api/v1/data/{file_id}/clean",
         )
         assert clean_resp.json == second_clean_resp.json
+
+
+@pytest.mark.parametrize("threshold", [2**40, 0])
+def test_clean_already_clean_file(client, db, monkeypatch, threshold):
+    """Тест: очистка без изменений не создает файл, отчет ссылается на исходный"""
+    monkeypatch.setitem(client.application.config, "LARGE_FILE_THRESHOLD_BYTES", threshold)
+    df = pd.DataFrame({"id": [1, 2, 3], "value": [1.5, 2.5, 3.5]})
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (BytesIO(df.to_csv(index=False).encode()), f"clean_{threshold}.csv")},
+        content_type="multipart/form-data",
+    ).json["id"]
+    with client.application.app_context():
+        files_before = db.session.query(DataFile).count()
+
+    report = client.post(f"/api/v1/data/{file_id}/clean", query_string={"force": 1}).json
+    assert report["duplicates_removed"] == report["missing_values_filled"] == 0
+    assert report["cleaning_report"]["file_changed"] is False
+    assert report["cleaning_report"]["cleaned_file_id"] == file_id
+    with client.application.app_context():
+        assert db.session.query(DataFile).count() == files_before
+    folder = client.application.config["UPLOAD_FOLDER"]
+    assert not [f for f in os.listdir(folder) if f.startswith(".cleaned-")]
@@ -0,0 +1,93 @@
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from app.models import ColumnStats
+from app.utils.loader import dataset_cache
+
+
+@pytest.fixture
+def wide_csv():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame(rng.normal(0, 1, (200, 4)), columns=["a", "b", "c", "d"])
+    df.loc[::7, "b"] = np.nan
+    df["label"] = "x"
+    data = BytesIO()
+    df.to_csv(data, index=False)
+    data.seek(0)
+    return data
+
+
+def _upload(client, data, name):
+    response = client.post(
+        "/api/v1/upload",
+        data={"file": (data, name)},
+        content_type="multipart/form-data",
+    )
+    return response.json["id"]
+
+
+def test_column_subset_matches_full_stats(client, wide_csv):
+    """Тест: статистика по подмножеству колонок совпадает с полной"""
+    wide_csv.seek(0)
+    full_id = _upload(client, BytesIO(wide_csv.read()), "full.csv")
+    wide_csv.seek(0)
+    subset_id = _upload(client, wide_csv, "subset.csv")
+
+    full = client.get(f"/api/v1/data/{full_id}/stats").json
+    subset = client.get(
+        f"/api/v1/data/{subset_id}/stats", query_string={"columns": "b,c"}
+    ).json
+    assert set(subset["mean"]) == {"b", "c"}
+    for key in ["mean", "median", "std", "min", "max"]:
+        for column in ["b", "c"]:
+            assert subset[key][column] == pytest.approx(full[key][column], rel=1e-9)
+    assert subset["correlation"]["b"]["c"] == pytest.approx(
+        full["correlation"]["b"]["c"], rel=1e-9
+    )
+
+
+def test_column_stats_are_reused(client, db, wide_csv):
+    """Тест: повторный запрос и новые колонки не перечитывают посчитанные"""
+    file_id = _upload(client, wide_csv, "reuse.csv")
+    client.get(f"/api/v1/data/{file_id}/stats", query_string={"columns": "a,b"})
+
+    dataset_cache.clear()
+    client.get(f"/api/v1/data/{file_id}/stats", query_string={"columns": "b,a"})
+    assert dataset_cache.stats()["misses"] == 0
+
+    response = client.get(
+        f"/api/v1/data/{file_id}/stats", query_string={"columns": "a,b,label"}
+    )
+    assert response.status_code == 200
+    assert set(response.json["mean"]) == {"a", "b"}
+    with client.application.app_context():
+        rows = db.session.scalars(
+            db.select(ColumnStats).where(ColumnStats.data_file_id == file_id)
+        ).all()
+        assert {row.column_name for row in rows} == {"a", "b", "label"}
+        assert all(row.count == 200 for row in rows if row.column_name == "a")
+
+
+def test_subset_from_basic_stats(client, sample_csv):
+    """Тест: подмножество берется из уже посчитанной полной статистики"""
+    file_id = _upload(client, sample_csv, "basic_subset.csv")
+    full = client.get(f"/api/v1/data/{file_id}/stats").json
+
+    dataset_cache.clear()
+    subset = client.get(
+        f"/api/v1/data/{file_id}/stats", query_string={"columns": "value"}
+    ).json
+    assert dataset_cache.stats()["misses"] == 0
+    assert subset["mean"] == {"value": full["mean"]["value"]}
+    assert subset["correlation"] == {"value": {"value": full["correlation"]["value"]["value"]}}
+
+
+def test_unknown_column(client, sample_csv):
+    """Тест: несуществующая колонка"""
+    file_id = _upload(client, sample_csv, "unknown_column.csv")
+    response = client.get(
+        f"/api/v1/data/{file_id}/stats", query_string={"columns": "value,missing"}
+    )
+    assert response.status_code == 400
+    assert "missing" in response.json["error"]
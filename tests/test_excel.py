@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from app.models import DataFile
+from app.utils.excel import read_xlsx, write_xlsx
+from app.utils.loader import get_filepath, has_fresh_sidecar, sidecar_executor
+from app.utils.schema import infer_schema
+
+
+def _frame(rows=200):
+    return pd.DataFrame(
+        {
+            "id": range(rows),
+            "value": [np.nan if i % 7 == 0 else i / 4 for i in range(rows)],
+            "label": ["a", "b", np.nan, "d"] * (rows // 4),
+            "when": pd.date_range("2024-01-01", periods=rows, freq="h"),
+        }
+    )
+
+
+def test_write_and_read_match_pandas(tmp_path):
+    """Тест: потоковая запись и чтение дают то же, что pandas"""
+    df = _frame()
+    path = str(tmp_path / "table.xlsx")
+    write_xlsx(df, path)
+    expected = pd.read_excel(path)
+    pd.testing.assert_frame_equal(read_xlsx(path), expected)
+    pd.testing.assert_frame_equal(expected, df)
+
+    subset = read_xlsx(path, usecols=["value", "label"], dtype={"label": "category"})
+    assert list(subset.columns) == ["value", "label"]
+    assert str(subset["label"].dtype) == "category"
+    assert len(read_xlsx(path, nrows=10)) == 10
+
+
+def test_headers_and_schema(tmp_path):
+    """Тест: пустые и повторяющиеся заголовки, схема за одно чтение книги"""
+    path = str(tmp_path / "table.xlsx")
+    df = pd.DataFrame([[1, 2.5, "x"], [2, 3.5, "y"], [3, 4.5, "x"]])
+    df.columns = ["a", "a", ""]
+    write_xlsx(df, path)
+    assert list(read_xlsx(path).columns) == list(pd.read_excel(path).columns)
+
+    schema = infer_schema(path, "xlsx")
+    assert schema["header"] == 0
+    assert schema["columns"] == ["a", "a.1", "Unnamed: 2"]
+    assert schema["dtypes"] == {"a": "int64", "a.1": "float64", "Unnamed: 2": "string[pyarrow]"}
+
+
+def test_xlsx_converted_once_and_cleaned(client, db, tmp_path):
+    """Тест: XLSX переводится в Parquet при загрузке, очищенная копия - XLSX"""
+    path = tmp_path / "upload.xlsx"
+    df = _frame()
+    write_xlsx(pd.concat([df, df.head(10)]), str(path))
+    with open(path, "rb") as f:
+        file_id = client.post(
+            "/api/v1/upload",
+            data={"file": (f, "upload.xlsx")},
+            content_type="multipart/form-data",
+        ).json["id"]
+    sidecar_executor.submit(lambda: None).result()
+    with client.application.app_context():
+        assert has_fresh_sidecar(get_filepath(db.session.get(DataFile, file_id)))
+
+    report = client.post(f"/api/v1/data/{file_id}/clean", json={}).json
+    cleaned_id = report["cleaning_report"]["cleaned_file_id"]
+    assert report["duplicates_removed"] == 10
+    with client.application.app_context():
+        cleaned = db.session.get(DataFile, cleaned_id)
+        assert cleaned.file_type == "xlsx"
+        assert len(pd.read_excel(get_filepath(cleaned))) == len(df)
@@ -0,0 +1,47 @@
+def test_stats_job_status(client, sample_csv):
+    """Тест статуса фоновой задачи расчета статистики"""
+    upload_resp = client.post(
+        "/api/v1/upload",
+        data={"file": (sample_csv, "jobs_stats_test.csv")},
+        content_type="multipart/form-data",
+    )
+    file_id = upload_resp.json["id"]
+
+    stats_resp = client.get(f"/api/v1/data/{file_id}/stats")
+    assert stats_resp.status_code == 200
+    job_id = stats_resp.headers["X-Job-Id"]
+
+    job_resp = client.get(f"/api/v1/jobs/{job_id}")
+    assert job_resp.status_code == 200
+    assert job_resp.json["status"] == "SUCCESS"
+    assert job_resp.json["result"] == stats_resp.json
+
+
+def test_plot_job_result_url(client, sample_csv):
+    """Тест: результат задачи построения графика содержит ссылку на изображение"""
+    upload_resp = client.post(
+        "/api/v1/upload",
+        data={"file": (sample_csv, "jobs_plot_test.csv")},
+        content_type="multipart/form-data",
+    )
+    file_id = upload_resp.json["id"]
+
+    plot_resp = client.get(
+        f"/api/v1/data/{file_id}/plot",
+        query_string={"column": "id", "plot_type": "histogram"},
+    )
+    assert plot_resp.status_code == 200
+    job_resp = client.get(f"/api/v1/jobs/{plot_resp.headers['X-Job-Id']}")
+    assert job_resp.json["status"] == "SUCCESS"
+
+    image_resp = client.get(job_resp.json["result"]["url"])
+    assert image_resp.status_code == 200
+    assert image_resp.content_type == "image/png"
+    assert image_resp.data == plot_resp.data
+
+
+def test_unknown_job_is_pending(client):
+    """Тест статуса неизвестной задачи"""
+    response = client.get("/api/v1/jobs/unknown-job")
+    assert response.status_code == 200
+    assert response.json["status"] == "PENDING"
@@ -0,0 +1,122 @@
+from io import BytesIO
+import pandas as pd
+import pytest
+from app.models import DataFile
+from app.utils.loader import (
+    DatasetCache,
+    dataset_cache,
+    get_filepath,
+    has_fresh_sidecar,
+    load_dataset,
+    sidecar_executor,
+)
+
+
+def _frame(rows):
+    return pd.DataFrame({"a": range(rows), "b": [float(i) for i in range(rows)]})
+
+
+def test_cache_hit_miss_counters():
+    """Тест счетчиков попаданий и промахов"""
+    cache = DatasetCache(max_bytes=10**6)
+    assert cache.get((1, 0, 0)) is None
+    df = _frame(10)
+    cache.put((1, 0, 0), df)
+    assert cache.get((1, 0, 0)) is df
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_cache_evicts_least_recently_used():
+    """Тест вытеснения по бюджету памяти"""
+    df = _frame(100)
+    size = int(df.memory_usage(deep=True).sum())
+    cache = DatasetCache(max_bytes=size * 2)
+    cache.put((1, 0, 0), df)
+    cache.put((2, 0, 0), _frame(100))
+    cache.get((1, 0, 0))
+    cache.put((3, 0, 0), _frame(100))
+    assert cache.get((2, 0, 0)) is None
+    assert cache.get((1, 0, 0)) is not None
+    assert cache.current_bytes <= cache.max_bytes
+
+
+def test_cache_skips_frames_over_budget():
+    """Тест: фрейм больше бюджета не кэшируется"""
+    cache = DatasetCache(max_bytes=10)
+    cache.put((1, 0, 0), _frame(100))
+    assert cache.stats()["entries"] == 0
+
+
+def test_dataset_parsed_once(client, sample_csv):
+    """Тест: статистика и график используют один разобранный фрейм"""
+    upload_resp = client.post(
+        "/api/v1/upload",
+        data={"file": (sample_csv, "loader_test.csv")},
+        content_type="multipart/form-data",
+    )
+    file_id = upload_resp.json["id"]
+    dataset_cache.clear()
+
+    client.get(f"/api/v1/data/{file_id}/stats")
+    client.get(
+        f"/api/v1/data/{file_id}/plot",
+        query_string={"column": "value", "plot_type": "histogram"},
+    )
+    stats = dataset_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_upload_creates_parquet_sidecar(client, sample_csv, db):
+    """Тест: загрузка создает Parquet-копию, чтение колонок идет из нее"""
+    with client.application.app_context():
+        upload_resp = client.post(
+            "/api/v1/upload",
+            data={"file": (sample_csv, "sidecar_test.csv")},
+            content_type="multipart/form-data",
+        )
+        data_file = db.session.get(DataFile, upload_resp.json["id"])
+        # Дожидаемся фоновой конвертации (исполнитель однопоточный)
+        sidecar_executor.submit(lambda: None).result()
+
+        filepath = get_filepath(data_file)
+        assert has_fresh_sidecar(filepath)
+        df = load_dataset(data_file, columns=["value"])
+        assert list(df.columns) == ["value"]
+        assert df["value"].sum() == pytest.approx(46.5)
+
+
+def test_compact_dtypes_and_column_subsets(client, db):
+    """Тест: компактные типы колонок; подмножество колонок берется из кэша"""
+    df = pd.DataFrame(
+        {
+            "small": [i % 100 for i in range(1000)],
+            "value": [i / 3 for i in range(1000)],
+            "label": ["a", "b"] * 500,
+            "name": [f"row {i}" for i in range(1000)],
+        }
+    )
+    data = BytesIO(df.to_csv(index=False).encode())
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "compact_test.csv")},
+        content_type="multipart/form-data",
+    ).json["id"]
+    with client.application.app_context():
+        data_file = db.session.get(DataFile, file_id)
+        sidecar_executor.submit(lambda: None).result()
+        dataset_cache.clear()
+        loaded = load_dataset(data_file)
+        assert str(loaded["small"].dtype) == "int8"
+        assert str(loaded["label"].dtype) == "category"
+        assert str(loaded["name"].dtype).startswith("string")
+        assert loaded.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+
+        dataset_cache.clear()
+        client.get(f"/api/v1/data/{file_id}/stats")
+        subset = load_dataset(data_file, columns=["value"])
+        assert list(subset.columns) == ["value"]
+        assert dataset_cache.stats()["misses"] == 1
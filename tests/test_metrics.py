@@ -0,0 +1,80 @@
+import re
+import time
+from io import BytesIO
+import pandas as pd
+import pytest
+from app.utils import metrics
+
+
+def _upload(client, name, seed):
+    df = pd.DataFrame({"a": range(seed, seed + 100), "b": [i % 7 for i in range(100)]})
+    response = client.post(
+        "/api/v1/upload",
+        data={"file": (BytesIO(df.to_csv(index=False).encode()), name)},
+        content_type="multipart/form-data",
+    )
+    return response.json["id"]
+
+
+def _value(text, series):
+    """Значение серии метрики или 0, если ее еще нет"""
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_metrics_endpoint(client):
+    """Тест: /metrics отдает метрики в текстовом формате Prometheus"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    text = response.get_data(as_text=True)
+    assert "# TYPE pipeline_stage_seconds histogram" in text
+    assert "# TYPE pipeline_cache_lookups_total counter" in text
+
+
+def test_stats_stages_and_cache(client):
+    """Тест: этапы расчета статистики, прочитанные строки и попадания в кэш"""
+    labels = 'operation="stats",file_type="csv"'
+    before = client.get("/metrics").get_data(as_text=True)
+    file_id = _upload(client, "metrics.csv", 0)
+    assert client.get(f"/api/v1/data/{file_id}/stats").status_code == 200
+    assert client.get(f"/api/v1/data/{file_id}/stats").status_code == 200
+    text = client.get("/metrics").get_data(as_text=True)
+
+    def delta(series):
+        return _value(text, series) - _value(before, series)
+
+    # Схема файла определяется при загрузке
+    upload = 'operation="upload",file_type="csv"'
+    assert delta(f'pipeline_stage_seconds_count{{{upload},stage="sniff"}}') == 1
+    for stage in ("read", "compute", "db_write"):
+        assert delta(f'pipeline_stage_seconds_count{{{labels},stage="{stage}"}}') == 1
+    assert delta(f'pipeline_cache_lookups_total{{{labels},cache="result",result="miss"}}') == 1
+    assert delta(f'pipeline_cache_lookups_total{{{labels},cache="result",result="hit"}}') == 1
+    assert delta(f"pipeline_rows_processed_sum{{{labels}}}") >= 100
+    assert delta(f"pipeline_bytes_read_count{{{labels}}}") == 1
+    assert 'http_request_peak_rss_bytes_count{endpoint="api.get_stats",file_type="csv"}' in text
+    assert delta(
+        'http_request_duration_seconds_count{endpoint="api.get_stats",method="GET",status="200"}'
+    ) == 2
+
+
+def test_nested_stages_record_own_time():
+    """Тест: вложенный этап не входит в длительность внешнего"""
+    with metrics.operation("nested_test", "csv"):
+        with metrics.stage("compute"):
+            with metrics.stage("read"):
+                time.sleep(0.05)
+    text = metrics.render()
+    labels = 'operation="nested_test",file_type="csv"'
+    assert _value(text, f'pipeline_stage_seconds_sum{{{labels},stage="read"}}') >= 0.05
+    assert _value(text, f'pipeline_stage_seconds_sum{{{labels},stage="compute"}}') < 0.01
+
+
+def test_failed_operation_counted():
+    """Тест: ошибка операции учитывается в pipeline_errors_total"""
+    with pytest.raises(ValueError):
+        with metrics.operation("error_test", "xlsx"):
+            raise ValueError("boom")
+    text = metrics.render()
+    assert _value(text, 'pipeline_errors_total{operation="error_test",file_type="xlsx"}') == 1
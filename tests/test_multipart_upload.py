@@ -0,0 +1,200 @@
+import errno
+import hashlib
+import os
+from datetime import timedelta
+from io import BytesIO
+import pandas as pd
+from sqlalchemy import func, select
+from app.models import DataFile, UploadPart, UploadSession
+from app.utils import multipart_upload
+
+PART_SIZE = 1000
+
+
+def _content():
+    rows = "".join(f"{i},{i * 0.5},{i % 7}\n" for i in range(1000))
+    return ("id,value,group\n" + rows).encode()
+
+
+def _parts(content):
+    return [content[i : i + PART_SIZE] for i in range(0, len(content), PART_SIZE)]
+
+
+def _start(client, content, filename="multipart.csv"):
+    resp = client.post(
+        "/api/v1/uploads",
+        json={"filename": filename, "size": len(content), "part_size": PART_SIZE},
+    )
+    assert resp.status_code == 201
+    return resp.json["upload_id"]
+
+
+def test_multipart_upload_out_of_order(client, db, app):
+    """Тест: части, присланные в обратном порядке, собираются в исходный файл"""
+    content = _content()
+    upload_id = _start(client, content)
+    parts = _parts(content)
+    for number in range(len(parts), 0, -1):
+        resp = client.put(
+            f"/api/v1/uploads/{upload_id}/parts/{number}",
+            data=parts[number - 1],
+            headers={"X-Content-SHA256": hashlib.sha256(parts[number - 1]).hexdigest()},
+        )
+        assert resp.status_code == 200
+
+    resp = client.post(f"/api/v1/uploads/{upload_id}/complete")
+    assert resp.status_code == 201
+    assert resp.json["filename"] == "multipart.csv"
+    with app.app_context():
+        data_file = db.session.get(DataFile, resp.json["id"])
+        path = os.path.join(app.config["UPLOAD_FOLDER"], data_file.filename)
+        with open(path, "rb") as f:
+            assert f.read() == content
+        assert db.session.query(UploadPart).count() == 0
+    assert client.get(f"/api/v1/uploads/{upload_id}").status_code == 404
+
+    stats = client.get(f"/api/v1/data/{resp.json['id']}/stats").json
+    assert stats["mean"]["id"] == pd.Series(range(1000)).mean()
+
+    # То же содержимое обычной загрузкой - тот же файл
+    same = client.post(
+        "/api/v1/upload",
+        data={"file": (BytesIO(content), "same.csv")},
+        content_type="multipart/form-data",
+    )
+    assert same.status_code == 200
+    assert same.json["id"] == resp.json["id"]
+
+
+def test_multipart_upload_resume(client):
+    """Тест: прерванная загрузка продолжается отправкой недостающих частей"""
+    content = _content().replace(b"\n", b";\n")
+    upload_id = _start(client, content, "resumed.csv")
+    parts = _parts(content)
+    for number in [1, 3]:
+        client.put(f"/api/v1/uploads/{upload_id}/parts/{number}", data=parts[number - 1])
+    # Обрыв посреди части: часть не засчитывается
+    broken = client.put(f"/api/v1/uploads/{upload_id}/parts/2", data=parts[1][:100])
+    assert broken.status_code == 400
+    corrupted = client.put(
+        f"/api/v1/uploads/{upload_id}/parts/4",
+        data=parts[3],
+        headers={"X-Content-SHA256": "0" * 64},
+    )
+    assert corrupted.status_code == 400
+
+    status = client.get(f"/api/v1/uploads/{upload_id}").json
+    assert [p["part_number"] for p in status["parts"]] == [1, 3]
+    missing = status["missing_parts"]
+    assert missing == [2] + list(range(4, len(parts) + 1))
+    incomplete = client.post(f"/api/v1/uploads/{upload_id}/complete")
+    assert incomplete.status_code == 400
+
+    for number in missing:
+        resp = client.put(
+            f"/api/v1/uploads/{upload_id}/parts/{number}", data=parts[number - 1]
+        )
+        assert resp.status_code == 200
+    # Повторная отправка части заменяет ее
+    client.put(f"/api/v1/uploads/{upload_id}/parts/1", data=parts[0])
+
+    checksums = [
+        {"part_number": i + 1, "checksum": hashlib.sha256(part).hexdigest()}
+        for i, part in enumerate(parts)
+    ]
+    resp = client.post(
+        f"/api/v1/uploads/{upload_id}/complete", json={"parts": checksums}
+    )
+    assert resp.status_code == 201
+
+
+def test_multipart_upload_validation(client):
+    """Тест: проверка параметров возобновляемой загрузки"""
+    invalid_type = client.post("/api/v1/uploads", json={"filename": "a.txt", "size": 1})
+    assert invalid_type.status_code == 415
+    no_size = client.post("/api/v1/uploads", json={"filename": "a.csv"})
+    assert no_size.status_code == 400
+    upload_id = _start(client, b"x" * 10)
+    assert client.put(f"/api/v1/uploads/{upload_id}/parts/2", data=b"x").status_code == 400
+    assert client.put("/api/v1/uploads/missing/parts/1", data=b"x").status_code == 404
+
+
+def test_resent_part_failing_verification(client, db, app):
+    """Тест: часть, перезаписанная неверными байтами, снова считается недостающей"""
+    content = _content().replace(b",", b";")
+    upload_id = _start(client, content, "resent.csv")
+    parts = _parts(content)
+    for number, part in enumerate(parts, 1):
+        client.put(f"/api/v1/uploads/{upload_id}/parts/{number}", data=part)
+    # Повтор части с ошибкой уже перезаписал прежние байты
+    corrupted = client.put(
+        f"/api/v1/uploads/{upload_id}/parts/2",
+        data=b"x" * PART_SIZE,
+        headers={"X-Content-SHA256": hashlib.sha256(parts[1]).hexdigest()},
+    )
+    assert corrupted.status_code == 400
+    assert client.get(f"/api/v1/uploads/{upload_id}").json["missing_parts"] == [2]
+    assert client.post(f"/api/v1/uploads/{upload_id}/complete").status_code == 400
+
+    client.put(f"/api/v1/uploads/{upload_id}/parts/2", data=parts[1])
+    resp = client.post(f"/api/v1/uploads/{upload_id}/complete")
+    assert resp.status_code == 201
+    with app.app_context():
+        data_file = db.session.get(DataFile, resp.json["id"])
+        path = os.path.join(app.config["UPLOAD_FOLDER"], data_file.filename)
+        with open(path, "rb") as f:
+            assert f.read() == content
+
+
+def test_upload_size_limits(client, app, monkeypatch):
+    """Тест: размер файла ограничен, нехватка места - 507 без остатков на диске"""
+    limit = app.config["MULTIPART_MAX_FILE_BYTES"]
+    too_large = client.post(
+        "/api/v1/uploads", json={"filename": "huge.csv", "size": limit + 1}
+    )
+    assert too_large.status_code == 400
+
+    def no_space(fd, offset, size):
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    monkeypatch.setattr(multipart_upload.os, "posix_fallocate", no_space)
+    before = set(os.listdir(app.config["UPLOAD_FOLDER"]))
+    full = client.post("/api/v1/uploads", json={"filename": "full.csv", "size": 1000})
+    assert full.status_code == 507
+    assert set(os.listdir(app.config["UPLOAD_FOLDER"])) == before
+
+
+def test_abandoned_upload_expires(client, db, app):
+    """Тест: загрузка без новых частей дольше срока удаляется вместе с файлом"""
+    content = _content()
+    stale_id = _start(client, content, "stale.csv")
+    active_id = _start(client, content, "active.csv")
+    with app.app_context():
+        ttl = timedelta(seconds=app.config["MULTIPART_SESSION_TTL_SECONDS"] + 60)
+        for session in db.session.scalars(
+            select(UploadSession).where(UploadSession.id.in_([stale_id, active_id]))
+        ):
+            session.created_at -= ttl
+        db.session.commit()
+    # Недавно полученная часть продлевает срок загрузки
+    client.put(f"/api/v1/uploads/{active_id}/parts/1", data=_parts(content)[0])
+    with app.app_context():
+        path = multipart_upload.session_path(db.session.get(UploadSession, stale_id))
+        assert os.path.exists(path)
+        multipart_upload.expire_sessions()
+        assert not os.path.exists(path)
+    assert client.get(f"/api/v1/uploads/{stale_id}").status_code == 404
+    assert client.get(f"/api/v1/uploads/{active_id}").status_code == 200
+
+
+def test_reserved_space_limit(client, db, app, monkeypatch):
+    """Тест: открытые загрузки вместе не резервируют больше предела"""
+    with app.app_context():
+        reserved = db.session.scalar(select(func.sum(UploadSession.total_size))) or 0
+    monkeypatch.setitem(app.config, "MULTIPART_MAX_RESERVED_BYTES", reserved + 2500)
+    _start(client, b"x" * 1000)
+    _start(client, b"x" * 1000)
+    before = set(os.listdir(app.config["UPLOAD_FOLDER"]))
+    full = client.post("/api/v1/uploads", json={"filename": "full.csv", "size": 1000})
+    assert full.status_code == 507
+    assert set(os.listdir(app.config["UPLOAD_FOLDER"])) == before
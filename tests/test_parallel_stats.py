@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.parallel_stats import compute_parallel_stats, csv_partitions
+from app.utils.schema import infer_schema
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "a": rng.normal(0, 1, 3000),
+            "b": rng.integers(0, 100, 3000),
+            "label": rng.choice(["x", "y", "z"], 3000),
+        }
+    )
+    df.loc[rng.random(3000) < 0.1, "a"] = np.nan
+    path = tmp_path / "partitioned.csv"
+    df.to_csv(path, index=False)
+    return str(path), df
+
+
+def test_partitions_aligned_to_lines(csv_path):
+    """Тест: границы частей совпадают с началом строк и покрывают весь файл"""
+    path, _ = csv_path
+    with open(path, "rb") as f:
+        content = f.read()
+    data_start = content.index(b"\n") + 1
+    partitions = csv_partitions(path, 1000, data_start)
+    assert len(partitions) > 1
+    assert partitions[0][0] == data_start
+    assert partitions[-1][1] == len(content)
+    for (_, end), (start, _) in zip(partitions, partitions[1:]):
+        assert end == start
+        assert content[end - 1 : end] == b"\n"
+
+
+def test_parallel_matches_pandas(csv_path):
+    """Тест: результат пула процессов совпадает с расчетом pandas"""
+    path, df = csv_path
+    stats = compute_parallel_stats(path, workers=2, partition_bytes=8 * 1024)
+    assert set(stats["mean"]) == {"a", "b"}
+    for key, expected in [
+        ("mean", df.mean(numeric_only=True)),
+        ("std", df.std(numeric_only=True)),
+        ("min", df.min(numeric_only=True)),
+        ("max", df.max(numeric_only=True)),
+    ]:
+        for column, value in expected.items():
+            assert stats[key][column] == pytest.approx(value, rel=1e-9)
+    assert stats["correlation"]["a"]["b"] == pytest.approx(
+        df["a"].corr(df["b"]), rel=1e-9
+    )
+    assert stats["median"]["b"] == pytest.approx(df["b"].median(), abs=2)
+
+
+def test_parallel_text_after_sample(tmp_path):
+    """Тест: текст во float-колонке после выборки исключает колонку, а не ломает расчет"""
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({"a": rng.normal(0, 1, 3000), "b": rng.normal(0, 1, 3000)})
+    df["a"] = df["a"].astype(object)
+    df.loc[2500, "a"] = "oops"
+    path = tmp_path / "text_after_sample.csv"
+    df.to_csv(path, index=False)
+    schema = infer_schema(str(path), "csv", sample_bytes=1024, offsets=0)
+    assert schema["dtypes"]["a"] == "float64"
+    stats = compute_parallel_stats(str(path), workers=2, partition_bytes=8 * 1024, schema=schema)
+    assert set(stats["mean"]) == {"b"}
+    assert stats["mean"]["b"] == pytest.approx(df["b"].mean(), rel=1e-9)
@@ -1,5 +1,12 @@
-from sqlalchemy import select
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import event, select
 from app.models import DataPlot
+from app.utils import data_processor
+from app.utils.loader import dataset_cache, sidecar_executor
+from app.utils.plot_store import find_plot
 
 
 def test_generate_plot(client, sample_csv, db):
@@ -31,3 +38,264 @@ def test_generate_plot(client, sample_csv, db):
             query_string={"column": "value", "type": "histogram"},
         )
         assert plot_resp.json == second_resp.json
+
+
+def test_plot_served_from_store(client, sample_csv, db):
+    """Тест: график отдается из хранилища, If-None-Match дает 304 без обращения к БД"""
+    upload_resp = client.post(
+        "/api/v1/upload",
+        data={"file": (sample_csv, "plot_store_test.csv")},
+        content_type="multipart/form-data",
+    )
+    file_id = upload_resp.json["id"]
+    query = {"column": "value", "plot_type": "scatter", "x": "id"}
+
+    first_resp = client.get(f"/api/v1/data/{file_id}/plot", query_string=query)
+    assert first_resp.status_code == 200
+    etag = first_resp.headers["ETag"].strip('"')
+    with client.application.app_context():
+        plot = db.session.scalar(select(DataPlot).where(DataPlot.storage_key == etag))
+        assert plot.plot_data is None
+        assert find_plot(etag) is not None
+        plot_id = plot.id
+        engine = db.engine
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        cached_resp = client.get(
+            f"/api/v1/data/{file_id}/plot",
+            query_string=query,
+            headers={"If-None-Match": first_resp.headers["ETag"]},
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert cached_resp.status_code == 304
+    assert statements == []
+
+    image_resp = client.get(f"/api/v1/plots/{plot_id}")
+    assert image_resp.data == first_resp.data
+
+
+def test_scatter_cache_key_and_payload(client, db, monkeypatch):
+    """Тест: scatter с разными X кэшируется отдельно, plot_json ограничен"""
+    monkeypatch.setitem(client.application.config, "PLOT_JSON_MAX_POINTS", 50)
+    df = pd.DataFrame({"a": range(500), "b": range(500, 0, -1), "c": [0.5] * 500})
+    data = BytesIO()
+    df.to_csv(data, index=False)
+    data.seek(0)
+    upload_resp = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "scatter_key_test.csv")},
+        content_type="multipart/form-data",
+    )
+    file_id = upload_resp.json["id"]
+
+    for x in ["a", "b", None]:
+        query = {"column": "c", "plot_type": "scatter"}
+        if x is not None:
+            query["x"] = x
+        resp = client.get(f"/api/v1/data/{file_id}/plot", query_string=query)
+        assert resp.status_code == 200
+
+    with client.application.app_context():
+        plots = db.session.scalars(
+            select(DataPlot).where(DataPlot.data_file_id == file_id)
+        ).all()
+        assert sorted(plot.x_column for plot in plots) == ["a", "b"]
+        for plot in plots:
+            assert plot.columns_used == [plot.x_column, "c"]
+            assert len(plot.plot_json["x"]) == 50
+            assert plot.plot_json["total_points"] == 500
+
+
+def test_scatter_of_x_column_itself(client, db):
+    """Тест: scatter колонки по самой себе (X по умолчанию - первая колонка)"""
+    df = pd.DataFrame({"a": [1.0, 2.0, None, 4.0], "b": [1, 2, 3, 4]})
+    data = BytesIO()
+    df.to_csv(data, index=False)
+    data.seek(0)
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "scatter_self_test.csv")},
+        content_type="multipart/form-data",
+    ).json["id"]
+
+    resp = client.get(
+        f"/api/v1/data/{file_id}/plot",
+        query_string={"column": "a", "plot_type": "scatter", "format": "json"},
+    )
+    assert resp.status_code == 200
+    assert resp.json["x"] == resp.json["y"] == [1.0, 2.0, 4.0]
+    resp = client.get(
+        f"/api/v1/data/{file_id}/plot",
+        query_string={"column": "a", "x": "a", "plot_type": "scatter"},
+    )
+    assert resp.status_code == 200
+    assert resp.content_type == "image/png"
+
+
+def test_large_scatter_uses_density_grid(client, db, monkeypatch):
+    """Тест: большой scatter в режиме auto рисуется сеткой плотности"""
+    monkeypatch.setitem(client.application.config, "SCATTER_DENSITY_THRESHOLD_ROWS", 1000)
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({"a": rng.normal(0, 1, 5000), "b": rng.normal(0, 1, 5000)})
+    data = BytesIO()
+    df.to_csv(data, index=False)
+    data.seek(0)
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "density_test.csv")},
+        content_type="multipart/form-data",
+    ).json["id"]
+
+    for mode in ["auto", "sample"]:
+        resp = client.get(
+            f"/api/v1/data/{file_id}/plot",
+            query_string={"column": "b", "x": "a", "plot_type": "scatter", "mode": mode},
+        )
+        assert resp.status_code == 200
+        assert resp.content_type == "image/png"
+
+    with client.application.app_context():
+        plots = db.session.scalars(
+            select(DataPlot).where(DataPlot.data_file_id == file_id)
+        ).all()
+        assert len(plots) == 2
+        payloads = [plot.plot_json for plot in plots]
+        density = next(p for p in payloads if "counts" in p)
+        assert np.sum(density["counts"]) == 5000
+        assert sum(1 for p in payloads if "x" in p) == 1
+
+    resp = client.get(
+        f"/api/v1/data/{file_id}/plot",
+        query_string={"column": "b", "plot_type": "scatter", "mode": "hexbin"},
+    )
+    assert resp.status_code == 400
+
+
+def test_histogram_json_and_png_from_counts(client, db, monkeypatch):
+    """Тест: гистограмма считается потоково по сохраненным min/max, PNG рисуется из счетчиков"""
+    rng = np.random.default_rng(4)
+    df = pd.DataFrame({"v": rng.normal(0, 1, 3000)})
+    df.loc[::10, "v"] = np.nan
+    data = BytesIO()
+    df.to_csv(data, index=False)
+    data.seek(0)
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "histogram_engine_test.csv")},
+        content_type="multipart/form-data",
+    ).json["id"]
+    client.get(f"/api/v1/data/{file_id}/stats")
+
+    monkeypatch.setitem(client.application.config, "LARGE_FILE_THRESHOLD_BYTES", 0)
+    monkeypatch.setitem(client.application.config, "STREAMING_CHUNK_ROWS", 500)
+    query = {"column": "v", "plot_type": "histogram", "bins": 20}
+    resp = client.get(
+        f"/api/v1/data/{file_id}/plot", query_string={**query, "format": "json"}
+    )
+    assert resp.status_code == 200
+    edges, counts = resp.json["bins"], resp.json["counts"]
+    assert len(counts) == 20
+    assert sum(counts) == int(df["v"].notna().sum())
+    assert edges[0] == pytest.approx(df["v"].min())
+    assert edges[-1] == pytest.approx(df["v"].max())
+    with client.application.app_context():
+        plot = db.session.scalar(select(DataPlot).where(DataPlot.data_file_id == file_id))
+        assert plot.storage_key is None
+
+    monkeypatch.setattr(data_processor, "compute_histograms", None)
+    png_resp = client.get(f"/api/v1/data/{file_id}/plot", query_string=query)
+    assert png_resp.status_code == 200
+    assert png_resp.content_type == "image/png"
+
+    bad_resp = client.get(
+        f"/api/v1/data/{file_id}/plot", query_string={**query, "bins": 0}
+    )
+    assert bad_resp.status_code == 400
+
+
+def test_batch_plots_read_data_once(client, db):
+    """Тест: пакет графиков читает данные один раз и возвращает манифест"""
+    rng = np.random.default_rng(6)
+    df = pd.DataFrame(rng.normal(0, 1, (400, 3)), columns=["a", "b", "c"])
+    data = BytesIO()
+    df.to_csv(data, index=False)
+    data.seek(0)
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "batch_plots_test.csv")},
+        content_type="multipart/form-data",
+    ).json["id"]
+    specs = [
+        {"column": "a"},
+        {"column": "b", "bins": 30},
+        {"column": "c", "plot_type": "scatter", "x": "a"},
+        {"column": "a"},
+    ]
+
+    dataset_cache.clear()
+    resp = client.post(f"/api/v1/data/{file_id}/plots", json={"plots": specs})
+    assert resp.status_code == 200
+    assert dataset_cache.stats()["misses"] == 1
+    manifest = resp.json["plots"]
+    assert [item["column"] for item in manifest] == ["a", "b", "c", "a"]
+    assert manifest[0]["plot_id"] == manifest[3]["plot_id"]
+    for item in manifest:
+        image_resp = client.get(item["url"])
+        assert image_resp.status_code == 200
+        assert image_resp.content_type == "image/png"
+
+    job = client.get(f"/api/v1/jobs/{resp.headers['X-Job-Id']}").json
+    assert job["result"]["urls"] == [item["url"] for item in manifest]
+    with client.application.app_context():
+        plots = db.session.scalars(
+            select(DataPlot).where(DataPlot.data_file_id == file_id)
+        ).all()
+        assert len(plots) == 3
+
+    single_resp = client.get(
+        f"/api/v1/data/{file_id}/plot", query_string={"column": "b", "bins": 30}
+    )
+    assert single_resp.data == client.get(manifest[1]["url"]).data
+
+    bad_resp = client.post(
+        f"/api/v1/data/{file_id}/plots",
+        json={"plots": [{"column": "a"}, {"column": "b", "plot_type": "pie"}]},
+    )
+    assert bad_resp.status_code == 400
+    assert bad_resp.json["error"].startswith("plots[1]")
+    assert client.post(f"/api/v1/data/{file_id}/plots", json={}).status_code == 400
+
+
+def test_plot_unknown_column(client):
+    """Тест: неизвестная колонка - 400 с понятной ошибкой, файл не читается"""
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [3, 2, 1]})
+    data = BytesIO()
+    df.to_csv(data, index=False)
+    data.seek(0)
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "unknown_column_test.csv")},
+        content_type="multipart/form-data",
+    ).json["id"]
+    # Колонки читаются из Parquet-копии: ошибка pyarrow не должна дойти до клиента
+    sidecar_executor.submit(lambda: None).result()
+
+    for query in [
+        {"column": "missing"},
+        {"column": "missing", "format": "json"},
+        {"column": "a", "x": "missing", "plot_type": "scatter"},
+    ]:
+        resp = client.get(f"/api/v1/data/{file_id}/plot", query_string=query)
+        assert resp.status_code == 400
+        assert resp.json == {"error": "Column not found: missing"}
+
+    resp = client.post(
+        f"/api/v1/data/{file_id}/plots",
+        json={"plots": [{"column": "a"}, {"column": "missing"}]},
+    )
+    assert resp.status_code == 400
+    assert resp.json == {"error": "plots[1]: Column not found: missing"}
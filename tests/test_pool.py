@@ -0,0 +1,21 @@
+from sqlalchemy import text
+from config import TestConfig
+
+
+def test_pool_status(client):
+    """Тест: состояние пула соединений и статистика ожидания"""
+    client.get("/api/v1/data/999999/stats")
+    status = client.get("/api/v1/db/pool").json
+    assert status["size"] == TestConfig.DB_POOL_SIZE
+    assert status["max_overflow"] == TestConfig.DB_MAX_OVERFLOW
+    assert status["checkouts"] >= 1
+    assert status["timeouts"] == 0
+    assert 0 <= status["wait_seconds_max"] <= status["wait_seconds_total"]
+    assert status["checked_out"] + status["idle"] >= 1
+
+
+def test_statement_timeout(app, db):
+    """Тест: statement_timeout задается соединениям пула"""
+    with app.app_context():
+        timeout = db.session.scalar(text("SHOW statement_timeout"))
+    assert timeout == f"{TestConfig.DB_STATEMENT_TIMEOUT_MS // 1000}s"
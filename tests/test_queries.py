@@ -0,0 +1,118 @@
+from io import BytesIO
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+from app.models import DataAnalysis, DataPlot
+from app.utils.data_access import get_data_file
+from app.utils.data_processor import generate_plots, save_analysis
+from app.utils.loader import sidecar_executor
+from app.utils.query_count import count_queries
+
+
+@pytest.fixture(scope="module")
+def file_id(client):
+    df = pd.DataFrame(
+        {"a": range(200), "b": [i * 0.5 for i in range(200)], "t": ["x", "y"] * 100}
+    )
+    df.loc[7, "b"] = None
+    data = BytesIO(df.to_csv(index=False).encode())
+    response = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "queries_test.csv")},
+        content_type="multipart/form-data",
+    )
+    sidecar_executor.submit(lambda: None).result()
+    return response.json["id"]
+
+
+def _statements(call):
+    with count_queries() as statements:
+        response = call()
+    assert response.status_code < 300, response.json
+    assert response.headers["X-Query-Count"] == str(len(statements))
+    return len(statements)
+
+
+def test_upload_statements(client):
+    """Тест: загрузка - поиск и вставка; повторная загрузка - один поиск"""
+
+    def upload():
+        data = BytesIO(b"p,q\n1,2\n3,4\n")
+        return client.post(
+            "/api/v1/upload",
+            data={"file": (data, "small.csv")},
+            content_type="multipart/form-data",
+        )
+
+    assert _statements(upload) == 2
+    assert _statements(upload) == 1
+
+
+def test_stats_statements(client, file_id):
+    """Тест: файл с анализами читается одним запросом и в маршруте, и в задаче"""
+    url = f"/api/v1/data/{file_id}/stats"
+    # Файл с анализами, блокировка расчета и повторное чтение файла под ней,
+    # вставка анализа
+    assert _statements(lambda: client.get(url)) == 4
+    assert _statements(lambda: client.get(url)) == 1
+    assert _statements(lambda: client.get(url + "?columns=a")) == 1
+
+
+def test_clean_statements(client, file_id):
+    """Тест: очистка - одна транзакция без повторных чтений файла"""
+    url = f"/api/v1/data/{file_id}/clean"
+    # Файл с анализами, блокировка и повторное чтение файла, поиск
+    # очищенного файла, его вставка и вставка его статистики, вставка отчета
+    assert _statements(lambda: client.post(url)) == 7
+    assert _statements(lambda: client.post(url)) == 1
+
+
+def test_batch_plot_statements(client, file_id):
+    """Тест: число запросов пакета графиков не зависит от числа графиков"""
+    url = f"/api/v1/data/{file_id}/plots"
+    specs = {"plots": [{"column": "a", "bins": bins} for bins in range(5, 25)]}
+    # Файл, ключи графиков, блокировка, повторное чтение файла и ключей,
+    # вставка всех графиков; диапазоны колонок берутся из статистики
+    assert _statements(lambda: client.post(url, json=specs)) == 6
+    assert _statements(lambda: client.post(url, json=specs)) == 2
+
+    json_url = f"/api/v1/data/{file_id}/plot?column=a&bins=5&format=json"
+    assert _statements(lambda: client.get(json_url)) == 2
+
+
+def test_missing_file_statements(client):
+    """Тест: несуществующий файл - один запрос"""
+    with count_queries() as statements:
+        assert client.get("/api/v1/data/999999/stats").status_code == 404
+    assert len(statements) == 1
+
+
+def test_concurrent_writes_keep_one_row(app, client, db, file_id):
+    """Тест: запрос, опоздавший с записью кэша, получает уже сохраненный результат"""
+    spec = {"column": "b", "bins": 7}
+    with app.app_context():
+        # Файл загружен до того, как параллельный запрос сохранил результаты
+        data_file = get_data_file(file_id, plots=True)
+        stats = client.get(f"/api/v1/data/{file_id}/stats").json
+        client.post(f"/api/v1/data/{file_id}/plots", json={"plots": [spec]})
+
+        analysis = save_analysis(data_file, "basic_stats", stats_mean={"a": 0.0})
+        assert analysis.stats_mean == stats["mean"]
+        replaced = save_analysis(data_file, "basic_stats", replace=True, stats_mean={"a": 0.0})
+        assert replaced.stats_mean == {"a": 0.0}
+        (plot,) = generate_plots(file_id, [spec], render=False)
+        db.session.commit()
+
+        analyses = db.session.scalar(
+            select(func.count()).where(
+                DataAnalysis.data_file_id == file_id,
+                DataAnalysis.analysis_type == "basic_stats",
+            )
+        )
+        plots = db.session.scalars(
+            select(DataPlot.id).where(
+                DataPlot.data_file_id == file_id, DataPlot.column_name == "b"
+            )
+        ).all()
+    assert analyses == 1
+    assert plots == [plot.id]
@@ -0,0 +1,48 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from app.utils.rendering import (
+    draw_histogram,
+    draw_scatter,
+    figure_bytes,
+    new_figure,
+    render_histogram,
+    render_many,
+)
+
+OPTIONS = {"format": "png", "dpi": 50, "grid": 32, "sample_points": 100}
+
+
+def _render(kind: str) -> bytes:
+    fig, ax = new_figure()
+    if kind == "histogram":
+        draw_histogram(ax, {"bins": [0, 1, 2, 3], "counts": [4, 1, 2]})
+    else:
+        rng = np.random.default_rng(0)
+        values = pd.Series(rng.normal(0, 1, 1000))
+        draw_scatter(ax, values, values * 2, kind, OPTIONS)
+    ax.set_title(kind)
+    return figure_bytes(fig, OPTIONS)
+
+
+def test_pyplot_not_imported():
+    """Тест: отрисовка не использует глобальное состояние pyplot"""
+    _render("density")
+    assert "matplotlib.pyplot" not in sys.modules
+
+
+def test_concurrent_rendering_matches_sequential():
+    """Тест: графики из нескольких потоков совпадают с последовательной отрисовкой"""
+    kinds = ["histogram", "points", "density", "sample"] * 4
+    expected = {kind: _render(kind) for kind in set(kinds)}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        images = list(pool.map(_render, kinds))
+    assert images == [expected[kind] for kind in kinds]
+
+
+def test_render_many_in_processes():
+    """Тест: отрисовка в пуле процессов дает те же картинки"""
+    payloads = [{"bins": [0, 1, 2, 3], "counts": [i, 1, 2]} for i in range(3)]
+    calls = [(render_histogram, (p, "h", OPTIONS)) for p in payloads]
+    assert render_many(calls, workers=2) == render_many(calls, workers=1)
@@ -0,0 +1,63 @@
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from app.models import DataFile
+from app.utils.schema import infer_schema
+
+
+@pytest.mark.parametrize(
+    "text, header, columns",
+    [
+        ("id,value\n1,2.5\n2,3.5\n", 0, ["id", "value"]),
+        ("1,2.5\n2,3.5\n", None, ["Column 0", "Column 1"]),
+        # Пропуск в первой строке таблицы без заголовка - не имя колонки
+        (",15.0\n1.5,2\n2.5,3\n3.5,4\n", None, ["Column 0", "Column 1"]),
+        ("name,city\nAlice,Paris\nBob,Rome\n", 0, ["name", "city"]),
+        ("Alice,Paris\nBob,Rome\nAlice,Paris\n", None, ["Column 0", "Column 1"]),
+    ],
+)
+def test_header_detection(tmp_path, text, header, columns):
+    """Тест: заголовок определяется и для таблиц из одного текста"""
+    path = tmp_path / "table.csv"
+    path.write_text(text)
+    schema = infer_schema(str(path), "csv")
+    assert schema["header"] == header
+    assert schema["columns"] == columns
+
+
+def test_delimiter_encoding_and_offset_dtypes(tmp_path):
+    """Тест: разделитель, кодировка и типы колонок, пустых в начале файла"""
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(
+        {
+            "город": ["Москва"] * 20_000,
+            "late": [np.nan] * 10_000 + list(rng.normal(0, 1, 10_000)),
+            "n": rng.integers(0, 100, 20_000),
+        }
+    )
+    path = tmp_path / "wide.csv"
+    df.to_csv(path, sep=";", index=False, encoding="cp1251")
+    schema = infer_schema(str(path), "csv", sample_bytes=4096, offsets=8)
+    assert schema["delimiter"] == ";"
+    assert schema["encoding"] == "cp1251"
+    assert schema["columns"] == ["город", "late", "n"]
+    assert schema["dtypes"] == {"город": "category", "late": "float64", "n": "int64"}
+
+
+def test_upload_stores_schema(client, db):
+    """Тест: схема сохраняется при загрузке и используется при чтении"""
+    df = pd.DataFrame({"a": [1.5, 2.5, 3.5], "b": ["x", "y", "z"]})
+    data = BytesIO(df.to_csv(sep=";", index=False).encode("cp1251"))
+    resp = client.post(
+        "/api/v1/upload",
+        data={"file": (data, "semicolon.csv")},
+        content_type="multipart/form-data",
+    )
+    file_id = resp.json["id"]
+    with client.application.app_context():
+        schema = db.session.get(DataFile, file_id).file_schema
+        assert schema["delimiter"] == ";"
+        assert schema["header"] == 0
+    stats = client.get(f"/api/v1/data/{file_id}/stats").json
+    assert stats["mean"] == {"a": 2.5}
@@ -0,0 +1,87 @@
+import threading
+import time
+from io import BytesIO
+import pandas as pd
+import pytest
+from sqlalchemy import func, insert, select, text
+from app.models import DataAnalysis
+from app.utils import data_processor
+from app.utils.single_flight import lock_id
+
+
+def _upload(client, name, seed):
+    df = pd.DataFrame({"a": range(seed, seed + 100), "b": [i % 7 for i in range(100)]})
+    response = client.post(
+        "/api/v1/upload",
+        data={"file": (BytesIO(df.to_csv(index=False).encode()), name)},
+        content_type="multipart/form-data",
+    )
+    return response.json["id"]
+
+
+@pytest.fixture
+def computations(monkeypatch):
+    """Счетчик расчетов статистики; расчет замедлен, чтобы запросы пересеклись"""
+    calls = []
+    compute = data_processor.compute_file_stats
+
+    def counted(data_file):
+        calls.append(data_file.id)
+        time.sleep(0.3)
+        return compute(data_file)
+
+    monkeypatch.setattr(data_processor, "compute_file_stats", counted)
+    return calls
+
+
+def test_concurrent_requests_compute_once(app, client, computations):
+    """Тест: N одновременных запросов статистики - один расчет"""
+    file_id = _upload(client, "single_flight.csv", 0)
+    requests = 8
+    barrier = threading.Barrier(requests)
+    responses = [None] * requests
+
+    def request(i):
+        barrier.wait()
+        responses[i] = app.test_client().get(f"/api/v1/data/{file_id}/stats")
+
+    threads = [threading.Thread(target=request, args=(i,)) for i in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert computations == [file_id]
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json == responses[0].json for r in responses)
+    assert responses[0].json["mean"]["a"] == pytest.approx(49.5)
+
+
+def test_waits_for_other_worker(app, client, db, computations):
+    """Тест: пока другой процесс держит блокировку, запрос ждет его результат"""
+    file_id = _upload(client, "other_worker.csv", 1000)
+    result = {}
+    with app.app_context(), db.engine.connect() as other:
+        # Другой процесс начал расчет статистики этого файла
+        other.execute(select(func.pg_advisory_xact_lock(lock_id(("basic_stats", file_id)))))
+
+        def request():
+            with app.app_context():
+                # Ожидание расчета дольше statement_timeout не прерывается
+                db.session.execute(text("SET LOCAL statement_timeout = 100"))
+                result["stats"] = data_processor.analyze_data(file_id)
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        time.sleep(0.3)
+        assert thread.is_alive()
+        other.execute(
+            insert(DataAnalysis).values(
+                data_file_id=file_id, analysis_type="basic_stats", stats_mean={"a": 1.0}
+            )
+        )
+        other.commit()
+        thread.join(timeout=5)
+
+    assert result["stats"]["mean"] == {"a": 1.0}
+    assert computations == []
@@ -0,0 +1,68 @@
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from app.models import DataFile
+from app.utils.streaming_clean import DuplicateDetector, RowHashSet
+
+
+def test_row_hash_set():
+    """Тест компактного множества хэшей"""
+    hashes = RowHashSet()
+    for part in np.array_split(np.arange(1000, dtype=np.uint64) * 7, 10):
+        hashes.add(part)
+    assert hashes.nbytes == 1000 * 8
+    found = hashes.contains(np.array([0, 7, 6993, 6994, 10**6], dtype=np.uint64))
+    assert found.tolist() == [True, True, True, False, False]
+
+
+@pytest.mark.parametrize("max_bytes", [10**6, 16])
+def test_duplicate_detector(max_bytes):
+    """Тест поиска дубликатов в памяти и со сбросом на диск"""
+    values = np.random.default_rng(0).integers(0, 50, 300).astype(np.uint64)
+    detector = DuplicateDetector(max_bytes)
+    for offset in range(0, values.size, 64):
+        detector.check(values[offset : offset + 64], offset)
+    expected = np.flatnonzero(pd.Series(values).duplicated().to_numpy())
+    assert detector.spilled == (max_bytes == 16)
+    assert detector.finish().tolist() == expected.tolist()
+
+
+def test_streaming_clean_matches_in_memory(client, db, monkeypatch):
+    """Тест: потоковая очистка дает тот же отчет и файл, что и очистка в памяти"""
+    df = pd.DataFrame(
+        {
+            "id": [1, 2, 2, 3, 4, 4, 5],
+            "value": [10.0, None, None, 30.0, 40.0, 40.0, None],
+            "label": ["a", "b", "b", "c", "d", "d", "e"],
+        }
+    )
+    reports = []
+    with client.application.app_context():
+        for threshold in [2**40, 0]:
+            monkeypatch.setitem(
+                client.application.config, "LARGE_FILE_THRESHOLD_BYTES", threshold
+            )
+            monkeypatch.setitem(client.application.config, "STREAMING_CHUNK_ROWS", 3)
+            upload_resp = client.post(
+                "/api/v1/upload",
+                data={"file": (BytesIO(df.to_csv(index=False).encode()), "stream_clean.csv")},
+                content_type="multipart/form-data",
+            )
+            clean_resp = client.post(f"/api/v1/data/{upload_resp.json['id']}/clean")
+            assert clean_resp.status_code == 202
+            reports.append(clean_resp.json)
+
+        in_memory, streaming = reports
+        assert streaming["duplicates_removed"] == in_memory["duplicates_removed"] == 2
+        assert streaming["missing_values_filled"] == in_memory["missing_values_filled"]
+        for key in ["original_shape", "actions_performed", "missing_values_filled"]:
+            assert streaming["cleaning_report"][key] == in_memory["cleaning_report"][key]
+
+        cleaned = [
+            db.session.get(DataFile, report["cleaning_report"]["cleaned_file_id"])
+            for report in reports
+        ]
+        folder = client.application.config["UPLOAD_FOLDER"]
+        frames = [pd.read_csv(f"{folder}/{data_file.filename}") for data_file in cleaned]
+        pd.testing.assert_frame_equal(frames[0], frames[1])
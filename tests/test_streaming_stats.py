@@ -0,0 +1,121 @@
+from io import BytesIO
+import numpy as np
+import pandas as pd
+import pytest
+from app.utils.streaming_stats import KLLSketch, StreamingStats, compute_streaming_stats
+
+
+@pytest.fixture
+def numeric_frame():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(5, 3, (5000, 3)), columns=["a", "b", "c"])
+    df["b"] = df["a"] * 2 + rng.normal(0, 1, 5000)
+    df.loc[rng.random(5000) < 0.1, "a"] = np.nan
+    df.loc[rng.random(5000) < 0.2, "c"] = np.nan
+    df["text"] = "x"
+    return df
+
+
+def _chunks(df, size):
+    return [df.iloc[i : i + size] for i in range(0, len(df), size)]
+
+
+def test_streaming_matches_pandas(numeric_frame):
+    """Тест: потоковая статистика совпадает с расчетом pandas"""
+    stats = compute_streaming_stats(_chunks(numeric_frame, 777))
+    assert set(stats["mean"]) == {"a", "b", "c"}
+    for key, expected in [
+        ("mean", numeric_frame.mean(numeric_only=True)),
+        ("std", numeric_frame.std(numeric_only=True)),
+        ("min", numeric_frame.min(numeric_only=True)),
+        ("max", numeric_frame.max(numeric_only=True)),
+    ]:
+        for column, value in expected.items():
+            assert stats[key][column] == pytest.approx(value, rel=1e-9)
+    expected_corr = numeric_frame.corr(numeric_only=True)
+    for column in expected_corr:
+        for row, value in expected_corr[column].items():
+            assert stats["correlation"][column][row] == pytest.approx(value, rel=1e-9)
+    for column, value in numeric_frame.median(numeric_only=True).items():
+        assert stats["median"][column] == pytest.approx(value, abs=0.1)
+
+
+def test_merge_of_partitions(numeric_frame):
+    """Тест: слияние аккумуляторов частей равно расчету по всему файлу"""
+    columns = ["a", "b", "c"]
+    whole = StreamingStats(columns=columns, seed=1)
+    whole.update(numeric_frame)
+    left, right = StreamingStats(columns=columns, seed=1), StreamingStats(columns=columns, seed=1)
+    left.update(numeric_frame.iloc[:1234])
+    right.update(numeric_frame.iloc[1234:])
+    left.merge(right)
+    for key in ["mean", "std", "min", "max"]:
+        assert left.result()[key] == pytest.approx(whole.result()[key], rel=1e-9)
+
+
+def test_column_turning_non_numeric_is_excluded():
+    """Тест: колонка с текстом в одной из частей исключается, как при полном чтении"""
+    chunks = [
+        pd.DataFrame({"a": [1.0, 2.0], "b": [3.0, 4.0]}),
+        pd.DataFrame({"a": [5.0, 6.0], "b": ["x", "y"]}),
+    ]
+    stats = compute_streaming_stats(chunks)
+    assert list(stats["mean"]) == ["a"]
+    assert stats["mean"]["a"] == pytest.approx(3.5)
+
+
+def test_kll_median_error_bound():
+    """Тест точности медианы по скетчу"""
+    values = np.random.default_rng(2).uniform(0, 1, 200_000)
+    sketch = KLLSketch(k=500, seed=2)
+    for part in np.array_split(values, 20):
+        sketch.update(part)
+    assert sum(level.size for level in sketch.levels) < 2000
+    assert sketch.quantile(0.5) == pytest.approx(0.5, abs=0.01)
+
+
+def test_streaming_mode_over_threshold(client, sample_csv, monkeypatch):
+    """Тест: файл больше порога анализируется потоково"""
+    monkeypatch.setitem(client.application.config, "LARGE_FILE_THRESHOLD_BYTES", 0)
+    monkeypatch.setitem(client.application.config, "STREAMING_CHUNK_ROWS", 2)
+    upload_resp = client.post(
+        "/api/v1/upload",
+        data={"file": (sample_csv, "streaming_test.csv")},
+        content_type="multipart/form-data",
+    )
+    stats_resp = client.get(f"/api/v1/data/{upload_resp.json['id']}/stats")
+    assert stats_resp.status_code == 200
+    data = stats_resp.json
+    assert data["mean"]["value"] == pytest.approx(15.5)
+    assert data["median"]["value"] == pytest.approx(15.7)
+    assert data["std"]["id"] == pytest.approx(1.2909944)
+    assert "text_column" not in data["mean"]
+
+
+def test_streaming_text_after_sample(client, monkeypatch):
+    """Тест: текст во float-колонке после выборки схемы не ломает потоковое чтение"""
+    config = client.application.config
+    monkeypatch.setitem(config, "SCHEMA_SAMPLE_OFFSETS", 0)
+    monkeypatch.setitem(config, "SCHEMA_SAMPLE_BYTES", 1024)
+    monkeypatch.setitem(config, "LARGE_FILE_THRESHOLD_BYTES", 0)
+    monkeypatch.setitem(config, "PARALLEL_WORKERS", 1)
+    monkeypatch.setitem(config, "STREAMING_CHUNK_ROWS", 1000)
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({"a": rng.normal(0, 1, 5000), "b": rng.normal(5, 2, 5000)})
+    df["a"] = df["a"].astype(object)
+    df.loc[4000, "a"] = "oops"
+    file_id = client.post(
+        "/api/v1/upload",
+        data={"file": (BytesIO(df.to_csv(index=False).encode()), "text_after_sample.csv")},
+        content_type="multipart/form-data",
+    ).json["id"]
+
+    stats = client.get(f"/api/v1/data/{file_id}/stats")
+    assert stats.status_code == 200
+    # Как при чтении целиком: колонка с текстом не числовая
+    assert set(stats.json["mean"]) == {"b"}
+    assert stats.json["mean"]["b"] == pytest.approx(df["b"].mean(), rel=1e-9)
+    columns = client.get(f"/api/v1/data/{file_id}/stats", query_string={"columns": "b"})
+    assert columns.status_code == 200
+    clean = client.post(f"/api/v1/data/{file_id}/clean")
+    assert clean.status_code == 202
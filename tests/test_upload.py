@@ -1,3 +1,5 @@
+import hashlib
+import os
 from io import BytesIO
 
 
@@ -29,3 +31,26 @@ def test_upload_invalid_type(client):
         "/api/v1/upload", data=data, content_type="multipart/form-data"
     )
     assert response.status_code == 415
+
+
+def test_upload_deduplicated_by_content(client, app):
+    """Тест: одинаковое содержимое хранится один раз и дает тот же DataFile"""
+    content = b"a,b\n" + b"".join(b"%d,%d\n" % (i, i * 2) for i in range(100_000))
+    first = client.post(
+        "/api/v1/upload",
+        data={"file": (BytesIO(content), "big.csv")},
+        content_type="multipart/form-data",
+    )
+    second = client.post(
+        "/api/v1/upload",
+        data={"file": (BytesIO(content), "big_copy.csv")},
+        content_type="multipart/form-data",
+    )
+    assert first.status_code == 201
+    assert second.status_code == 200
+    assert second.json["id"] == first.json["id"]
+
+    names = os.listdir(app.config["UPLOAD_FOLDER"])
+    assert f"{hashlib.sha256(content).hexdigest()}.csv" in names
+    # Временные файлы загрузки удалены
+    assert not [name for name in names if name.startswith(".upload-")]